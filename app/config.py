@@ -16,6 +16,89 @@ class Config:
     FILE_TREE_FILTER = True
     ENV_DIR_NAME = ".conda"
     
+    # 磁盘缓存目录（大文本行索引等），放在工作目录之外以免出现在文件树中
+    CACHE_DIR = os.environ.get('TRAIN_TOOLS_CACHE_DIR') or os.path.join(
+        os.path.expanduser('~'), '.cache', 'train-tools')
+    
+    # 随机抽样：单次最多返回的条目数 / 遍历大目录的时间预算（秒）
+    SAMPLE_MAX_SIZE = 500
+    SAMPLE_TIME_BUDGET = 2.0
+    
+    # 图片缩略图磁盘缓存上限（位于 CACHE_DIR/thumbnails，需安装 Pillow）
+    THUMBNAIL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    
+    # 表格预览（CSV/TSV/JSONL）请求内遍历的时间预算（秒），超时先返回已读部分的统计，
+    # 完整遍历在后台继续，完成后缓存到 CACHE_DIR/table_preview
+    TABLE_PREVIEW_TIME_BUDGET = 3.0
+    
+    # 分块上传默认分块大小（会话状态位于 CACHE_DIR/uploads，支持续传）
+    UPLOAD_PART_SIZE = 8 * 1024 * 1024
+    
+    # 目录递归大小后台索引（持久化到 CACHE_DIR/size_index.json），复查最近查看目录的间隔（秒）
+    SIZE_INDEX_ENABLED = True
+    SIZE_INDEX_REFRESH_INTERVAL = 60
+    
+    # 文件搜索：单次最多返回的结果数 / 时间预算（秒）/ 内容搜索线程数 / 内容搜索跳过的大文件阈值
+    SEARCH_MAX_RESULTS = 500
+    SEARCH_TIME_BUDGET = 10.0
+    SEARCH_WORKERS = min(4, os.cpu_count() or 1)
+    SEARCH_MAX_FILE_SIZE = 16 * 1024 * 1024
+    
+    # 目录变更推送：优先使用 inotify，不可用时的轮询间隔（秒）/ 事件合并窗口（秒）
+    WATCH_USE_INOTIFY = True
+    WATCH_POLL_INTERVAL = 2.0
+    WATCH_COALESCE_DELAY = 0.5
+    
+    # 内容摘要（/api/hash）计算文件夹时的并行线程数
+    HASH_WORKERS = min(4, os.cpu_count() or 1)
+    
+    # 批量文件操作（删除/移动/复制）的后台线程数
+    BULK_OPS_WORKERS = 2
+    
+    # 文件预览缓存字节预算
+    PREVIEW_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    
+    # 目录列表缓存：按目录签名校验，超过该秒数强制重新扫描以刷新文件大小
+    LISTING_CACHE_MAX_AGE = 30
+    
+    # 文件夹打包下载的 deflate 压缩级别（1-9）
+    ZIP_COMPRESSLEVEL = 6
+    
+    # 打包下载的并行压缩线程数上限（默认最多 2 个，避免挤占训练任务的 CPU）
+    ZIP_COMPRESS_WORKERS = min(2, os.cpu_count() or 1)
+    
+    # 系统监控采样间隔（秒）：有客户端订阅时 / 无人订阅时
+    MONITOR_ACTIVE_INTERVAL = 1
+    MONITOR_IDLE_INTERVAL = 10
+    
+    # /metrics 抓取令牌：设置后使用 Bearer Token 认证，否则要求登录
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # 多节点监控：Agent 推送认证令牌（中心实例与 Agent 需一致，未设置时拒绝推送）
+    AGENT_TOKEN = os.environ.get('AGENT_TOKEN')
+    AGENT_PUSH_INTERVAL = 2
+    
+    # 告警规则：metric 为监控采样字段（save_memory、memory_percent、gpu 等），
+    # 多 GPU 字段按 reduce 聚合；duration 为持续满足条件的秒数；
+    # require_job 表示仅在有命令执行时生效；action 可选 stop_job
+    ALERT_RULES = [
+        {'name': 'disk_free_low', 'metric': 'save_memory', 'op': '<', 'threshold': 20,
+         'message': '磁盘剩余空间低于 20GB'},
+        {'name': 'gpu_idle', 'metric': 'gpu', 'reduce': 'max', 'op': '<', 'threshold': 5,
+         'duration': 600, 'require_job': True, 'message': '训练任务运行中但 GPU 使用率持续 10 分钟低于 5%'},
+        {'name': 'memory_high', 'metric': 'memory_percent', 'op': '>', 'threshold': 95,
+         'message': '内存使用率超过 95%'}
+    ]
+    
+    # 检查点保留策略：path 为工作目录下的目录，pattern 为文件名通配符；保留最新的 keep_last 个、
+    # 按文件名中的 metric（如 val_loss=0.123）保留最好的 keep_best 个（mode 为 min/max），
+    # 其余修改时间早于 older_than 秒的条目被删除；min_free_gb 表示仅在磁盘剩余空间低于该值时删除。
+    # 例：{'name': 'ckpt', 'path': 'checkpoints', 'pattern': '*.pt', 'keep_last': 3, 'keep_best': 2,
+    #      'metric': 'val_loss', 'mode': 'min', 'older_than': 86400}
+    RETENTION_RULES = []
+    # 后台评估间隔（秒），审计日志位于 CACHE_DIR/retention_audit.jsonl
+    RETENTION_INTERVAL = 600
+    
     # 默认路径配置
     DEFAULT_LOG_PATH = "logs"
     DEFAULT_PORT = "5000"
@@ -8,11 +8,15 @@ from .api_routes import api_bp
 from .file_routes import file_bp
 from .proxy_routes import proxy_bp
 from .auth_routes import auth_bp
+from .metrics_routes import metrics_bp
+from .agent_routes import agent_bp
 
 __all__ = [
     'main_bp',
     'api_bp', 
     'file_bp',
     'proxy_bp',
-    'auth_bp'
+    'auth_bp',
+    'metrics_bp',
+    'agent_bp'
 ]
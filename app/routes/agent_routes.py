@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+多节点 Agent 路由
+"""
+
+from functools import wraps
+from flask import Blueprint, request, jsonify
+from app.auth import login_required
+from app.config import Config
+from app.utils import AgentRegistry
+import hmac
+import logging
+
+agent_bp = Blueprint('agent', __name__, url_prefix='/api/agents')
+
+# 节点汇总实例（将在初始化时设置）
+agent_registry = None
+
+
+def init_agent_services(socketio):
+    """初始化节点汇总服务"""
+    global agent_registry
+    agent_registry = AgentRegistry(socketio)
+    agent_registry.start()
+    return agent_registry
+
+
+def agent_token_required(f):
+    """Agent 推送认证：必须配置 AGENT_TOKEN 并使用 Bearer Token"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = Config.AGENT_TOKEN
+        if not token:
+            return jsonify({'success': False, 'error': '中心实例未配置 AGENT_TOKEN'}), 403
+        
+        auth_header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth_header, f'Bearer {token}'):
+            return jsonify({'success': False, 'error': '认证失败'}), 401
+        return f(*args, **kwargs)
+    
+    return decorated_function
+
+
+@agent_bp.route('/push', methods=['POST'])
+@agent_token_required
+def api_agent_push():
+    """接收 Agent 推送的监控批次和任务事件"""
+    try:
+        data = request.get_json(silent=True)
+        if not data or not data.get('host'):
+            return jsonify({'success': False, 'error': '缺少节点名称'}), 400
+        
+        usage = data.get('usage') or []
+        events = data.get('events') or []
+        if not isinstance(usage, list) or not isinstance(events, list):
+            return jsonify({'success': False, 'error': '数据格式错误'}), 400
+        
+        agent_registry.ingest(str(data['host']), usage, events)
+        return jsonify({'success': True})
+        
+    except Exception as e:
+        logging.error(f"接收节点数据失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@agent_bp.route('')
+@login_required
+def api_agents():
+    """获取所有节点概况"""
+    try:
+        return jsonify({'success': True, 'hosts': agent_registry.get_hosts()})
+        
+    except Exception as e:
+        logging.error(f"获取节点列表失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@agent_bp.route('/<host>/history')
+@login_required
+def api_agent_history(host):
+    """获取单个节点的监控序列和事件"""
+    try:
+        history = agent_registry.get_host_history(host)
+        if history is None:
+            return jsonify({'success': False, 'error': '节点不存在'}), 404
+        return jsonify({'success': True, **history})
+        
+    except Exception as e:
+        logging.error(f"获取节点历史失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -3,11 +3,15 @@
 API 路由
 """
 
-from flask import Blueprint, request, jsonify
-from app.utils import SystemMonitor, CommandExecutor, TensorBoardManager
+from flask import Blueprint, request, jsonify, Response
+from app.utils import SystemMonitor, CommandExecutor, TensorBoardManager, AlertManager, FileWatcher, BulkOperationManager, RetentionManager
+from app.utils.retention import RetentionRule
 from app.routes.main_routes import set_configured
+from app.routes.file_routes import file_manager
+from app.config import Config
 from app.auth import login_required
 import logging
+import json
 import os
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
@@ -16,15 +20,48 @@ api_bp = Blueprint('api', __name__, url_prefix='/api')
 system_monitor = None
 command_executor = None
 tensorboard_manager = None
+alert_manager = None
+file_watcher = None
+bulk_operations = None
+retention_manager = None
 
 
 def init_api_services(socketio):
     """初始化API服务"""
-    global system_monitor, command_executor, tensorboard_manager
-    system_monitor = SystemMonitor(socketio)
+    global system_monitor, command_executor, tensorboard_manager, alert_manager, file_watcher, bulk_operations, retention_manager
+    system_monitor = SystemMonitor(
+        socketio,
+        active_interval=Config.MONITOR_ACTIVE_INTERVAL,
+        idle_interval=Config.MONITOR_IDLE_INTERVAL
+    )
     command_executor = CommandExecutor(socketio)
     tensorboard_manager = TensorBoardManager()
     
+    # 告警引擎在每次采样后增量评估
+    alert_manager = AlertManager(socketio, command_executor, Config.ALERT_RULES)
+    system_monitor.add_listener(alert_manager.evaluate)
+    
+    # 目录变更推送（只监听客户端正在查看的目录，首次订阅时启动）
+    file_watcher = FileWatcher(
+        socketio,
+        file_manager,
+        poll_interval=Config.WATCH_POLL_INTERVAL,
+        coalesce_delay=Config.WATCH_COALESCE_DELAY,
+        use_inotify=Config.WATCH_USE_INOTIFY
+    )
+    
+    # 批量文件操作（后台执行，进度通过 SocketIO 推送）
+    bulk_operations = BulkOperationManager(socketio, file_manager, workers=Config.BULK_OPS_WORKERS)
+    
+    # 检查点保留策略（配置了规则时后台定期清理）
+    retention_manager = RetentionManager(
+        file_manager,
+        Config.RETENTION_RULES,
+        interval=Config.RETENTION_INTERVAL,
+        audit_path=os.path.join(Config.CACHE_DIR, 'retention_audit.jsonl')
+    )
+    retention_manager.start()
+    
     # 启动系统监控
     system_monitor.start_monitoring()
 
@@ -91,12 +128,9 @@ def start_training():
 def api_tree():
     """获取文件树（兼容性保留）"""
     try:
-        from app.utils import FileManager
-        
         root = request.args.get('root', '.')
         sort = request.args.get('sort', 'default')
         
-        file_manager = FileManager()
         items = file_manager.get_directory_listing(root, sort)
         
         return jsonify({"tree": items})
@@ -106,23 +140,54 @@ def api_tree():
         return jsonify({"error": str(e)}), 500
 
 
+# 单页最大条目数
+MAX_DIRECTORY_PAGE_SIZE = 5000
+
+
 @api_bp.route("/directory")
 @login_required
 def api_directory():
-    """获取目录列表 - 平铺展示"""
+    """获取目录列表 - 平铺展示
+    
+    可选参数：limit/cursor 分页，prefix 名称前缀过滤，format=ndjson 流式输出
+    """
     try:
-        from app.utils import FileManager
-        
         path = request.args.get('path', '.')
         sort = request.args.get('sort', 'default')
-        
-        file_manager = FileManager()
-        items = file_manager.get_directory_listing(path, sort)
+        prefix = request.args.get('prefix') or None
+        cursor = request.args.get('cursor') or None
+        limit = request.args.get('limit', type=int)
+        if limit is not None:
+            limit = max(1, min(limit, MAX_DIRECTORY_PAGE_SIZE))
+        
+        current_path = os.path.abspath(path)
+        relative_path = os.path.relpath(path, '.') if path != '.' else ''
+        
+        if request.args.get('format') == 'ndjson':
+            # 首行为目录信息，之后每行一个条目
+            items = file_manager.iter_directory_listing(path, sort, prefix)
+            
+            def generate():
+                yield json.dumps({
+                    "current_path": current_path,
+                    "relative_path": relative_path
+                }, ensure_ascii=False) + '\n'
+                for item in items:
+                    yield json.dumps(item, ensure_ascii=False) + '\n'
+            
+            return Response(generate(), mimetype='application/x-ndjson')
+        
+        try:
+            page = file_manager.get_directory_page(path, sort, limit, cursor, prefix)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         return jsonify({
-            "items": items,
-            "current_path": os.path.abspath(path),
-            "relative_path": os.path.relpath(path, '.') if path != '.' else ''
+            "items": page['items'],
+            "next_cursor": page['next_cursor'],
+            "total": page['total'],
+            "current_path": current_path,
+            "relative_path": relative_path
         })
         
     except Exception as e:
@@ -135,13 +200,10 @@ def api_directory():
 def api_preview():
     """预览文件 - 优化版本"""
     try:
-        from app.utils import FileManager
-        
         path = request.args.get('path')
         if not path:
             return jsonify({'error': 'No path'}), 400
         
-        file_manager = FileManager()
         result, status_code = file_manager.preview_file(path)
         
         return jsonify(result), status_code
@@ -151,18 +213,92 @@ def api_preview():
         return jsonify({'error': str(e)}), 500
 
 
+@api_bp.route("/text_page")
+@login_required
+def api_text_page():
+    """分页读取大文本文件（start 为起始行号，从 1 开始；tail=N 读取最后 N 行）"""
+    try:
+        path = request.args.get('path')
+        if not path:
+            return jsonify({'error': 'No path'}), 400
+        
+        start = request.args.get('start', 1, type=int)
+        lines = request.args.get('lines', 200, type=int)
+        tail = request.args.get('tail', type=int)
+        
+        result, status_code = file_manager.read_text_page(path, start, lines, tail)
+        
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        logging.error(f"分页读取文件失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route("/sample")
+@login_required
+def api_sample():
+    """随机抽样：目录返回 n 个随机条目（dirs=1 时包含子目录），文件返回 n 个随机行"""
+    try:
+        path = request.args.get('path')
+        if not path:
+            return jsonify({'error': 'No path'}), 400
+        
+        n = min(max(request.args.get('n', 20, type=int), 1), Config.SAMPLE_MAX_SIZE)
+        files_only = request.args.get('dirs', '0').lower() not in ('1', 'true', 'yes')
+        seed = request.args.get('seed', type=int)
+        
+        result, status_code = file_manager.sample(path, n, files_only, Config.SAMPLE_TIME_BUDGET, seed)
+        
+        return jsonify(result), status_code
+        
+    except Exception as e:
+        logging.error(f"随机抽样失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route("/search")
+@login_required
+def api_search():
+    """搜索文件（NDJSON 流式输出，最后一行为 done 汇总）
+    
+    mode=name：q 为通配符（* ? []）或子串，含 / 时匹配相对路径；
+    mode=content：在文本文件中查找 q（regex=1 按正则，case=1 区分大小写）。
+    """
+    try:
+        path = request.args.get('path', '.')
+        query = request.args.get('q', '')
+        mode = request.args.get('mode', 'name')
+        limit = min(max(request.args.get('limit', Config.SEARCH_MAX_RESULTS, type=int), 1),
+                    Config.SEARCH_MAX_RESULTS)
+        use_regex = request.args.get('regex', '0').lower() in ('1', 'true', 'yes')
+        case_sensitive = request.args.get('case', '0').lower() in ('1', 'true', 'yes')
+        
+        results, error, status_code = file_manager.search(
+            path, query, mode, limit, Config.SEARCH_TIME_BUDGET, use_regex, case_sensitive)
+        if error:
+            return jsonify({'error': error}), status_code
+        
+        def generate():
+            for item in results:
+                yield json.dumps(item, ensure_ascii=False) + '\n'
+        
+        return Response(generate(), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        logging.error(f"文件搜索失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
 @api_bp.route("/file_content")
 @login_required
 def api_file_content():
     """获取文件内容（用于大文件流式传输）"""
     try:
-        from app.utils import FileManager
-        
         path = request.args.get('path')
         if not path:
             return 'No path', 400
         
-        file_manager = FileManager()
         result, error, status_code = file_manager.get_file_content(path)
         
         if error:
@@ -180,12 +316,9 @@ def api_file_content():
 def api_tree_lazy():
     """延迟加载文件树"""
     try:
-        from app.utils import FileManager
-        
         root = request.args.get('root', '.')
         sort = request.args.get('sort', 'default')
         
-        file_manager = FileManager()
         tree = file_manager.get_file_tree(root, 'lazy')
         
         return jsonify({"tree": tree})
@@ -200,9 +333,6 @@ def api_tree_lazy():
 def api_cache_stats():
     """获取缓存统计信息"""
     try:
-        from app.utils import FileManager
-        
-        file_manager = FileManager()
         stats = file_manager.get_cache_stats()
         
         return jsonify(stats)
@@ -217,9 +347,6 @@ def api_cache_stats():
 def api_clear_cache():
     """清理文件预览缓存"""
     try:
-        from app.utils import FileManager
-        
-        file_manager = FileManager()
         file_manager.clear_cache()
         
         return jsonify({"success": True, "message": "缓存已清理"})
@@ -234,13 +361,10 @@ def api_clear_cache():
 def api_edit_file():
     """获取文件内容用于编辑"""
     try:
-        from app.utils import FileManager
-        
         path = request.args.get('path')
         if not path:
             return jsonify({'error': 'No path'}), 400
         
-        file_manager = FileManager()
         result, status_code = file_manager.edit_file(path)
         
         return jsonify(result), status_code
@@ -253,23 +377,27 @@ def api_edit_file():
 @api_bp.route("/save_file", methods=["POST"])
 @login_required
 def api_save_file():
-    """保存文件内容"""
+    """保存文件内容
+    
+    提供 patch 时按行补丁增量保存（需要 base，即打开文件时返回的 version），
+    否则保存完整的 content；base 对应的版本已过期时返回 409。
+    """
     try:
-        from app.utils import FileManager
-        
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No data'}), 400
         
         path = data.get('path')
-        content = data.get('content', '')
-        encoding = data.get('encoding', 'utf-8')
+        encoding = data.get('encoding')
+        base = data.get('base')
         
         if not path:
             return jsonify({'error': 'No path'}), 400
         
-        file_manager = FileManager()
-        result, status_code = file_manager.save_file(path, content, encoding)
+        if 'patch' in data:
+            result, status_code = file_manager.save_file_patch(path, data['patch'], base, encoding)
+        else:
+            result, status_code = file_manager.save_file(path, data.get('content', ''), encoding or 'utf-8', base)
         
         return jsonify(result), status_code
         
@@ -278,13 +406,140 @@ def api_save_file():
         return jsonify({'error': str(e)}), 500
 
 
+@api_bp.route("/bulk", methods=["POST"])
+@login_required
+def api_bulk_submit():
+    """提交批量删除/移动/复制任务（立即返回 202，进度通过 bulk_progress 事件推送给 sid 对应的连接）"""
+    try:
+        if not bulk_operations:
+            return jsonify({'error': '批量操作服务未初始化'}), 500
+        
+        data = request.get_json() or {}
+        task, error, status_code = bulk_operations.submit(
+            data.get('op'), data.get('paths'), data.get('dest'), data.get('sid'))
+        if error:
+            return jsonify({'error': error}), status_code
+        
+        return jsonify(task), status_code
+        
+    except Exception as e:
+        logging.error(f"提交批量操作失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route("/bulk")
+@login_required
+def api_bulk_list():
+    """获取最近的批量操作任务"""
+    try:
+        if not bulk_operations:
+            return jsonify({'error': '批量操作服务未初始化'}), 500
+        return jsonify({'tasks': bulk_operations.list_tasks()})
+        
+    except Exception as e:
+        logging.error(f"获取批量操作列表失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route("/bulk/<task_id>", methods=["GET", "DELETE"])
+@login_required
+def api_bulk_task(task_id):
+    """获取批量任务状态；DELETE 取消尚未执行的条目"""
+    try:
+        if not bulk_operations:
+            return jsonify({'error': '批量操作服务未初始化'}), 500
+        
+        if request.method == 'DELETE':
+            task = bulk_operations.cancel(task_id)
+        else:
+            task = bulk_operations.get_task(task_id)
+        if task is None:
+            return jsonify({'error': 'Task not found'}), 404
+        
+        return jsonify(task)
+        
+    except Exception as e:
+        logging.error(f"获取批量任务失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route("/retention")
+@login_required
+def api_retention():
+    """获取保留策略规则和最近一次执行结果"""
+    try:
+        if not retention_manager:
+            return jsonify({'error': '保留策略服务未初始化'}), 500
+        return jsonify({
+            'rules': retention_manager.get_rules(),
+            'interval': retention_manager.interval,
+            'last_run': retention_manager.last_run
+        })
+        
+    except Exception as e:
+        logging.error(f"获取保留策略失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route("/retention/preview", methods=["GET", "POST"])
+@login_required
+def api_retention_preview():
+    """预览保留策略将删除的条目（不删除）；POST 可提交未保存的临时规则"""
+    try:
+        if not retention_manager:
+            return jsonify({'error': '保留策略服务未初始化'}), 500
+        
+        if request.method == 'POST':
+            try:
+                rule = RetentionRule.from_dict(request.get_json() or {})
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({'error': f'Invalid rule: {str(e)}'}), 400
+            return jsonify({'plans': [retention_manager.plan(rule)]})
+        
+        rule_name = request.args.get('rule')
+        if rule_name and retention_manager.get_rule(rule_name) is None:
+            return jsonify({'error': 'Rule not found'}), 404
+        return jsonify({'plans': retention_manager.preview(rule_name)})
+        
+    except Exception as e:
+        logging.error(f"预览保留策略失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route("/retention/run", methods=["POST"])
+@login_required
+def api_retention_run():
+    """立即执行全部保留策略"""
+    try:
+        if not retention_manager:
+            return jsonify({'error': '保留策略服务未初始化'}), 500
+        return jsonify({'results': retention_manager.run_once()})
+        
+    except Exception as e:
+        logging.error(f"执行保留策略失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route("/retention/audit")
+@login_required
+def api_retention_audit():
+    """获取保留策略的删除审计记录"""
+    try:
+        if not retention_manager:
+            return jsonify({'error': '保留策略服务未初始化'}), 500
+        limit = request.args.get('limit', 100, type=int)
+        return jsonify({'records': retention_manager.get_audit(limit)})
+        
+    except Exception as e:
+        logging.error(f"获取保留策略审计记录失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
 @api_bp.route("/create_file", methods=["POST"])
 @login_required
 def api_create_file():
     """创建新文件"""
     try:
-        from app.utils import FileManager
-        
         data = request.get_json()
         if not data:
             return jsonify({'error': 'No data'}), 400
@@ -296,7 +551,6 @@ def api_create_file():
         if not path:
             return jsonify({'error': 'No path'}), 400
         
-        file_manager = FileManager()
         result, status_code = file_manager.create_file(path, content, encoding)
         
         return jsonify(result), status_code
@@ -349,3 +603,22 @@ def api_clear_command_history():
     except Exception as e:
         logging.error(f"清空命令历史失败: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route("/alerts")
+@login_required
+def api_alerts():
+    """获取告警规则状态和告警历史"""
+    try:
+        if alert_manager:
+            return jsonify({
+                'success': True,
+                'rules': alert_manager.get_rules(),
+                'history': alert_manager.get_history()
+            })
+        else:
+            return jsonify({'success': False, 'error': '告警引擎未初始化'}), 500
+        
+    except Exception as e:
+        logging.error(f"获取告警信息失败: {str(e)}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
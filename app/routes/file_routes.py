@@ -3,15 +3,33 @@
 文件操作路由
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from app.utils import FileManager
 from app.auth import login_required
+from app.config import Config
 import logging
+import json
 
 file_bp = Blueprint('file', __name__, url_prefix='/api')
 
-# 文件管理器实例
-file_manager = FileManager()
+# 全局共享的文件管理器实例（api_routes 同样使用此实例，预览缓存跨请求有效）
+file_manager = FileManager(
+    filter_enabled=Config.FILE_TREE_FILTER,
+    env_dir_name=Config.ENV_DIR_NAME,
+    cache_max_bytes=Config.PREVIEW_CACHE_MAX_BYTES,
+    listing_max_age=Config.LISTING_CACHE_MAX_AGE,
+    zip_compresslevel=Config.ZIP_COMPRESSLEVEL,
+    zip_workers=Config.ZIP_COMPRESS_WORKERS,
+    cache_dir=Config.CACHE_DIR,
+    thumbnail_cache_max_bytes=Config.THUMBNAIL_CACHE_MAX_BYTES,
+    table_time_budget=Config.TABLE_PREVIEW_TIME_BUDGET,
+    upload_part_size=Config.UPLOAD_PART_SIZE,
+    size_index_enabled=Config.SIZE_INDEX_ENABLED,
+    size_index_refresh_interval=Config.SIZE_INDEX_REFRESH_INTERVAL,
+    search_workers=Config.SEARCH_WORKERS,
+    search_max_file_size=Config.SEARCH_MAX_FILE_SIZE,
+    hash_workers=Config.HASH_WORKERS
+)
 
 
 @file_bp.route('/download')
@@ -35,16 +53,41 @@ def api_download():
         return str(e), 500
 
 
+@file_bp.route('/thumbnail')
+@login_required
+def api_thumbnail():
+    """获取图片缩略图（size 向上取整到 128/256/512/1024）"""
+    try:
+        path = request.args.get('path')
+        if not path:
+            return 'No path', 400
+        
+        size = request.args.get('size', 256, type=int)
+        result, error, status_code = file_manager.get_thumbnail(path, size)
+        
+        if error:
+            return error, status_code
+        
+        return result
+        
+    except Exception as e:
+        logging.error(f"获取缩略图失败: {str(e)}", exc_info=True)
+        return str(e), 500
+
+
 @file_bp.route('/download_folder')
 @login_required
 def api_download_folder():
-    """下载文件夹"""
+    """下载文件夹（compress=0 时不压缩；workers 指定压缩线程数；format=tar.zst 输出 tar+zstd）"""
     try:
         path = request.args.get('path')
         if not path:
             return 'No path', 400
         
-        result, error, status_code = file_manager.download_folder(path)
+        compress = request.args.get('compress', '1').lower() not in ('0', 'false', 'no')
+        workers = request.args.get('workers', type=int)
+        archive_format = request.args.get('format', 'zip')
+        result, error, status_code = file_manager.download_folder(path, compress, workers, archive_format)
         
         if error:
             return error, status_code
@@ -76,6 +119,136 @@ def api_upload():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@file_bp.route('/upload/initiate', methods=['POST'])
+@login_required
+def api_upload_initiate():
+    """创建分块上传会话"""
+    try:
+        data = request.get_json() or {}
+        size = data.get('size')
+        part_size = data.get('part_size')
+        if not isinstance(size, int) or (part_size is not None and not isinstance(part_size, int)):
+            return jsonify({'error': 'size and part_size must be integers'}), 400
+        
+        result, status = file_manager.initiate_upload(data.get('path', '.'), data.get('filename'), size, part_size)
+        return jsonify(result), status
+        
+    except Exception as e:
+        logging.error(f"创建分块上传失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@file_bp.route('/upload/<upload_id>/<int:part_number>', methods=['PUT'])
+@login_required
+def api_upload_part(upload_id, part_number):
+    """上传一个分块（请求体为原始字节，X-Checksum 头为 算法:十六进制值）"""
+    try:
+        result, status = file_manager.upload_part(upload_id, part_number, request.stream,
+                                                  request.headers.get('X-Checksum'))
+        return jsonify(result), status
+        
+    except Exception as e:
+        logging.error(f"分块上传失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@file_bp.route('/upload/<upload_id>', methods=['GET', 'DELETE'])
+@login_required
+def api_upload_status(upload_id):
+    """查询分块上传进度（GET）或取消上传（DELETE）"""
+    try:
+        if request.method == 'DELETE':
+            result, status = file_manager.abort_upload(upload_id)
+        else:
+            result, status = file_manager.get_upload_status(upload_id)
+        return jsonify(result), status
+        
+    except Exception as e:
+        logging.error(f"查询分块上传失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@file_bp.route('/upload/<upload_id>/complete', methods=['POST'])
+@login_required
+def api_upload_complete(upload_id):
+    """完成分块上传"""
+    try:
+        result, status = file_manager.complete_upload(upload_id)
+        return jsonify(result), status
+        
+    except Exception as e:
+        logging.error(f"完成分块上传失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@file_bp.route('/sync/manifest')
+@login_required
+def api_sync_manifest():
+    """增量同步清单
+    
+    带 file 参数时返回该文件的块哈希清单；否则以 NDJSON 流式列出目录下所有文件的
+    路径、大小和修改时间，客户端据此跳过未变化的文件。
+    """
+    try:
+        path = request.args.get('path', '.')
+        relative_file = request.args.get('file')
+        
+        if relative_file:
+            result, status = file_manager.get_sync_manifest(path, relative_file)
+            return jsonify(result), status
+        
+        files, error, status = file_manager.iter_sync_files(path)
+        if error:
+            return jsonify({'error': error}), status
+        
+        def generate():
+            for item in files:
+                yield json.dumps(item, ensure_ascii=False) + '\n'
+        
+        return Response(generate(), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        logging.error(f"获取同步清单失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@file_bp.route('/hash')
+@login_required
+def api_hash():
+    """计算文件或文件夹的内容摘要（files=1 时附带文件夹中每个文件的摘要）"""
+    try:
+        path = request.args.get('path', '.')
+        algo = request.args.get('algo')
+        include_files = request.args.get('files') in ('1', 'true')
+        
+        result, status = file_manager.hash_path(path, algo, include_files)
+        return jsonify(result), status
+        
+    except Exception as e:
+        logging.error(f"计算内容摘要失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@file_bp.route('/sync/apply', methods=['POST'])
+@login_required
+def api_sync_apply():
+    """按增量指令重建文件（请求体为二进制指令流，参数 md5 为新文件的 MD5，base 为清单中的 signature）"""
+    try:
+        result, status = file_manager.apply_sync_delta(
+            request.args.get('path', '.'),
+            request.args.get('file', ''),
+            request.stream,
+            request.args.get('md5'),
+            request.args.get('base'),
+            request.args.get('mtime', type=float)
+        )
+        return jsonify(result), status
+        
+    except Exception as e:
+        logging.error(f"增量同步失败: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
 @file_bp.route('/delete', methods=['POST'])
 @login_required
 def api_delete():
@@ -36,6 +36,13 @@ def log():
     return render_template("log.html", OPEN_HISTORY_LOG=Config.OPEN_HISTORY_LOG)
 
 
+@main_bp.route("/agents")
+@login_required
+def agents_page():
+    """多节点监控页面路由"""
+    return render_template("agents.html")
+
+
 @main_bp.route("/tree")
 @login_required
 def tree_page():
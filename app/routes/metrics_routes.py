@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Prometheus 指标路由
+"""
+
+from functools import wraps
+from flask import Blueprint, Response, request
+from app.auth import login_required, user_manager
+from app.config import Config
+from app.utils.metrics import metrics_registry
+import hmac
+import logging
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# 系统监控实例（将在初始化时设置）
+system_monitor = None
+
+
+def _latest_value(field):
+    """读取最近一次采样中的标量值"""
+    def value_function():
+        latest = system_monitor.get_latest() if system_monitor else None
+        if not latest or latest.get(field) is None:
+            return {}
+        return {(): latest[field]}
+    return value_function
+
+
+def _latest_gpu_values(field):
+    """读取最近一次采样中按 GPU 编号展开的值"""
+    def value_function():
+        latest = system_monitor.get_latest() if system_monitor else None
+        if not latest:
+            return {}
+        return {(index,): value for index, value in enumerate(latest.get(field) or [])}
+    return value_function
+
+
+def init_metrics_services(sys_monitor):
+    """初始化指标服务，注册读取已聚合数据的瞬时值指标"""
+    global system_monitor
+    system_monitor = sys_monitor
+    
+    metrics_registry.gauge('train_tools_cpu_usage_percent', 'CPU 使用率（%）',
+                           value_function=_latest_value('cpu'))
+    metrics_registry.gauge('train_tools_memory_used_gigabytes', '内存使用量（GB）',
+                           value_function=_latest_value('memory'))
+    metrics_registry.gauge('train_tools_disk_free_gigabytes', '磁盘剩余空间（GB）',
+                           value_function=_latest_value('save_memory'))
+    metrics_registry.gauge('train_tools_gpu_usage_percent', 'GPU 使用率（%）', ['gpu'],
+                           value_function=_latest_gpu_values('gpu'))
+    metrics_registry.gauge('train_tools_gpu_memory_used_gigabytes', '显存使用量（GB）', ['gpu'],
+                           value_function=_latest_gpu_values('gpu_memory'))
+    metrics_registry.gauge('train_tools_monitor_subscribers', '订阅实时监控数据的客户端数',
+                           value_function=lambda: {(): system_monitor.get_subscriber_count()} if system_monitor else {})
+    metrics_registry.gauge('train_tools_active_sessions', '当前登录会话数',
+                           value_function=lambda: {(): len(user_manager.sessions)})
+
+
+def metrics_auth_required(f):
+    """指标访问认证：配置了 METRICS_TOKEN 时使用 Bearer Token，否则要求登录"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = Config.METRICS_TOKEN
+        if not token:
+            return login_required(f)(*args, **kwargs)
+        
+        auth_header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(auth_header, f'Bearer {token}'):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return f(*args, **kwargs)
+    
+    return decorated_function
+
+
+@metrics_bp.route('/metrics')
+@metrics_auth_required
+def metrics():
+    """Prometheus 文本格式指标"""
+    try:
+        return Response(metrics_registry.render(),
+                        mimetype='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        logging.error(f"生成指标失败: {str(e)}", exc_info=True)
+        return Response(str(e), status=500, mimetype='text/plain')
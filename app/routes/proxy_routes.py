@@ -5,8 +5,10 @@
 
 from flask import Blueprint, request, Response
 from app.auth import login_required
+from app.utils.metrics import proxy_request_duration_seconds
 import requests
 import logging
+import time
 
 proxy_bp = Blueprint('proxy', __name__, url_prefix='/proxy')
 
@@ -48,6 +50,7 @@ def proxy(path):
         cookies = request.cookies
 
         # 发送请求
+        start_time = time.time()
         resp = requests.request(
             method=request.method,
             url=full_target_url,
@@ -57,6 +60,9 @@ def proxy(path):
             allow_redirects=False,
             timeout=30  # 防止超时挂起
         )
+        proxy_request_duration_seconds.observe(
+            time.time() - start_time, method=request.method, status=resp.status_code
+        )
 
         # 构造响应头
         excluded_headers = ['content-encoding', 'content-length', 'transfer-encoding', 'connection']
@@ -68,6 +74,9 @@ def proxy(path):
         return Response(resp.content, status=resp.status_code, headers=response_headers)
 
     except requests.exceptions.RequestException as e:
+        proxy_request_duration_seconds.observe(
+            time.time() - start_time, method=request.method, status='error'
+        )
         logging.error(f"代理请求失败: {str(e)}", exc_info=True)
         return f"Proxy request failed: {str(e)}", 502
     
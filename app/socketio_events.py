@@ -3,23 +3,30 @@
 SocketIO 事件处理模块
 """
 
-from flask_socketio import emit
+from flask import request
+from flask_socketio import emit, join_room, leave_room
+from app.auth import get_current_user
 import logging
+import os
 
 # 全局实例（将在应用初始化时设置）
 command_executor = None
 system_monitor = None
+file_watcher = None
 
 
-def init_socketio_events(socketio, cmd_executor, sys_monitor):
+def init_socketio_events(socketio, cmd_executor, sys_monitor, fs_watcher=None):
     """初始化SocketIO事件处理"""
-    global command_executor, system_monitor
+    global command_executor, system_monitor, file_watcher
     command_executor = cmd_executor
     system_monitor = sys_monitor
+    file_watcher = fs_watcher
     
     # 注册事件处理器
     socketio.on_event('connect', handle_connect)
     socketio.on_event('usage', usage_connect)
+    socketio.on_event('disconnect', handle_disconnect)
+    socketio.on_event('watch_directory', handle_watch_directory)
 
 
 def handle_connect():
@@ -33,12 +40,44 @@ def handle_connect():
         logging.error(f"处理连接事件失败: {str(e)}", exc_info=True)
 
 
+def handle_disconnect():
+    """处理客户端断开事件"""
+    try:
+        if system_monitor:
+            system_monitor.unsubscribe(request.sid)
+        if file_watcher:
+            file_watcher.unwatch(request.sid)
+        logging.info("客户端已断开")
+    except Exception as e:
+        logging.error(f"处理断开事件失败: {str(e)}", exc_info=True)
+
+
 def usage_connect():
     """处理系统使用情况连接事件"""
     try:
         if system_monitor:
+            # 订阅实时监控数据，断开连接时自动取消
+            system_monitor.subscribe(request.sid)
             history = system_monitor.get_history()
             emit('usage_history', {'data': history})
         logging.info("系统监控数据已发送")
     except Exception as e:
         logging.error(f"处理使用情况连接事件失败: {str(e)}", exc_info=True)
+
+
+def handle_watch_directory(data):
+    """订阅当前打开目录的变更推送（切换目录时替换之前的订阅）"""
+    try:
+        if not file_watcher or get_current_user() is None:
+            return
+        abs_dir = os.path.abspath((data or {}).get('path') or '.')
+        if not abs_dir.startswith(os.path.abspath('.')) or not os.path.isdir(abs_dir):
+            emit('fs_watch_error', {'path': abs_dir, 'error': 'Invalid directory'})
+            return
+        old = file_watcher.watch(request.sid, abs_dir)
+        if old is not None:
+            leave_room(file_watcher.room_for(old))
+        join_room(file_watcher.room_for(abs_dir))
+        emit('fs_watching', {'dir': abs_dir})
+    except Exception as e:
+        logging.error(f"订阅目录变更失败: {str(e)}", exc_info=True)
@@ -7,10 +7,25 @@ from .system_monitor import SystemMonitor
 from .command_executor import CommandExecutor
 from .tensorboard_manager import TensorBoardManager
 from .file_manager import FileManager
+from .alert_manager import AlertManager
+from .agent_client import AgentClient
+from .agent_registry import AgentRegistry
+from .fs_watcher import FileWatcher
+from .bulk_ops import BulkOperationManager
+from .retention import RetentionManager
+from .metrics import MetricsRegistry, metrics_registry
 
 __all__ = [
     'SystemMonitor',
     'CommandExecutor', 
     'TensorBoardManager',
-    'FileManager'
+    'FileManager',
+    'AlertManager',
+    'AgentClient',
+    'AgentRegistry',
+    'FileWatcher',
+    'BulkOperationManager',
+    'RetentionManager',
+    'MetricsRegistry',
+    'metrics_registry'
 ]
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Agent 模式推送客户端模块
+
+Agent 模式下没有本地 SocketIO，AgentClient 代替 socketio 传给 SystemMonitor 和
+CommandExecutor：emit 的数据先进入有界缓冲区，再由后台线程按批次推送到中心实例。
+"""
+
+import time
+import logging
+import requests
+from collections import deque
+from threading import Thread, Event, Lock
+from .metrics import socketio_dropped_total
+
+
+class AgentClient:
+    """Agent 推送客户端类"""
+
+    def __init__(self, central_url, agent_name, token=None, push_interval=2, max_buffer=1000):
+        self.central_url = central_url.rstrip('/')
+        self.agent_name = agent_name
+        self.token = token
+        self.push_interval = push_interval
+        # 缓冲区满时丢弃最旧的数据（中心不可达时避免无限增长）
+        self._usage_buffer = deque(maxlen=max_buffer)
+        self._event_buffer = deque(maxlen=max_buffer)
+        self._lock = Lock()
+        self._stop_event = Event()
+        self.push_thread = None
+        self.session = requests.Session()
+        if token:
+            self.session.headers['Authorization'] = f'Bearer {token}'
+
+    def emit(self, event, data=None, **kwargs):
+        """与 socketio.emit 兼容的接口：缓存待推送数据"""
+        with self._lock:
+            if event == 'usage':
+                buffer = self._usage_buffer
+                item = data
+            else:
+                buffer = self._event_buffer
+                item = {'event': event, 'data': data, 'ts': time.time()}
+            if len(buffer) == buffer.maxlen:
+                socketio_dropped_total.inc(event=event, reason='agent_buffer_full')
+            buffer.append(item)
+
+    def start(self):
+        """启动推送线程"""
+        if self.push_thread is None:
+            self.push_thread = Thread(target=self._push_loop)
+            self.push_thread.daemon = True
+            self.push_thread.start()
+            logging.info(f"Agent 推送已启动，中心实例: {self.central_url}")
+
+    def stop(self):
+        """停止推送线程，并尽量推送剩余数据"""
+        self._stop_event.set()
+        if self.push_thread:
+            self.push_thread.join()
+            self.push_thread = None
+        self.flush()
+
+    def _push_loop(self):
+        """推送循环"""
+        while not self._stop_event.wait(self.push_interval):
+            self.flush()
+
+    def _take_batch(self):
+        """取出缓冲区中的全部数据"""
+        with self._lock:
+            usage = list(self._usage_buffer)
+            events = list(self._event_buffer)
+            self._usage_buffer.clear()
+            self._event_buffer.clear()
+        return usage, events
+
+    def _restore_batch(self, usage, events):
+        """推送失败时将数据放回缓冲区头部，保持时间顺序"""
+        with self._lock:
+            for buffer, items in ((self._usage_buffer, usage), (self._event_buffer, events)):
+                free = buffer.maxlen - len(buffer)
+                if free > 0:
+                    buffer.extendleft(reversed(items[-free:]))
+
+    def flush(self):
+        """推送一个批次，返回是否成功"""
+        usage, events = self._take_batch()
+        if not usage and not events:
+            return True
+
+        payload = {'host': self.agent_name, 'usage': usage, 'events': events}
+        try:
+            resp = self.session.post(f"{self.central_url}/api/agents/push", json=payload, timeout=10)
+            if resp.status_code != 200:
+                raise requests.exceptions.RequestException(f"HTTP {resp.status_code}: {resp.text[:200]}")
+            return True
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Agent 推送失败，稍后重试: {str(e)}")
+            self._restore_batch(usage, events)
+            return False
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+多节点监控汇总模块
+
+中心实例接收各 Agent 推送的批次，按主机分别保存监控序列，
+并按固定间隔把所有主机的新数据合并成一条 SocketIO 消息推送给前端。
+"""
+
+import time
+import logging
+from collections import deque
+from threading import Thread, Event, Lock
+from .metrics import socketio_emits_total
+
+
+class AgentRegistry:
+    """Agent 汇总管理类"""
+
+    def __init__(self, socketio, history_size=300, event_history_size=200,
+                 emit_interval=1, offline_after=30):
+        self.socketio = socketio
+        self.history_size = history_size
+        self.event_history_size = event_history_size
+        self.emit_interval = emit_interval
+        self.offline_after = offline_after
+        # host -> {'usage': deque, 'events': deque, 'last_seen': float}
+        self.hosts = {}
+        # 等待合并推送的新数据
+        self._pending_usage = {}
+        self._pending_events = {}
+        self._lock = Lock()
+        self._stop_event = Event()
+        self.emit_thread = None
+
+    def start(self):
+        """启动合并推送线程"""
+        if self.emit_thread is None:
+            self.emit_thread = Thread(target=self._emit_loop)
+            self.emit_thread.daemon = True
+            self.emit_thread.start()
+
+    def stop(self):
+        """停止合并推送线程"""
+        self._stop_event.set()
+        if self.emit_thread:
+            self.emit_thread.join()
+            self.emit_thread = None
+
+    def ingest(self, host, usage=None, events=None):
+        """接收一个 Agent 批次"""
+        usage = usage or []
+        events = events or []
+        with self._lock:
+            entry = self.hosts.get(host)
+            if entry is None:
+                entry = self.hosts[host] = {
+                    'usage': deque(maxlen=self.history_size),
+                    'events': deque(maxlen=self.event_history_size),
+                    'last_seen': 0
+                }
+                logging.info(f"新节点已接入: {host}")
+            entry['usage'].extend(usage)
+            entry['events'].extend(events)
+            entry['last_seen'] = time.time()
+
+            if usage:
+                self._pending_usage.setdefault(host, []).extend(usage)
+            if events:
+                self._pending_events.setdefault(host, []).extend(events)
+
+    def _take_pending(self):
+        """取出待推送数据"""
+        with self._lock:
+            usage, events = self._pending_usage, self._pending_events
+            self._pending_usage, self._pending_events = {}, {}
+        return usage, events
+
+    def _emit_loop(self):
+        """合并推送循环"""
+        while not self._stop_event.wait(self.emit_interval):
+            usage, events = self._take_pending()
+            if not usage and not events:
+                continue
+            try:
+                self.socketio.emit('agents_update', {'usage': usage, 'events': events})
+                socketio_emits_total.inc(event='agents_update')
+            except Exception:
+                logging.error("推送节点数据失败", exc_info=True)
+
+    def get_hosts(self):
+        """获取所有节点概况"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    'host': host,
+                    'online': now - entry['last_seen'] <= self.offline_after,
+                    'last_seen': entry['last_seen'],
+                    'latest': entry['usage'][-1] if entry['usage'] else None
+                }
+                for host, entry in sorted(self.hosts.items())
+            ]
+
+    def get_host_history(self, host):
+        """获取单个节点的监控序列和事件"""
+        with self._lock:
+            entry = self.hosts.get(host)
+            if entry is None:
+                return None
+            return {
+                'host': host,
+                'usage': list(entry['usage']),
+                'events': list(entry['events'])
+            }
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+告警规则引擎模块
+
+在每次系统监控采样后增量评估阈值规则，每条规则只保存常数大小的状态
+（条件开始满足的时间和是否已触发）。
+"""
+
+import time
+import logging
+import operator
+from threading import Lock
+from .metrics import metrics_registry
+
+
+alerts_fired_total = metrics_registry.counter(
+    'train_tools_alerts_fired_total', '已触发的告警次数', ['rule'])
+
+
+class AlertRule:
+    """告警规则"""
+
+    OPERATORS = {
+        '<': operator.lt,
+        '<=': operator.le,
+        '>': operator.gt,
+        '>=': operator.ge
+    }
+
+    REDUCERS = {
+        'max': max,
+        'min': min,
+        'mean': lambda values: sum(values) / len(values)
+    }
+
+    def __init__(self, name, metric, op, threshold, duration=0, reduce='max',
+                 require_job=False, action=None, message=None):
+        if op not in self.OPERATORS:
+            raise ValueError(f"不支持的比较运算符: {op}")
+        if reduce not in self.REDUCERS:
+            raise ValueError(f"不支持的聚合方式: {reduce}")
+
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.duration = duration
+        self.reduce = reduce
+        self.require_job = require_job
+        self.action = action
+        self.message = message or f"{metric} {op} {threshold}"
+
+        # 增量状态
+        self.pending_since = None
+        self.firing = False
+        self.last_value = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """从字典创建规则"""
+        return cls(
+            name=data['name'],
+            metric=data['metric'],
+            op=data['op'],
+            threshold=data['threshold'],
+            duration=data.get('duration', 0),
+            reduce=data.get('reduce', 'max'),
+            require_job=data.get('require_job', False),
+            action=data.get('action'),
+            message=data.get('message')
+        )
+
+    def extract_value(self, sample):
+        """从采样数据中取出规则关注的值，多 GPU 指标按 reduce 聚合"""
+        value = sample.get(self.metric)
+        if isinstance(value, (list, tuple)):
+            if not value:
+                return None
+            return self.REDUCERS[self.reduce](value)
+        return value
+
+    def update(self, sample, now, job_running):
+        """用新采样更新规则状态，返回 'firing'、'resolved' 或 None"""
+        value = self.extract_value(sample)
+        self.last_value = value
+
+        matched = (
+            value is not None and
+            (job_running or not self.require_job) and
+            self.OPERATORS[self.op](value, self.threshold)
+        )
+
+        if not matched:
+            self.pending_since = None
+            if self.firing:
+                self.firing = False
+                return 'resolved'
+            return None
+
+        if self.pending_since is None:
+            self.pending_since = now
+
+        if not self.firing and now - self.pending_since >= self.duration:
+            self.firing = True
+            return 'firing'
+        return None
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'name': self.name,
+            'metric': self.metric,
+            'op': self.op,
+            'threshold': self.threshold,
+            'duration': self.duration,
+            'reduce': self.reduce,
+            'require_job': self.require_job,
+            'action': self.action,
+            'message': self.message,
+            'firing': self.firing,
+            'last_value': self.last_value
+        }
+
+
+class AlertManager:
+    """告警管理器类"""
+
+    ACTIONS = ('stop_job',)
+
+    def __init__(self, socketio, command_executor=None, rules=None, max_history=100):
+        self.socketio = socketio
+        self.command_executor = command_executor
+        self.rules = [AlertRule.from_dict(rule) for rule in (rules or [])]
+        self.alert_history = []
+        self.max_history = max_history
+        self._lock = Lock()
+
+        for rule in self.rules:
+            if rule.action and rule.action not in self.ACTIONS:
+                logging.warning(f"告警规则 {rule.name} 配置了未知动作: {rule.action}")
+
+    def evaluate(self, sample):
+        """评估一次采样（作为 SystemMonitor 监听器调用）"""
+        now = time.monotonic()
+        job_running = bool(self.command_executor and self.command_executor.is_running())
+
+        with self._lock:
+            transitions = [(rule, rule.update(sample, now, job_running)) for rule in self.rules]
+
+        for rule, state in transitions:
+            if state:
+                self._notify(rule, state, sample)
+
+    def _notify(self, rule, state, sample):
+        """发送告警事件、写日志并执行动作"""
+        alert = {
+            'rule': rule.name,
+            'state': state,
+            'message': rule.message,
+            'value': rule.last_value,
+            'threshold': rule.threshold,
+            'time': sample.get('time') or time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+        if state == 'firing':
+            logging.warning(f"告警触发 - {rule.name}: {rule.message} (当前值: {rule.last_value})")
+            alerts_fired_total.inc(rule=rule.name)
+            if rule.action:
+                alert['action'] = rule.action
+                alert['action_result'] = self._run_action(rule)
+        else:
+            logging.info(f"告警解除 - {rule.name}")
+
+        with self._lock:
+            self.alert_history.append(alert)
+            if len(self.alert_history) > self.max_history:
+                self.alert_history.pop(0)
+
+        try:
+            self.socketio.emit('alert', alert)
+        except Exception:
+            logging.error("发送告警事件失败", exc_info=True)
+
+    def _run_action(self, rule):
+        """执行告警动作"""
+        try:
+            if rule.action == 'stop_job':
+                if self.command_executor and self.command_executor.stop_command():
+                    logging.warning(f"告警 {rule.name} 已终止正在执行的命令")
+                    return 'stopped'
+                return 'no_job'
+            return 'unknown_action'
+        except Exception as e:
+            logging.error(f"告警动作执行失败 - {rule.name}: {str(e)}", exc_info=True)
+            return 'error'
+
+    def get_rules(self):
+        """获取规则及其当前状态"""
+        with self._lock:
+            return [rule.to_dict() for rule in self.rules]
+
+    def get_history(self):
+        """获取告警历史"""
+        with self._lock:
+            return list(self.alert_history)
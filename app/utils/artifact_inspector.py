@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+模型/数组文件头部解析模块
+
+只读取文件头部（seek + 有限字节），不加载张量数据：
+- .safetensors：开头 8 字节为 JSON 头长度，JSON 中包含各张量的 dtype、shape 和偏移
+- .npy：魔数 + 版本 + 头长度 + Python 字典字面量（descr、fortran_order、shape）
+- .npz：ZIP 中的每个 .npy 成员只读取其头部
+- PyTorch 检查点（ZIP 格式）：只读取中央目录，列出成员
+- .bin 也常用于数据集、固件等原始二进制文件，只有开头是 ZIP 或 pickle 魔数时才视为检查点
+"""
+
+import os
+import ast
+import json
+import struct
+import zipfile
+from functools import lru_cache
+
+
+# safetensors 规范限制 JSON 头不超过 100MB
+SAFETENSORS_MAX_HEADER = 100 * 1024 * 1024
+NPY_MAGIC = b'\x93NUMPY'
+ZIP_MAGIC = b'PK\x03\x04'
+# pickle 协议 2 及以上以 PROTO 操作码开头（旧版 torch.save 格式）
+PICKLE_PROTO = 0x80
+
+SAFETENSORS_EXTENSIONS = {'.safetensors'}
+NUMPY_EXTENSIONS = {'.npy', '.npz'}
+TORCH_EXTENSIONS = {'.pt', '.pth', '.ckpt'}
+ARTIFACT_EXTENSIONS = SAFETENSORS_EXTENSIONS | NUMPY_EXTENSIONS | TORCH_EXTENSIONS
+# 需要检查文件头才能确定是否为检查点的扩展名
+HEADER_CHECKED_EXTENSIONS = {'.bin'}
+
+# 返回给前端的最大张量/成员条目数
+MAX_ENTRIES = 2000
+
+
+def has_artifact_extension(filename):
+    """扩展名是否可能为模型/数组文件（不读取文件）"""
+    ext = os.path.splitext(filename)[1].lower()
+    return ext in ARTIFACT_EXTENSIONS or ext in HEADER_CHECKED_EXTENSIONS
+
+
+def is_artifact(path, mtime=None):
+    """是否为可解析头部的模型/数组文件（.bin 读取文件头判断，mtime 用于缓存判断结果）"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ARTIFACT_EXTENSIONS:
+        return True
+    if ext in HEADER_CHECKED_EXTENSIONS:
+        if mtime is None:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                return False
+        return _has_checkpoint_header(os.path.abspath(path), mtime)
+    return False
+
+
+@lru_cache(maxsize=4096)
+def _has_checkpoint_header(abs_path, mtime):
+    """文件开头是否为 ZIP（新版 torch.save）或 pickle（旧版 torch.save）魔数"""
+    try:
+        with open(abs_path, 'rb') as f:
+            magic = f.read(4)
+    except OSError:
+        return False
+    return magic == ZIP_MAGIC or (len(magic) >= 2 and magic[0] == PICKLE_PROTO and 2 <= magic[1] <= 5)
+
+
+def _element_count(shape):
+    """张量元素个数"""
+    count = 1
+    for dim in shape:
+        count *= dim
+    return count
+
+
+def inspect_safetensors(file_path):
+    """解析 safetensors 头部"""
+    with open(file_path, 'rb') as f:
+        prefix = f.read(8)
+        if len(prefix) < 8:
+            raise ValueError('文件过短，不是有效的 safetensors 文件')
+        header_size = struct.unpack('<Q', prefix)[0]
+        if header_size > SAFETENSORS_MAX_HEADER:
+            raise ValueError(f'safetensors 头部过大: {header_size} 字节')
+        header = json.loads(f.read(header_size))
+
+    metadata = header.pop('__metadata__', None)
+    tensors = []
+    total_params = 0
+    dtypes = {}
+    for name, info in header.items():
+        shape = info.get('shape', [])
+        dtype = info.get('dtype')
+        count = _element_count(shape)
+        total_params += count
+        dtypes[dtype] = dtypes.get(dtype, 0) + count
+        start, end = info.get('data_offsets', (0, 0))
+        tensors.append({'name': name, 'dtype': dtype, 'shape': shape, 'nbytes': end - start})
+
+    return {
+        'format': 'safetensors',
+        'header_size': header_size,
+        'metadata': metadata,
+        'tensor_count': len(tensors),
+        'total_params': total_params,
+        'dtypes': dtypes,
+        'tensors': tensors[:MAX_ENTRIES],
+        'truncated': len(tensors) > MAX_ENTRIES
+    }
+
+
+def _read_npy_header(f):
+    """从文件对象当前位置读取 .npy 头部"""
+    magic = f.read(8)
+    if len(magic) < 8 or not magic.startswith(NPY_MAGIC):
+        raise ValueError('不是有效的 .npy 数据')
+    major = magic[6]
+    if major == 1:
+        header_len = struct.unpack('<H', f.read(2))[0]
+    else:
+        header_len = struct.unpack('<I', f.read(4))[0]
+    encoding = 'utf-8' if major >= 3 else 'latin1'
+    header = ast.literal_eval(f.read(header_len).decode(encoding))
+    shape = list(header.get('shape', ()))
+    return {
+        'dtype': str(header.get('descr')),
+        'shape': shape,
+        'fortran_order': bool(header.get('fortran_order', False)),
+        'count': _element_count(shape),
+        'version': f'{major}.{magic[7]}'
+    }
+
+
+def inspect_npy(file_path):
+    """解析 .npy 头部"""
+    with open(file_path, 'rb') as f:
+        info = _read_npy_header(f)
+    info['format'] = 'npy'
+    return info
+
+
+def inspect_npz(file_path):
+    """解析 .npz 中每个数组的头部（压缩成员只解压头部所需的字节）"""
+    arrays = []
+    with zipfile.ZipFile(file_path) as archive:
+        members = archive.infolist()
+        for member in members[:MAX_ENTRIES]:
+            entry = {'name': member.filename[:-4] if member.filename.endswith('.npy') else member.filename,
+                     'compressed': member.compress_type != zipfile.ZIP_STORED,
+                     'file_size': member.file_size}
+            try:
+                with archive.open(member) as f:
+                    entry.update(_read_npy_header(f))
+            except (ValueError, SyntaxError, struct.error) as e:
+                entry['error'] = str(e)
+            arrays.append(entry)
+    return {
+        'format': 'npz',
+        'array_count': len(members),
+        'arrays': arrays,
+        'truncated': len(members) > MAX_ENTRIES
+    }
+
+
+def inspect_torch(file_path):
+    """列出 PyTorch ZIP 格式检查点的成员（只读取中央目录）"""
+    with open(file_path, 'rb') as f:
+        magic = f.read(4)
+    if magic != ZIP_MAGIC:
+        # torch.save 旧格式（纯 pickle）或其他二进制格式，无法在不反序列化的情况下解析
+        return {'format': 'torch_legacy', 'message': '非 ZIP 格式（旧版 torch.save 或其他二进制文件），无法在不加载的情况下查看结构'}
+
+    with zipfile.ZipFile(file_path) as archive:
+        members = archive.infolist()
+    storages = [m for m in members if '/data/' in m.filename and not m.filename.endswith('.pkl')]
+    root = members[0].filename.split('/', 1)[0] if members else ''
+    return {
+        'format': 'torch_zip',
+        'archive_name': root,
+        'member_count': len(members),
+        'storage_count': len(storages),
+        'storage_bytes': sum(m.file_size for m in storages),
+        'members': [
+            {'name': m.filename, 'size': m.file_size, 'compressed_size': m.compress_size}
+            for m in members[:MAX_ENTRIES]
+        ],
+        'truncated': len(members) > MAX_ENTRIES
+    }
+
+
+def inspect_artifact(file_path):
+    """按扩展名解析模型/数组文件头部"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in SAFETENSORS_EXTENSIONS:
+        return inspect_safetensors(file_path)
+    if ext == '.npy':
+        return inspect_npy(file_path)
+    if ext == '.npz':
+        return inspect_npz(file_path)
+    return inspect_torch(file_path)
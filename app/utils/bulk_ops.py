@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+批量文件操作模块
+
+对多个路径执行删除、移动、复制，作为后台任务在有界线程池中运行，进度通过 SocketIO 推送。
+删除先把每个路径重命名到回收目录（同一文件系统内的 rename，瞬间完成），请求立即返回，
+实际的递归删除在后台进行；跨文件系统的路径改名为同目录下的隐藏名称，并记录到回收目录的清单中。
+服务启动时清空回收目录和清单中上次未删完的内容。进度只推送给提交任务的 SocketIO 连接。
+"""
+
+import os
+import time
+import errno
+import uuid
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import socketio_emits_total
+
+
+OPERATIONS = ('delete', 'move', 'copy')
+
+
+class BulkTask:
+    """单个批量任务"""
+
+    def __init__(self, task_id, op, paths, dest=None, sid=None):
+        self.task_id = task_id
+        self.op = op
+        self.paths = paths
+        self.dest = dest
+        # 提交任务的 SocketIO 连接，进度只推送给它
+        self.sid = sid
+        self.status = 'running'
+        self.total = len(paths)
+        self.completed = 0
+        self.bytes_copied = 0
+        self.errors = []
+        self.current = None
+        self.cancelled = False
+        self.created_at = time.time()
+        self.finished_at = None
+        self.last_emit = 0.0
+
+    def to_dict(self):
+        """转换为字典（返回给前端）"""
+        return {
+            'task_id': self.task_id,
+            'op': self.op,
+            'status': self.status,
+            'total': self.total,
+            'completed': self.completed,
+            'bytes_copied': self.bytes_copied,
+            'current': self.current,
+            'errors': self.errors[-50:],
+            'error_count': len(self.errors),
+            'dest': self.dest,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class BulkOperationManager:
+    """批量文件操作任务管理类"""
+
+    def __init__(self, socketio, file_manager, workers=2, trash_dir=None, max_tasks=100,
+                 progress_interval=0.2):
+        self.socketio = socketio
+        self.file_manager = file_manager
+        self.workers = max(1, workers)
+        # 回收目录（以 . 开头，文件树中会被过滤）
+        self.trash_dir = trash_dir or os.path.join(os.path.abspath('.'), '.trash')
+        # 跨文件系统、留在原目录的回收路径清单（每行一个路径）
+        self.external_list = os.path.join(self.trash_dir, '.external')
+        self.max_tasks = max_tasks
+        # 两次进度推送的最小间隔（秒），任务结束时总会推送
+        self.progress_interval = progress_interval
+        self._tasks = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bulk-ops')
+        # 清理上次运行留下的回收内容
+        self._executor.submit(self._purge_leftovers)
+
+    # ---------- 任务 ----------
+
+    def submit(self, op, paths, dest=None, sid=None):
+        """创建批量任务，返回 (任务字典, 错误, 状态码)；sid 为接收进度推送的 SocketIO 连接"""
+        if op not in OPERATIONS:
+            return None, f'Unsupported operation: {op}', 400
+        if not isinstance(paths, list) or not paths or not all(isinstance(p, str) for p in paths):
+            return None, 'paths must be a non-empty list', 400
+
+        workspace = os.path.abspath('.')
+        abs_paths = []
+        for path in paths:
+            abs_path = os.path.abspath(path)
+            if not abs_path.startswith(workspace + os.sep):
+                return None, f'Permission denied: {path}', 403
+            abs_paths.append(abs_path)
+
+        abs_dest = None
+        if op != 'delete':
+            abs_dest = os.path.abspath(dest or '')
+            if not dest or not (abs_dest == workspace or abs_dest.startswith(workspace + os.sep)):
+                return None, 'Permission denied: dest', 403
+            if not os.path.isdir(abs_dest):
+                return None, 'Destination folder not found', 404
+            for path, abs_path in zip(paths, abs_paths):
+                # 不能把目录移动或复制到其自身内部
+                if abs_dest == abs_path or abs_dest.startswith(abs_path + os.sep):
+                    return None, f'Cannot {op} a folder into itself: {path}', 400
+
+        task = BulkTask(uuid.uuid4().hex, op, abs_paths, abs_dest, sid if isinstance(sid, str) else None)
+        with self._lock:
+            self._tasks[task.task_id] = task
+            while len(self._tasks) > self.max_tasks:
+                oldest_id, oldest = next(iter(self._tasks.items()))
+                if oldest.status == 'running':
+                    break
+                del self._tasks[oldest_id]
+
+        if op == 'delete':
+            # 先全部移入回收目录，请求返回时文件已从工作区消失
+            trashed = []
+            for abs_path in abs_paths:
+                try:
+                    trashed.append((abs_path, self._move_to_trash(abs_path)))
+                except OSError as e:
+                    self._fail_item(task, abs_path, e)
+            for abs_path, trash_path in trashed:
+                self._executor.submit(self._run_item, task, abs_path, self._remove_path, trash_path)
+            if not trashed:
+                self._finish(task)
+        else:
+            for abs_path in abs_paths:
+                self._executor.submit(self._run_item, task, abs_path, getattr(self, '_' + op + '_path'), abs_path)
+        self._emit(task, force=True)
+        return task.to_dict(), None, 202
+
+    def get_task(self, task_id):
+        """获取任务状态"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return task.to_dict() if task else None
+
+    def list_tasks(self):
+        """最近的任务（新任务在前）"""
+        with self._lock:
+            return [task.to_dict() for task in reversed(self._tasks.values())]
+
+    def cancel(self, task_id):
+        """取消任务：尚未开始的条目不再执行（已移入回收目录的删除仍会完成）"""
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            if task.status == 'running' and task.op != 'delete':
+                task.cancelled = True
+            return task.to_dict()
+
+    # ---------- 执行 ----------
+
+    def _run_item(self, task, abs_path, action, target):
+        """在线程池中执行单个条目"""
+        if task.cancelled:
+            self._complete_item(task)
+            return
+        task.current = os.path.relpath(abs_path, os.path.abspath('.'))
+        try:
+            action(target, task)
+        except Exception as e:
+            self._fail_item(task, abs_path, e, count=False)
+        self._complete_item(task)
+
+    def _fail_item(self, task, abs_path, error, count=True):
+        """记录失败的条目"""
+        with self._lock:
+            task.errors.append({
+                'path': os.path.relpath(abs_path, os.path.abspath('.')),
+                'error': str(error)
+            })
+            if count:
+                task.completed += 1
+        logging.warning(f"批量{task.op}失败 {abs_path}: {str(error)}")
+
+    def _complete_item(self, task):
+        """条目完成，全部完成时结束任务"""
+        with self._lock:
+            task.completed += 1
+            done = task.completed >= task.total
+        if done:
+            self._finish(task)
+        else:
+            self._emit(task)
+
+    def _finish(self, task):
+        """结束任务并推送最终状态"""
+        with self._lock:
+            if task.cancelled:
+                task.status = 'cancelled'
+            else:
+                task.status = 'failed' if task.errors else 'done'
+            task.current = None
+            task.finished_at = time.time()
+        self._emit(task, force=True)
+        logging.info(f"批量{task.op}完成: {task.completed}/{task.total}，失败 {len(task.errors)}")
+
+    def _move_to_trash(self, abs_path):
+        """把路径重命名到回收目录（跨文件系统时改名为同目录下的隐藏名称），返回新路径"""
+        if not os.path.lexists(abs_path):
+            raise FileNotFoundError(f'Not found: {abs_path}')
+        name = f'{uuid.uuid4().hex}.{os.path.basename(abs_path)}'
+        os.makedirs(self.trash_dir, exist_ok=True)
+        trash_path = os.path.join(self.trash_dir, name)
+        try:
+            os.rename(abs_path, trash_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            trash_path = os.path.join(os.path.dirname(abs_path), f'.{name}.trash')
+            # 先记录到清单再改名，服务中途退出时下次启动仍能清理
+            with self._lock:
+                with open(self.external_list, 'a', encoding='utf-8') as f:
+                    f.write(trash_path + '\n')
+            os.rename(abs_path, trash_path)
+        self.file_manager.invalidate_listing(abs_path)
+        return trash_path
+
+    def _remove_path(self, path, task=None):
+        """递归删除（不跟随符号链接）"""
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    def _target_for(self, abs_path, task):
+        """移动/复制的目标路径，已存在时报错（不覆盖）"""
+        target = os.path.join(task.dest, os.path.basename(abs_path))
+        if os.path.lexists(target):
+            raise FileExistsError(f'Destination already exists: {os.path.basename(abs_path)}')
+        return target
+
+    def _move_path(self, abs_path, task):
+        """移动（同一文件系统内为 rename，否则复制后删除）"""
+        target = self._target_for(abs_path, task)
+        shutil.move(abs_path, target, copy_function=self._copy_function(task))
+        self.file_manager.invalidate_listing(abs_path)
+        self.file_manager.invalidate_listing(target)
+
+    def _copy_path(self, abs_path, task):
+        """复制文件或目录（保留修改时间，目录内的符号链接按链接复制）"""
+        target = self._target_for(abs_path, task)
+        copy_function = self._copy_function(task)
+        if os.path.isdir(abs_path) and not os.path.islink(abs_path):
+            shutil.copytree(abs_path, target, symlinks=True, copy_function=copy_function)
+        else:
+            copy_function(abs_path, target)
+        self.file_manager.invalidate_listing(target)
+
+    def _copy_function(self, task):
+        """复制单个文件并累计已复制字节数"""
+        def copy(src, dst, *args, **kwargs):
+            result = shutil.copy2(src, dst, follow_symlinks=False)
+            try:
+                size = os.lstat(dst).st_size
+            except OSError:
+                size = 0
+            with self._lock:
+                task.bytes_copied += size
+            self._emit(task)
+            return result
+        return copy
+
+    def _purge_leftovers(self):
+        """删除回收目录和跨文件系统清单中上次运行未删完的内容"""
+        try:
+            with open(self.external_list, 'r', encoding='utf-8') as f:
+                external = [line.rstrip('\n') for line in f if line.strip()]
+        except OSError:
+            external = []
+        for path in external:
+            name = os.path.basename(path)
+            # 只删除本模块生成的隐藏回收名称
+            if not (name.startswith('.') and name.endswith('.trash')) or not os.path.lexists(path):
+                continue
+            try:
+                self._remove_path(path)
+            except OSError as e:
+                logging.warning(f"清理回收路径失败 {path}: {str(e)}")
+
+        try:
+            names = os.listdir(self.trash_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.trash_dir, name)
+            if path == self.external_list:
+                continue
+            try:
+                self._remove_path(path)
+            except OSError as e:
+                logging.warning(f"清理回收目录失败 {name}: {str(e)}")
+        # 本次运行新增的条目在清理开始后追加，只删除已处理的部分
+        with self._lock:
+            try:
+                with open(self.external_list, 'r', encoding='utf-8') as f:
+                    remaining = [line for line in f if line.strip() and line.rstrip('\n') not in external]
+                if remaining:
+                    with open(self.external_list, 'w', encoding='utf-8') as f:
+                        f.writelines(remaining)
+                else:
+                    os.remove(self.external_list)
+            except OSError:
+                pass
+
+    def _emit(self, task, force=False):
+        """向提交任务的连接推送进度（按 progress_interval 限流），没有连接时不推送"""
+        if task.sid is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - task.last_emit < self.progress_interval:
+                return
+            task.last_emit = now
+            payload = task.to_dict()
+        self.socketio.emit('bulk_progress', payload, to=task.sid)
+        socketio_emits_total.inc(event='bulk_progress')
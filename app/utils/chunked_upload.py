@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+分块上传模块
+
+大文件按固定大小分块上传：初始化时在目标目录预分配隐藏的临时文件，
+每个分块直接写入其最终偏移（os.pwrite），因此分块可以乱序、并行上传。
+每个分块携带校验和，服务端边写边计算并比对，不一致的分块不会被记录。
+会话元数据和已接收分块的日志保存在缓存目录，服务重启后仍可查询并续传缺失的分块，
+全部分块到齐后原子重命名为目标文件。
+"""
+
+import os
+import json
+import errno
+import time
+import uuid
+import zlib
+import hashlib
+import logging
+import threading
+
+
+# 支持的分块校验算法
+CHECKSUM_ALGORITHMS = ('crc32', 'sha256', 'md5')
+
+
+class UploadError(Exception):
+    """分块上传错误（附带 HTTP 状态码）"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _Crc32:
+    """与 hashlib 接口一致的 CRC32"""
+
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f'{self.value:08x}'
+
+
+def _new_hasher(algorithm):
+    """创建校验对象"""
+    if algorithm == 'crc32':
+        return _Crc32()
+    return hashlib.new(algorithm)
+
+
+def parse_checksum(value):
+    """解析 "算法:十六进制值" 形式的校验和"""
+    if not value:
+        return None, None
+    algorithm, _, digest = value.partition(':')
+    algorithm = algorithm.strip().lower()
+    if algorithm not in CHECKSUM_ALGORITHMS or not digest:
+        raise UploadError(f'Unsupported checksum: {value}')
+    return algorithm, digest.strip().lower()
+
+
+class UploadSession:
+    """单个分块上传会话"""
+
+    def __init__(self, upload_id, target_path, temp_path, size, part_size, created_at, parts=None):
+        self.upload_id = upload_id
+        self.target_path = target_path
+        self.temp_path = temp_path
+        self.size = size
+        self.part_size = part_size
+        self.created_at = created_at
+        self.updated_at = created_at
+        # 分块序号 -> 校验和
+        self.parts = parts if parts is not None else {}
+
+    @property
+    def total_parts(self):
+        """分块总数（空文件为 0）"""
+        return (self.size + self.part_size - 1) // self.part_size
+
+    def part_length(self, part_number):
+        """分块 part_number（从 0 开始）的字节数"""
+        return min(self.part_size, self.size - part_number * self.part_size)
+
+    def missing_parts(self):
+        """尚未接收的分块序号"""
+        return [n for n in range(self.total_parts) if n not in self.parts]
+
+    def to_dict(self):
+        """转换为字典（返回给前端）"""
+        return {
+            'upload_id': self.upload_id,
+            'path': self.target_path,
+            'size': self.size,
+            'part_size': self.part_size,
+            'total_parts': self.total_parts,
+            'received_parts': sorted(self.parts),
+            'missing_parts': self.missing_parts(),
+            'received_bytes': sum(self.part_length(n) for n in self.parts)
+        }
+
+
+class ChunkedUploadManager:
+    """分块上传会话管理类"""
+
+    def __init__(self, state_dir, default_part_size=8 * 1024 * 1024, max_part_size=64 * 1024 * 1024,
+                 session_ttl=7 * 24 * 3600, write_buffer_size=1024 * 1024):
+        self.state_dir = state_dir
+        self.default_part_size = default_part_size
+        self.max_part_size = max_part_size
+        self.session_ttl = session_ttl
+        self.write_buffer_size = write_buffer_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    # ---------- 会话持久化 ----------
+
+    def _meta_path(self, upload_id):
+        return os.path.join(self.state_dir, upload_id + '.json')
+
+    def _journal_path(self, upload_id):
+        return os.path.join(self.state_dir, upload_id + '.parts')
+
+    def _load_session(self, upload_id):
+        """从状态目录恢复会话（服务重启后续传）"""
+        try:
+            with open(self._meta_path(upload_id), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        parts = {}
+        try:
+            with open(self._journal_path(upload_id), 'r', encoding='utf-8') as f:
+                for line in f:
+                    number, _, checksum = line.strip().partition(' ')
+                    if not number.isdigit():
+                        continue
+                    if checksum == '-':
+                        parts.pop(int(number), None)
+                    else:
+                        parts[int(number)] = checksum
+        except OSError:
+            pass
+
+        session = UploadSession(upload_id, meta['target_path'], meta['temp_path'], meta['size'],
+                                meta['part_size'], meta['created_at'], parts)
+        if not os.path.exists(session.temp_path):
+            # 临时文件已丢失，已接收的分块不再有效
+            self._remove_state(upload_id)
+            return None
+        return session
+
+    def _remove_state(self, upload_id):
+        """删除会话的状态文件"""
+        for path in (self._meta_path(upload_id), self._journal_path(upload_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_session(self, upload_id):
+        """获取会话，不存在时抛出 404"""
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise UploadError('Invalid upload id')
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is None:
+                session = self._load_session(upload_id)
+                if session is not None:
+                    self._sessions[upload_id] = session
+        if session is None:
+            raise UploadError('Upload not found', 404)
+        return session
+
+    # ---------- 上传流程 ----------
+
+    def initiate(self, target_path, size, part_size=None):
+        """创建上传会话并预分配临时文件"""
+        if size < 0:
+            raise UploadError('Invalid size')
+        part_size = part_size or self.default_part_size
+        if not 0 < part_size <= self.max_part_size:
+            raise UploadError(f'part_size must be between 1 and {self.max_part_size}')
+
+        self.cleanup_expired()
+        upload_id = uuid.uuid4().hex
+        directory, name = os.path.split(target_path)
+        # 以 . 开头，文件树中会被过滤
+        temp_path = os.path.join(directory, f'.{name}.{upload_id}.upload')
+
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            if size:
+                if hasattr(os, 'posix_fallocate'):
+                    try:
+                        os.posix_fallocate(fd, 0, size)
+                    except OSError as e:
+                        # 部分文件系统不支持 fallocate，退回稀疏文件；空间不足则直接失败
+                        if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                            raise
+                        os.ftruncate(fd, size)
+                else:
+                    os.ftruncate(fd, size)
+        except OSError:
+            os.close(fd)
+            os.remove(temp_path)
+            raise
+        os.close(fd)
+
+        session = UploadSession(upload_id, target_path, temp_path, size, part_size, time.time())
+        os.makedirs(self.state_dir, exist_ok=True)
+        with open(self._meta_path(upload_id), 'w', encoding='utf-8') as f:
+            json.dump({
+                'target_path': target_path,
+                'temp_path': temp_path,
+                'size': size,
+                'part_size': part_size,
+                'created_at': session.created_at
+            }, f)
+        with self._lock:
+            self._sessions[upload_id] = session
+        return session
+
+    def write_part(self, upload_id, part_number, stream, checksum=None):
+        """把分块数据流写入临时文件的对应偏移，并校验长度和校验和"""
+        session = self.get_session(upload_id)
+        if not 0 <= part_number < session.total_parts:
+            raise UploadError(f'Part number out of range (0-{session.total_parts - 1})')
+        algorithm, expected = parse_checksum(checksum)
+        hasher = _new_hasher(algorithm or 'sha256')
+
+        length = session.part_length(part_number)
+        offset = part_number * session.part_size
+        written = 0
+        fd = os.open(session.temp_path, os.O_WRONLY)
+        try:
+            while written < length:
+                data = stream.read(min(self.write_buffer_size, length - written))
+                if not data:
+                    break
+                hasher.update(data)
+                view = memoryview(data)
+                while view:
+                    n = os.pwrite(fd, view, offset + written)
+                    view = view[n:]
+                    written += n
+            if written != length or stream.read(1):
+                raise UploadError(f'Part {part_number} must be exactly {length} bytes')
+            digest = hasher.hexdigest()
+            if expected is not None and digest != expected:
+                raise UploadError(f'Checksum mismatch for part {part_number}', 422)
+        except Exception:
+            # 该偏移的数据可能已被部分覆盖，之前接收的同一分块不再有效
+            self._record_part(session, part_number, None)
+            raise
+        finally:
+            os.close(fd)
+
+        record = f'{algorithm or "sha256"}:{digest}'
+        self._record_part(session, part_number, record)
+        return {'part': part_number, 'size': length, 'checksum': record,
+                'received': len(session.parts), 'total_parts': session.total_parts}
+
+    def _record_part(self, session, part_number, record):
+        """记录分块已接收（record 为 None 时标记为未接收），同时追加到日志"""
+        with self._lock:
+            if record is None:
+                if session.parts.pop(part_number, None) is None:
+                    return
+            else:
+                session.parts[part_number] = record
+            session.updated_at = time.time()
+            with open(self._journal_path(session.upload_id), 'a', encoding='utf-8') as f:
+                f.write(f'{part_number} {record or "-"}\n')
+
+    def complete(self, upload_id):
+        """所有分块到齐后落盘并原子重命名为目标文件"""
+        session = self.get_session(upload_id)
+        missing = session.missing_parts()
+        if missing:
+            raise UploadError(f'{len(missing)} parts missing', 409)
+
+        fd = os.open(session.temp_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(session.temp_path, session.target_path)
+
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+        self._remove_state(upload_id)
+        return session
+
+    def abort(self, upload_id):
+        """取消上传并删除临时文件"""
+        session = self.get_session(upload_id)
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+        try:
+            os.remove(session.temp_path)
+        except OSError:
+            pass
+        self._remove_state(upload_id)
+        return session
+
+    def cleanup_expired(self):
+        """删除超过有效期未更新的会话及其临时文件"""
+        try:
+            names = os.listdir(self.state_dir)
+        except OSError:
+            return
+        deadline = time.time() - self.session_ttl
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            upload_id = name[:-5]
+            journal = self._journal_path(upload_id)
+            try:
+                last_update = max(os.path.getmtime(os.path.join(self.state_dir, name)),
+                                  os.path.getmtime(journal) if os.path.exists(journal) else 0)
+            except OSError:
+                continue
+            if last_update >= deadline:
+                continue
+            try:
+                self.abort(upload_id)
+                logging.info(f"已清理过期的上传会话: {upload_id}")
+            except UploadError:
+                self._remove_state(upload_id)
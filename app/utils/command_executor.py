@@ -9,6 +9,7 @@ import subprocess
 import logging
 from threading import Thread
 from datetime import datetime
+from .metrics import command_lines_total, socketio_emits_total, socketio_dropped_total
 
 
 class CommandExecutor:
@@ -18,6 +19,7 @@ class CommandExecutor:
         self.socketio = socketio
         self.command_text = ""
         self.command_thread = None
+        self.process = None
         self.log_file = "command_history.log"
         self._load_history()
     
@@ -34,12 +36,27 @@ class CommandExecutor:
         self.command_thread.start()
         return True
     
+    def is_running(self):
+        """是否有命令正在执行"""
+        return bool(self.command_thread and self.command_thread.is_alive())
+    
+    def stop_command(self):
+        """终止正在执行的命令"""
+        process = self.process
+        if not self.is_running() or process is None or process.poll() is not None:
+            return False
+        process.terminate()
+        logging.info("已终止正在执行的命令")
+        return True
+    
     def _emit_output(self, line):
         """发送输出到前端"""
         self.command_text += line + '\n'
         self._save_to_file(line)
+        command_lines_total.inc()
         
         if line.strip() == '':  # 忽略空行
+            socketio_dropped_total.inc(event='command_output', reason='empty')
             return
         
         try:
@@ -48,6 +65,7 @@ class CommandExecutor:
         except:
             # 如果有编码问题，使用错误处理
             self.socketio.emit('command_output', {'data': line.encode('utf-8', errors='replace').decode('utf-8')})
+        socketio_emits_total.inc(event='command_output')
     
     def _run_command(self, command):
         """执行命令的内部方法"""
@@ -58,7 +76,7 @@ class CommandExecutor:
             env['LANG'] = 'zh_CN.UTF-8'
             env['LC_ALL'] = 'zh_CN.UTF-8'
             
-            process = subprocess.Popen(
+            process = self.process = subprocess.Popen(
                 command.split(),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+内容哈希模块
+
+计算文件和文件夹的内容摘要，用于校验复制的检查点是否一致。安装了 xxhash 时默认使用 xxh3_128，
+否则使用 blake2b；文件用可复用的大缓冲区分块读取（hashlib/xxhash 处理大块数据时释放 GIL），
+文件夹中的文件在共享线程池中并行计算。
+摘要按 (设备, inode) 缓存并以大小和修改时间校验，内存 LRU + 磁盘索引，文件未变化时不再读取内容。
+
+文件夹摘要：按相对路径（'/' 分隔）排序后，对每个条目依次计算同一算法的摘要：
+普通文件为 "相对路径\\0文件摘要\\n"，符号链接（不跟随）为 "相对路径\\0link:链接目标\\n"。
+FIFO、设备等特殊文件、无法读取的文件和计算期间被修改或删除的文件不计入摘要，逐个记录在结果的 errors 中。
+"""
+
+import os
+import json
+import stat
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+_INDEX_VERSION = 1
+
+
+class HashError(Exception):
+    """哈希计算错误（附带 HTTP 状态码）"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def available_algorithms():
+    """可用的哈希算法"""
+    algorithms = ['blake2b', 'sha256']
+    if xxhash is not None:
+        algorithms = ['xxh3_128', 'xxh64'] + algorithms
+    return algorithms
+
+
+def default_algorithm():
+    """默认哈希算法：优先 xxhash"""
+    return 'xxh3_128' if xxhash is not None else 'blake2b'
+
+
+def _new_hasher(algo):
+    if algo.startswith('xxh'):
+        return getattr(xxhash, algo)()
+    return hashlib.new(algo)
+
+
+def hash_file(abs_path, algo, chunk_size=HASH_CHUNK_SIZE):
+    """读取文件一遍计算摘要（复用同一个缓冲区，不为每块分配内存）
+
+    以非阻塞方式打开并确认是普通文件，路径被替换成 FIFO 等特殊文件时不会阻塞。
+    """
+    hasher = _new_hasher(algo)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    fd = os.open(abs_path, os.O_RDONLY | getattr(os, 'O_NONBLOCK', 0))
+    if not stat.S_ISREG(os.fstat(fd).st_mode):
+        os.close(fd)
+        raise HashError(f'Not a regular file: {abs_path}', 422)
+    with open(fd, 'rb', buffering=0) as f:
+        while True:
+            length = f.readinto(buffer)
+            if not length:
+                break
+            hasher.update(view[:length])
+    return hasher.hexdigest()
+
+
+class ContentHasher:
+    """内容摘要计算和缓存"""
+
+    def __init__(self, cache_dir=None, workers=4, max_entries=100000):
+        self.index_path = os.path.join(cache_dir, 'content_hash.json') if cache_dir else None
+        self.workers = max(1, workers)
+        self.max_entries = max_entries
+        # 'dev:ino' -> [size, mtime_ns, {algo: digest}]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        # 所有文件夹摘要请求共享的线程池
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='content-hash')
+        self._load()
+
+    def file_digest(self, abs_path, algo):
+        """文件摘要，返回 (摘要, 大小, 是否命中缓存)"""
+        try:
+            stat_info = os.stat(abs_path)
+            key = f'{stat_info.st_dev}:{stat_info.st_ino}'
+            with self._lock:
+                cached = self._entries.get(key)
+                if (cached is not None and cached[0] == stat_info.st_size and
+                        cached[1] == stat_info.st_mtime_ns and algo in cached[2]):
+                    self._entries.move_to_end(key)
+                    return cached[2][algo], stat_info.st_size, True
+
+            digest = hash_file(abs_path, algo)
+            after = os.stat(abs_path)
+        except FileNotFoundError:
+            raise HashError(f'File removed while hashing: {abs_path}', 409)
+        # 计算期间文件被修改时不缓存
+        if (after.st_ino, after.st_size, after.st_mtime_ns) != \
+                (stat_info.st_ino, stat_info.st_size, stat_info.st_mtime_ns):
+            raise HashError(f'File changed while hashing: {abs_path}', 409)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached[0] != stat_info.st_size or cached[1] != stat_info.st_mtime_ns:
+                cached = self._entries[key] = [stat_info.st_size, stat_info.st_mtime_ns, {}]
+            cached[2][algo] = digest
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        return digest, stat_info.st_size, False
+
+    def hash_file(self, abs_path, algo):
+        """单个文件的摘要"""
+        digest, size, cached = self.file_digest(abs_path, algo)
+        return {'type': 'file', 'algo': algo, 'digest': digest, 'size': size, 'cached': cached}
+
+    def hash_folder(self, abs_dir, algo, is_filtered=None, include_files=False):
+        """文件夹摘要（文件并行计算），include_files 时附带每个条目的摘要
+
+        只读取普通文件，符号链接按链接目标记录；特殊文件、无法读取或计算期间变化的文件记录在 errors 中。
+        """
+        entries = []
+        errors = []
+
+        def relative(path):
+            return os.path.relpath(path, abs_dir).replace(os.sep, '/')
+
+        def walk_error(error):
+            errors.append((relative(error.filename), error.strerror or str(error)))
+
+        for dirpath, dirnames, filenames in os.walk(abs_dir, onerror=walk_error):
+            if is_filtered:
+                dirnames[:] = [d for d in dirnames if not is_filtered(d)]
+                filenames = [f for f in filenames if not is_filtered(f)]
+            # 指向目录的符号链接出现在 dirnames 中（os.walk 不会进入）
+            for name in filenames + [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+                abs_path = os.path.join(dirpath, name)
+                relative_path = relative(abs_path)
+                try:
+                    mode = os.lstat(abs_path).st_mode
+                    if stat.S_ISLNK(mode):
+                        entries.append((relative_path, abs_path, os.readlink(abs_path)))
+                    elif stat.S_ISREG(mode):
+                        entries.append((relative_path, abs_path, None))
+                    else:
+                        errors.append((relative_path, 'Not a regular file'))
+                except OSError as e:
+                    errors.append((relative_path, e.strerror or str(e)))
+        entries.sort()
+
+        def digest_entry(entry):
+            relative_path, abs_path, link = entry
+            if link is not None:
+                return None
+            try:
+                return self.file_digest(abs_path, algo)
+            except (HashError, OSError) as e:
+                return e
+
+        results = list(self._executor.map(digest_entry, entries))
+
+        hasher = _new_hasher(algo)
+        total_size = 0
+        file_count = 0
+        link_count = 0
+        cached_count = 0
+        files = []
+        for (relative_path, _, link), result in zip(entries, results):
+            name = relative_path.encode('utf-8', 'surrogateescape') + b'\0'
+            if link is not None:
+                hasher.update(name + b'link:' + link.encode('utf-8', 'surrogateescape') + b'\n')
+                link_count += 1
+                if include_files:
+                    files.append({'path': relative_path, 'link': link})
+                continue
+            if isinstance(result, Exception):
+                # 计算期间被修改、删除或替换为特殊文件（HashError），或无法读取（OSError）
+                if isinstance(result, HashError):
+                    # 去掉消息末尾的绝对路径
+                    error = str(result).rsplit(': ', 1)[0]
+                else:
+                    error = result.strerror or str(result)
+                errors.append((relative_path, error))
+                continue
+            digest, size, cached = result
+            hasher.update(name + digest.encode('ascii') + b'\n')
+            total_size += size
+            file_count += 1
+            cached_count += cached
+            if include_files:
+                files.append({'path': relative_path, 'digest': digest, 'size': size})
+
+        result = {
+            'type': 'folder',
+            'algo': algo,
+            'digest': hasher.hexdigest(),
+            'size': total_size,
+            'file_count': file_count,
+            'link_count': link_count,
+            'cached_files': cached_count,
+            'errors': [{'path': path, 'error': error} for path, error in sorted(errors)]
+        }
+        if include_files:
+            result['files'] = files
+        return result
+
+    def save(self):
+        """有新摘要时写入磁盘索引"""
+        if not self.index_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            # 内层 {algo: digest} 字典会被并发更新，持锁时逐行复制
+            entries = {key: [size, mtime_ns, dict(digests)]
+                       for key, (size, mtime_ns, digests) in self._entries.items()}
+            data = {'version': _INDEX_VERSION, 'entries': entries}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logging.warning(f"保存内容哈希缓存失败: {str(e)}")
+
+    def _load(self):
+        if not self.index_path:
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == _INDEX_VERSION:
+                self._entries.update(data['entries'])
+        except (OSError, ValueError, KeyError):
+            pass
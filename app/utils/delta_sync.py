@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+块哈希增量同步模块（rsync 算法）
+
+服务端为文件生成清单：按固定块大小计算每块的弱哈希（Adler-32，可滚动）和强哈希（MD5），
+清单按文件签名缓存到磁盘，文件未变化时不再重新读取。
+客户端在本地文件上滚动计算弱哈希，命中且强哈希一致的位置引用服务端已有的块，
+其余部分作为字面数据发送；服务端按指令重建到临时文件，校验整文件 MD5 后原子替换。
+
+增量数据格式（二进制流，按顺序排列的指令）：
+- b'C' + >QI(起始块号, 块数)：从原文件复制连续的块
+- b'L' + >I(长度) + 数据：字面数据
+"""
+
+import os
+import json
+import math
+import uuid
+import zlib
+import struct
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+
+MIN_BLOCK_SIZE = 4 * 1024
+MAX_BLOCK_SIZE = 1024 * 1024
+# 单条字面数据指令的最大长度
+MAX_LITERAL = 1024 * 1024
+
+_COPY = b'C'
+_LITERAL = b'L'
+_COPY_STRUCT = struct.Struct('>QI')
+_LITERAL_STRUCT = struct.Struct('>I')
+_ADLER_MOD = 65521
+_MANIFEST_VERSION = 1
+
+
+class DeltaError(Exception):
+    """增量同步错误（附带 HTTP 状态码）"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def block_size_for(size):
+    """按文件大小选择块大小（约为 sqrt(size)，对齐到 1KB）"""
+    block_size = int(math.sqrt(size)) // 1024 * 1024
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, block_size))
+
+
+def signature_token(stat_info):
+    """文件签名字符串，用于校验客户端计算增量时的原文件版本"""
+    return f'{stat_info.st_ino}-{stat_info.st_size}-{stat_info.st_mtime_ns}'
+
+
+def compute_manifest(file_path, block_size=None):
+    """读取文件一遍，计算每块的弱/强哈希和整文件 MD5"""
+    size = os.path.getsize(file_path)
+    block_size = block_size or block_size_for(size)
+    weak = []
+    strong = []
+    file_md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            file_md5.update(block)
+            weak.append(zlib.adler32(block))
+            strong.append(hashlib.md5(block).hexdigest())
+    return {
+        'size': size,
+        'block_size': block_size,
+        'md5': file_md5.hexdigest(),
+        'weak': weak,
+        'strong': strong
+    }
+
+
+class ManifestCache:
+    """文件清单缓存：内存 LRU + 磁盘，按文件签名校验"""
+
+    def __init__(self, cache_dir=None, max_entries=64):
+        self.cache_dir = os.path.join(cache_dir, 'sync_manifest') if cache_dir else None
+        self.max_entries = max_entries
+        # abs_path -> (signature, manifest)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sidecar_path(self, abs_path):
+        digest = hashlib.sha1(abs_path.encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + '.json')
+
+    def get(self, abs_path):
+        """获取与当前文件内容一致的清单（未命中时计算并缓存）"""
+        signature = signature_token(os.stat(abs_path))
+        with self._lock:
+            cached = self._entries.get(abs_path)
+            if cached is not None and cached[0] == signature:
+                self._entries.move_to_end(abs_path)
+                return dict(cached[1], signature=signature)
+
+        manifest = self._load(abs_path, signature)
+        if manifest is None:
+            manifest = compute_manifest(abs_path)
+            # 计算期间文件被修改时不缓存
+            if signature_token(os.stat(abs_path)) != signature:
+                raise DeltaError('File changed while hashing', 409)
+            self._save(abs_path, signature, manifest)
+
+        with self._lock:
+            self._entries[abs_path] = (signature, manifest)
+            self._entries.move_to_end(abs_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dict(manifest, signature=signature)
+
+    def _load(self, abs_path, signature):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._sidecar_path(abs_path), 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('version') == _MANIFEST_VERSION and cached.get('path') == abs_path \
+                    and cached.get('signature') == signature:
+                return cached['manifest']
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def _save(self, abs_path, signature, manifest):
+        if not self.cache_dir:
+            return
+        sidecar = self._sidecar_path(abs_path)
+        try:
+            os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+            tmp_path = f"{sidecar}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': _MANIFEST_VERSION, 'path': abs_path,
+                           'signature': signature, 'manifest': manifest}, f)
+            os.replace(tmp_path, sidecar)
+        except OSError as e:
+            logging.warning(f"保存同步清单缓存失败 {abs_path}: {str(e)}")
+
+
+# ---------- 客户端：计算增量 ----------
+
+def _adler_roll(weak, out_byte, in_byte, block_len):
+    """Adler-32 滚动：窗口移出 out_byte、移入 in_byte"""
+    a = weak & 0xFFFF
+    b = weak >> 16
+    a = (a - out_byte + in_byte) % _ADLER_MOD
+    b = (b - block_len * out_byte + a - 1) % _ADLER_MOD
+    return (b << 16) | a
+
+
+def iter_delta(data, manifest):
+    """根据服务端清单计算本地数据 data 的增量指令
+
+    生成 ('copy', 起始块号, 块数) 或 ('literal', bytes)。
+    先在当前位置用 zlib 计算整块弱哈希（未修改区域按块对齐，直接命中）；
+    未命中时逐字节滚动查找，直到重新对齐到服务端的某个块。
+    """
+    block_size = manifest['block_size']
+    weak_index = {}
+    for i, weak in enumerate(manifest['weak']):
+        weak_index.setdefault(weak, []).append(i)
+    strong = manifest['strong']
+    last_block = len(strong) - 1
+    last_block_len = manifest['size'] - last_block * block_size if strong else 0
+
+    def match(start, end, weak):
+        candidates = weak_index.get(weak)
+        if not candidates:
+            return None
+        digest = None
+        for i in candidates:
+            length = last_block_len if i == last_block else block_size
+            if length != end - start:
+                continue
+            if digest is None:
+                digest = hashlib.md5(data[start:end]).hexdigest()
+            if digest == strong[i]:
+                return i
+        return None
+
+    size = len(data)
+    pos = 0
+    literal_start = 0
+    pending_copy = None
+    ops = []
+    if not strong:
+        # 服务端文件为空，全部作为字面数据
+        pos = size
+
+    def emit_literal(start, end):
+        for offset in range(start, end, MAX_LITERAL):
+            ops.append(('literal', bytes(data[offset:min(end, offset + MAX_LITERAL)])))
+
+    def emit_copy(block, start, end):
+        """记录匹配到的块（start 之前未匹配的部分作为字面数据）"""
+        nonlocal pending_copy, literal_start
+        if pending_copy and (start > literal_start or pending_copy[0] + pending_copy[1] != block):
+            ops.append(('copy',) + pending_copy)
+            pending_copy = None
+        emit_literal(literal_start, start)
+        # 合并连续块的复制指令
+        pending_copy = (pending_copy[0], pending_copy[1] + 1) if pending_copy else (block, 1)
+        literal_start = end
+
+    while pos < size:
+        end = min(pos + block_size, size)
+        weak = zlib.adler32(data[pos:end])
+        block = match(pos, end, weak)
+        # 逐字节滚动查找
+        while block is None and end < size:
+            weak = _adler_roll(weak, data[pos], data[end], end - pos)
+            pos += 1
+            end += 1
+            block = match(pos, end, weak)
+        if block is None:
+            break
+        emit_copy(block, pos, end)
+        pos = end
+        yield from ops
+        ops.clear()
+
+    # 服务端末尾的不完整块只可能匹配本地数据的末尾
+    if literal_start < size and 0 < last_block_len < block_size and size - last_block_len >= literal_start:
+        tail_start = size - last_block_len
+        if hashlib.md5(data[tail_start:]).hexdigest() == strong[last_block]:
+            emit_copy(last_block, tail_start, size)
+
+    if pending_copy:
+        ops.append(('copy',) + pending_copy)
+    emit_literal(literal_start, size)
+    yield from ops
+
+
+def encode_delta(ops):
+    """把增量指令编码为二进制流"""
+    for op in ops:
+        if op[0] == 'copy':
+            yield _COPY + _COPY_STRUCT.pack(op[1], op[2])
+        else:
+            yield _LITERAL + _LITERAL_STRUCT.pack(len(op[1])) + op[1]
+
+
+# ---------- 服务端：重建文件 ----------
+
+def _read_exact(stream, length):
+    """从请求流读取恰好 length 字节"""
+    chunks = []
+    remaining = length
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            raise DeltaError('Truncated delta stream')
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def apply_delta(target_path, stream, expected_md5, base_signature=None, mtime=None):
+    """按增量指令流重建文件：写入同目录临时文件，校验 MD5 后原子替换
+
+    base_signature 为客户端计算增量时原文件的签名，原文件已变化时返回 409
+    （签名一致时块大小与清单相同，可由文件大小算出）。
+    """
+    basis = None
+    if os.path.exists(target_path):
+        basis = open(target_path, 'rb')
+    try:
+        if basis is not None:
+            stat_info = os.fstat(basis.fileno())
+            if base_signature != signature_token(stat_info):
+                raise DeltaError('Target file changed since the manifest was fetched', 409)
+            basis_size = stat_info.st_size
+            block_size = block_size_for(basis_size)
+        elif base_signature:
+            raise DeltaError('Target file no longer exists', 409)
+
+        directory, name = os.path.split(target_path)
+        tmp_path = os.path.join(directory, f'.{name}.{uuid.uuid4().hex}.sync')
+        file_md5 = hashlib.md5()
+        written = 0
+        try:
+            with open(tmp_path, 'wb') as out:
+                while True:
+                    opcode = stream.read(1)
+                    if not opcode:
+                        break
+                    if opcode == _COPY:
+                        if basis is None:
+                            raise DeltaError('Copy instruction without an existing file')
+                        start, count = _COPY_STRUCT.unpack(_read_exact(stream, _COPY_STRUCT.size))
+                        offset = start * block_size
+                        length = min(count * block_size, basis_size - offset)
+                        if count <= 0 or offset >= basis_size:
+                            raise DeltaError(f'Copy instruction out of range: block {start}')
+                        basis.seek(offset)
+                        while length > 0:
+                            chunk = basis.read(min(length, MAX_LITERAL))
+                            file_md5.update(chunk)
+                            out.write(chunk)
+                            written += len(chunk)
+                            length -= len(chunk)
+                    elif opcode == _LITERAL:
+                        length = _LITERAL_STRUCT.unpack(_read_exact(stream, _LITERAL_STRUCT.size))[0]
+                        if length > MAX_LITERAL:
+                            raise DeltaError('Literal instruction too large')
+                        chunk = _read_exact(stream, length)
+                        file_md5.update(chunk)
+                        out.write(chunk)
+                        written += len(chunk)
+                    else:
+                        raise DeltaError(f'Unknown instruction: {opcode!r}')
+
+                if file_md5.hexdigest() != expected_md5:
+                    raise DeltaError('Reconstructed file checksum mismatch', 422)
+                out.flush()
+                os.fsync(out.fileno())
+
+            if basis is not None:
+                os.chmod(tmp_path, stat_info.st_mode & 0o7777)
+            if mtime is not None:
+                os.utime(tmp_path, (mtime, mtime))
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    finally:
+        if basis is not None:
+            basis.close()
+    return {'size': written, 'md5': expected_md5}
@@ -4,28 +4,118 @@
 """
 
 import os
+import re
+import errno
+import codecs
+import random
 import shutil
-import zipfile
-import tempfile
 import mimetypes
 import base64
 import urllib.parse
-import hashlib
 import time
-from flask import send_from_directory, send_file, jsonify
+import json
+import bisect
+import tempfile
+import logging
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from flask import jsonify, Response, send_file
 from functools import lru_cache
+from .metrics import preview_cache_requests_total, preview_cache_evictions_total
+from .zip_stream import iter_zip_stream, iter_tar_zst_stream, tar_zst_available
+from .range_response import send_file_with_ranges, attachment_header
+from .text_pager import TextPager
+from .text_encoding import SAMPLE_SIZE, detect_encoding, is_byte_line_encoding
+from .thumbnailer import Thumbnailer, thumbnails_available
+from .artifact_inspector import is_artifact, has_artifact_extension, inspect_artifact
+from .table_preview import TableScanner, is_table_file, load_summary, save_summary
+from .chunked_upload import ChunkedUploadManager, UploadError
+from .delta_sync import ManifestCache, DeltaError, apply_delta
+from .size_index import DirectorySizeIndex
+from .file_search import PathIndex, search_names, search_content, compile_content_pattern
+from .text_patch import PatchError, content_version, check_base, apply_line_patch, write_atomic
+from .content_hash import ContentHasher, HashError, available_algorithms, default_algorithm
+
+
+# 目录索引条目：signature 仅目录有效，用于校验 has_children 缓存
+ListingEntry = namedtuple('ListingEntry', ['name', 'is_dir', 'size', 'mtime', 'signature'])
 
 
 class FileManager:
-    """文件管理器类 - 优化版本"""
+    """文件管理器类 - 优化版本
+    
+    应用内共享同一个实例（见 file_routes.file_manager），预览缓存为按字节预算淘汰的 LRU，
+    所有缓存操作线程安全。
+    """
     
-    def __init__(self, filter_enabled=True, env_dir_name=".conda"):
+    def __init__(self, filter_enabled=True, env_dir_name=".conda", cache_max_bytes=64 * 1024 * 1024,
+                 listing_cache_max_dirs=256, listing_max_age=30, zip_compresslevel=6,
+                 zip_workers=1, cache_dir=None, thumbnail_cache_max_bytes=512 * 1024 * 1024,
+                 table_time_budget=3.0, upload_part_size=8 * 1024 * 1024,
+                 size_index_enabled=True, size_index_refresh_interval=60,
+                 search_workers=4, search_max_file_size=16 * 1024 * 1024, hash_workers=4):
         self.filter_enabled = filter_enabled
         self.env_dir_name = env_dir_name
-        # 文件预览缓存
-        self._preview_cache = {}
-        self._cache_max_size = 50  # 最大缓存文件数
+        # 文件预览缓存：abs_path -> {'content', 'signature', 'size'}，按访问顺序排列
+        self._preview_cache = OrderedDict()
+        self._cache_lock = Lock()
+        self._cache_max_bytes = cache_max_bytes  # 缓存总字节预算
+        self._cache_bytes = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evictions = 0
+        # 目录列表缓存：abs_dir -> {'signature', 'scanned_at', 'items'}
+        self._listing_cache = OrderedDict()
+        self._listing_cache_max_dirs = listing_cache_max_dirs
+        # 超过该时长强制重新扫描，以刷新目录内文件的大小/修改时间
+        self._listing_max_age = listing_max_age
+        # 子目录是否非空的缓存：abs_dir -> (signature, has_children)
+        self._children_cache = OrderedDict()
+        self._children_cache_max_size = 100000
+        self._listing_lock = Lock()
+        # 文件夹打包下载的 deflate 压缩级别
+        self.zip_compresslevel = zip_compresslevel
+        # 打包下载的压缩线程数上限（留出 CPU 给训练任务）
+        self.zip_workers = max(1, zip_workers)
         self._max_preview_size = 10 * 1024 * 1024  # 10MB 最大预览文件大小
+        # 文件编码缓存：abs_path -> (signature, encoding)
+        self._encoding_cache = OrderedDict()
+        self._encoding_cache_max_size = 4096
+        # 磁盘缓存目录（行索引等），为 None 时不持久化
+        self.cache_dir = cache_dir
+        # 大文本分页读取（行索引持久化到 cache_dir）
+        self.text_pager = TextPager(cache_dir=cache_dir)
+        # 图片缩略图（缓存到 cache_dir，未安装 Pillow 时为 None）
+        self.thumbnailer = None
+        if cache_dir and thumbnails_available():
+            self.thumbnailer = Thumbnailer(cache_dir, max_cache_bytes=thumbnail_cache_max_bytes)
+        # 表格文件（CSV/TSV/JSONL）单次遍历汇总，结果按文件签名缓存
+        self.table_scanner = TableScanner(time_budget=table_time_budget)
+        # 请求内未遍历完的表格在后台完整遍历：abs_path -> (signature, 部分结果)
+        self._table_partials = {}
+        self._table_lock = Lock()
+        self._table_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='table-preview')
+        # 大文件分块上传（会话状态保存在 cache_dir，服务重启后可续传）
+        self.uploads = ChunkedUploadManager(
+            os.path.join(cache_dir or tempfile.gettempdir(), 'uploads'),
+            default_part_size=upload_part_size
+        )
+        # 增量同步的块哈希清单（按文件签名缓存到 cache_dir）
+        self.sync_manifests = ManifestCache(cache_dir)
+        # 目录递归大小的后台索引（列表中只读取结果，不阻塞请求）
+        self.size_index = None
+        if size_index_enabled:
+            self.size_index = DirectorySizeIndex(cache_dir, refresh_interval=size_index_refresh_interval)
+        # 文件搜索：增量维护的路径索引（过滤规则与文件树一致）和内容搜索线程数
+        self.path_index = PathIndex(self._is_filtered)
+        self.search_workers = max(1, search_workers)
+        # 所有内容搜索共享的线程池
+        self._search_executor = ThreadPoolExecutor(max_workers=self.search_workers,
+                                                   thread_name_prefix='file-search')
+        self.search_max_file_size = search_max_file_size
+        # 内容摘要（按 inode + 大小 + 修改时间缓存到 cache_dir，文件夹并行计算）
+        self.content_hashes = ContentHasher(cache_dir, workers=hash_workers)
         
         # 支持的文件类型扩展
         self.text_extensions = {
@@ -52,65 +142,424 @@ class FileManager:
     
     def get_directory_listing(self, root_path, sort='default'):
         """获取目录列表 - 平铺展示版本"""
+        return self.get_directory_page(root_path, sort)['items']
+    
+    def get_directory_page(self, root_path, sort='default', limit=None, cursor=None, prefix=None):
+        """分页获取目录列表
+        
+        在缓存的有序索引上按游标分页，只为当前页构建条目字典；
+        cursor 为上一页返回的 next_cursor（只能用于相同的排序方式和前缀），prefix 按名称前缀（不区分大小写）过滤。
+        """
+        abs_root = os.path.abspath(root_path)
+        if sort not in ('name', 'size', 'modified'):
+            sort = 'default'
+        prefix = prefix.lower() if prefix else None
+        entries, keys = self._get_sorted_entries(abs_root, sort)
+        self._add_size_root(abs_root)
+        
+        start = 0
+        if cursor:
+            start = bisect.bisect_right(keys, self._decode_cursor(cursor, sort, prefix))
+        
         items = []
+        # 第一页包含返回上级目录的选项（如果不是根目录）
+        if not cursor and abs_root != os.path.abspath('.'):
+            items.append({
+                'name': '..',
+                'is_dir': True,
+                'size': 0,
+                'modified': 0,
+                'path': os.path.dirname(abs_root),
+                'file_type': 'parent',
+                'is_parent': True
+            })
+        
+        next_cursor = None
+        count = 0
+        for index in range(start, len(entries)):
+            entry = entries[index]
+            if prefix and not entry.name.lower().startswith(prefix):
+                continue
+            if limit is not None and count >= limit:
+                next_cursor = self._encode_cursor(keys[index - 1], sort, prefix)
+                break
+            items.append(self._build_listing_item(abs_root, entry))
+            count += 1
+        
+        # 总数为前缀过滤后的条目数
+        if prefix:
+            total = sum(1 for entry in entries if entry.name.lower().startswith(prefix))
+        else:
+            total = len(entries)
+        
+        return {
+            'items': items,
+            'next_cursor': next_cursor,
+            'total': total
+        }
+    
+    def iter_directory_listing(self, root_path, sort='default', prefix=None):
+        """返回逐条生成目录条目的迭代器（用于 NDJSON 流式输出）
+        
+        目录索引在调用时立即获取，目录不存在等错误不会推迟到开始输出之后。
+        """
+        abs_root = os.path.abspath(root_path)
+        entries, _ = self._get_sorted_entries(abs_root, sort)
+        self._add_size_root(abs_root)
+        prefix = prefix.lower() if prefix else None
+        return (
+            self._build_listing_item(abs_root, entry) for entry in entries
+            if not prefix or entry.name.lower().startswith(prefix)
+        )
+    
+    @staticmethod
+    def _listing_sort_key(sort_type):
+        """目录条目排序键：目录在前，名称作为稳定的次序依据"""
+        if sort_type == 'size':
+            return lambda e: (not e.is_dir, -e.size, e.name.lower(), e.name)
+        elif sort_type == 'modified':
+            return lambda e: (not e.is_dir, -e.mtime, e.name.lower(), e.name)
+        else:  # name / default
+            return lambda e: (not e.is_dir, e.name.lower(), e.name)
+    
+    @staticmethod
+    def _encode_cursor(key, sort_type, prefix):
+        """将排序键连同排序方式和前缀编码为游标"""
+        data = {'sort': sort_type, 'prefix': prefix, 'key': list(key)}
+        return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def _decode_cursor(cursor, sort_type, prefix):
+        """解析游标，排序方式或前缀与生成游标时不一致时报错"""
         try:
-            # 添加返回上级目录的选项（如果不是根目录）
-            abs_root = os.path.abspath(root_path)
-            abs_base = os.path.abspath('.')
-            
-            if abs_root != abs_base:
-                parent_item = {
-                    'name': '..',
-                    'is_dir': True,
-                    'size': 0,
-                    'modified': 0,
-                    'path': os.path.dirname(abs_root),
-                    'file_type': 'parent',
-                    'is_parent': True
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            key = tuple(data['key'])
+        except (ValueError, TypeError, KeyError):
+            raise ValueError('Invalid cursor')
+        if data.get('sort') != sort_type or data.get('prefix') != prefix:
+            raise ValueError('Cursor does not match the requested sort or prefix')
+        return key
+    
+    def _get_sorted_entries(self, abs_root, sort_type):
+        """获取按指定方式排序的目录索引及对应排序键（随目录缓存一起缓存）"""
+        if sort_type not in ('name', 'size', 'modified'):
+            sort_type = 'default'
+        listing = self._get_listing(abs_root)
+        
+        order_key = sort_type
+        if sort_type == 'size' and self.size_index is not None:
+            # 目录大小由后台索引提供，索引更新后重新排序
+            order_key = ('size', self.size_index.version)
+        
+        with self._listing_lock:
+            order = listing['orders'].get(order_key)
+        if order is None:
+            if order_key != sort_type:
+                sizes = {
+                    e.name: self._get_dir_size(os.path.join(abs_root, e.name), e.signature)
+                    for e in listing['entries'] if e.is_dir
                 }
-                items.append(parent_item)
-            
-            entries = list(os.scandir(root_path))
-            
-            for entry in entries:
-                # 过滤特定目录和隐藏文件
-                if self.filter_enabled and (
-                    entry.name == self.env_dir_name or 
-                    entry.name.startswith('.') and entry.name not in {'.gitignore', '.env'}
-                ):
-                    continue
                 
-                try:
-                    stat_info = entry.stat()
-                    item = {
-                        'name': entry.name,
-                        'is_dir': entry.is_dir(),
-                        'size': stat_info.st_size if not entry.is_dir() else 0,
-                        'modified': stat_info.st_mtime,
-                        'path': entry.path,
-                        'relative_path': os.path.relpath(entry.path, abs_base)
-                    }
-                    
-                    if entry.is_dir():
-                        item['file_type'] = 'folder'
-                        item['has_children'] = self._has_children(entry.path)
-                    else:
-                        # 添加文件类型信息
-                        item['file_type'] = self._get_file_type(entry.name)
-                        item['preview_supported'] = self._is_preview_supported(entry.name, stat_info.st_size)
-                        item['editable'] = self._is_text_editable(entry.name, stat_info.st_size)
-                    
-                    items.append(item)
-                    
-                except (OSError, PermissionError):
-                    # 跳过无法访问的文件
-                    continue
+                def key_func(e):
+                    size = (sizes[e.name] or (0, 0))[0] if e.is_dir else e.size
+                    return (not e.is_dir, -size, e.name.lower(), e.name)
+            else:
+                key_func = self._listing_sort_key(sort_type)
+            entries = sorted(listing['entries'], key=key_func)
+            order = (entries, [key_func(e) for e in entries])
+            with self._listing_lock:
+                if order_key != sort_type:
+                    for stale in [k for k in listing['orders'] if isinstance(k, tuple)]:
+                        del listing['orders'][stale]
+                listing['orders'][order_key] = order
+        return order
+    
+    def _get_dir_size(self, abs_dir, signature=None):
+        """目录的 (递归总大小, 文件数)，后台尚未统计完成或未启用时返回 None（不访问文件系统）"""
+        if self.size_index is None:
+            return None
+        return self.size_index.lookup(abs_dir, signature)
+    
+    def _add_size_root(self, abs_root):
+        """当前查看的目录登记到大小索引，后台定期复查其子树"""
+        if self.size_index is not None:
+            self.size_index.add_root(abs_root)
+    
+    def _build_listing_item(self, abs_root, entry):
+        """由紧凑索引条目构建返回给前端的条目字典"""
+        path = os.path.join(abs_root, entry.name)
+        item = {
+            'name': entry.name,
+            'is_dir': entry.is_dir,
+            'size': entry.size,
+            'modified': entry.mtime,
+            'path': path,
+            'relative_path': os.path.relpath(path, os.path.abspath('.'))
+        }
+        
+        if entry.is_dir:
+            item['file_type'] = 'folder'
+            item['has_children'] = self._has_children(path, entry.signature)
+            dir_size = self._get_dir_size(path, entry.signature)
+            if dir_size is not None:
+                item['size'], item['file_count'] = dir_size
+            elif self.size_index is not None:
+                item['size_pending'] = True
+        else:
+            # 添加文件类型信息
+            item['file_type'] = self._get_file_type(entry.name)
+            item['preview_supported'] = self._is_preview_supported(path, entry.size, entry.mtime)
+            item['editable'] = self._is_text_editable(entry.name, entry.size)
+            if self._has_thumbnail(entry.name):
+                item['thumbnail_url'] = self._thumbnail_url(item['relative_path'], entry.mtime, 128)
+        
+        return item
+    
+    def describe_entry(self, abs_dir, name):
+        """构建单个目录条目（与目录列表格式一致，用于推送变更），不存在或被过滤时返回 None"""
+        if self._is_filtered(name):
+            return None
+        path = os.path.join(abs_dir, name)
+        try:
+            stat_info = os.stat(path)
+        except OSError:
+            return None
+        is_dir = os.path.isdir(path)
+        entry = ListingEntry(
+            name,
+            is_dir,
+            stat_info.st_size if not is_dir else 0,
+            stat_info.st_mtime,
+            self._get_dir_signature(stat_info) if is_dir else None
+        )
+        return self._build_listing_item(abs_dir, entry)
+    
+    def _get_dir_signature(self, stat_info):
+        """目录签名：子项增删改名都会改变目录的 mtime"""
+        return (stat_info.st_ino, stat_info.st_mtime_ns, stat_info.st_size)
+    
+    def _get_listing(self, abs_root):
+        """获取目录索引，目录签名未变化且未超过最大缓存时长时直接复用缓存"""
+        try:
+            dir_signature = self._get_dir_signature(os.stat(abs_root))
+        except PermissionError:
+            return {'entries': [], 'orders': {}}
+        
+        now = time.time()
+        with self._listing_lock:
+            cached = self._listing_cache.get(abs_root)
+            if (cached is not None and cached['signature'] == dir_signature and
+                    now - cached['scanned_at'] <= self._listing_max_age):
+                self._listing_cache.move_to_end(abs_root)
+                return cached
+        
+        listing = {
+            'signature': dir_signature,
+            'scanned_at': now,
+            'entries': self._scan_directory(abs_root),
+            'orders': {}
+        }
+        
+        with self._listing_lock:
+            self._listing_cache[abs_root] = listing
+            self._listing_cache.move_to_end(abs_root)
+            while len(self._listing_cache) > self._listing_cache_max_dirs:
+                self._listing_cache.popitem(last=False)
+        return listing
+    
+    def _scan_directory(self, abs_root):
+        """扫描目录，构建紧凑索引（只保存名称、类型、大小、修改时间和子目录签名）"""
+        entries = []
+        try:
+            with os.scandir(abs_root) as dir_entries:
+                for entry in dir_entries:
+                    # 过滤特定目录和隐藏文件
+                    if self._is_filtered(entry.name):
+                        continue
                     
+                    try:
+                        stat_info = entry.stat()
+                        is_dir = entry.is_dir()
+                        entries.append(ListingEntry(
+                            entry.name,
+                            is_dir,
+                            stat_info.st_size if not is_dir else 0,
+                            stat_info.st_mtime,
+                            self._get_dir_signature(stat_info) if is_dir else None
+                        ))
+                    except (OSError, PermissionError):
+                        # 跳过无法访问的文件
+                        continue
+                        
         except PermissionError:
             pass  # 忽略权限错误
         
-        # 排序优化
-        return self._sort_items(items, sort)
+        return entries
+    
+    def _is_filtered(self, name):
+        """是否为文件树中隐藏的条目（环境目录和隐藏文件）"""
+        return self.filter_enabled and (
+            name == self.env_dir_name or
+            name.startswith('.') and name not in {'.gitignore', '.env'}
+        )
+    
+    def _get_cached_listing(self, abs_root):
+        """仅在缓存仍然有效时返回目录索引，不触发扫描"""
+        try:
+            dir_signature = self._get_dir_signature(os.stat(abs_root))
+        except OSError:
+            return None
+        with self._listing_lock:
+            cached = self._listing_cache.get(abs_root)
+            if cached is not None and cached['signature'] == dir_signature:
+                return cached
+        return None
+    
+    def sample_directory(self, root_path, n=20, files_only=True, time_budget=2.0, seed=None):
+        """随机抽取目录中的 n 个条目
+        
+        有有效的目录索引缓存时直接从索引中均匀抽样；否则边流式遍历 scandir 边做水塘抽样，
+        遍历只依赖 d_type 不调用 stat，超过 time_budget 秒提前停止（结果只覆盖已遍历部分）。
+        """
+        abs_root = os.path.abspath(root_path)
+        rng = random.Random(seed)
+        cached = self._get_cached_listing(abs_root)
+        
+        if cached is not None:
+            candidates = [e for e in cached['entries'] if not (files_only and e.is_dir)]
+            entries = rng.sample(candidates, min(n, len(candidates)))
+            return {
+                'items': [self._build_listing_item(abs_root, e) for e in entries],
+                'source': 'index',
+                'scanned': len(cached['entries']),
+                'complete': True
+            }
+        
+        reservoir = []
+        scanned = 0
+        seen = 0
+        complete = True
+        deadline = time.monotonic() + time_budget
+        with os.scandir(abs_root) as dir_entries:
+            for entry in dir_entries:
+                scanned += 1
+                # 每 1024 个条目检查一次时间预算
+                if scanned % 1024 == 0 and time.monotonic() > deadline:
+                    complete = False
+                    break
+                if self._is_filtered(entry.name):
+                    continue
+                try:
+                    if files_only and not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                seen += 1
+                if len(reservoir) < n:
+                    reservoir.append(entry.name)
+                else:
+                    j = rng.randrange(seen)
+                    if j < n:
+                        reservoir[j] = entry.name
+        
+        # 只对抽中的条目调用 stat
+        items = []
+        for name in reservoir:
+            try:
+                stat_info = os.stat(os.path.join(abs_root, name))
+            except OSError:
+                continue
+            is_dir = os.path.isdir(os.path.join(abs_root, name))
+            entry = ListingEntry(name, is_dir, 0 if is_dir else stat_info.st_size, stat_info.st_mtime,
+                                 self._get_dir_signature(stat_info) if is_dir else None)
+            items.append(self._build_listing_item(abs_root, entry))
+        
+        return {'items': items, 'source': 'scan', 'scanned': scanned, 'complete': complete}
+    
+    def sample(self, path, n=20, files_only=True, time_budget=2.0, seed=None):
+        """随机抽样：目录返回随机条目，文本文件返回随机行"""
+        abs_path = os.path.abspath(path)
+        
+        # 安全检查：防止越权访问
+        if not abs_path.startswith(os.path.abspath('.')):
+            return {'error': 'Permission denied'}, 403
+        
+        try:
+            if os.path.isdir(abs_path):
+                result = self.sample_directory(abs_path, n, files_only, time_budget, seed)
+                result['type'] = 'directory'
+                return result, 200
+            
+            if os.path.isfile(abs_path):
+                encoding = self._get_file_encoding(abs_path, self._get_file_signature(abs_path))
+                if not is_byte_line_encoding(encoding):
+                    return {'error': f'Line sampling does not support {encoding} files'}, 422
+                result = self.text_pager.sample_lines(abs_path, n, encoding, random.Random(seed))
+                result['type'] = 'lines'
+                return result, 200
+            
+            return {'error': 'Path not found'}, 404
+        except PermissionError:
+            return {'error': 'Permission denied'}, 403
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    def search(self, root_path, query, mode='name', max_results=500, time_budget=10.0,
+               use_regex=False, case_sensitive=False):
+        """搜索工作区文件：mode=name 按名称（通配符或子串），mode=content 按文件内容
+        
+        返回 (逐条生成结果的迭代器, 错误, 状态码)，迭代器最后生成一条 done 汇总。
+        """
+        abs_root = os.path.abspath(root_path)
+        if not abs_root.startswith(os.path.abspath('.')):
+            return None, 'Permission denied', 403
+        if not os.path.isdir(abs_root):
+            return None, 'Not a folder', 404
+        if not query:
+            return None, 'Empty query', 400
+        
+        if mode == 'name':
+            return search_names(self.path_index, abs_root, query, max_results, time_budget), None, 200
+        if mode != 'content':
+            return None, f'Unsupported mode: {mode}', 400
+        
+        try:
+            regex = compile_content_pattern(query, use_regex, case_sensitive)
+        except re.error as e:
+            return None, f'Invalid regex: {str(e)}', 400
+        
+        def encoding_for(abs_path, data):
+            return self._get_file_encoding(abs_path, self._get_file_signature(abs_path), data, complete=True)
+        
+        results = search_content(
+            self.path_index, abs_root, regex, encoding_for,
+            self._search_executor,
+            skip_file=self._is_search_skipped,
+            workers=self.search_workers,
+            max_results=max_results,
+            time_budget=time_budget,
+            max_file_size=self.search_max_file_size
+        )
+        return results, None, 200
+    
+    def _is_search_skipped(self, filename):
+        """内容搜索跳过的文件（图片、音视频和模型检查点等二进制格式）"""
+        ext = os.path.splitext(filename)[1].lower()
+        return (ext in self.image_extensions or ext in self.video_extensions or
+                ext in self.audio_extensions or has_artifact_extension(filename))
+    
+    def invalidate_listing(self, path):
+        """使目录列表缓存失效（文件变更或监听到文件系统事件时调用）"""
+        abs_path = os.path.abspath(path)
+        if self.size_index is not None:
+            self.size_index.invalidate(abs_path)
+        self.path_index.invalidate(abs_path)
+        with self._listing_lock:
+            self._listing_cache.pop(abs_path, None)
+            self._children_cache.pop(abs_path, None)
+            parent = os.path.dirname(abs_path)
+            self._listing_cache.pop(parent, None)
+            self._children_cache.pop(parent, None)
     
     def _is_text_editable(self, filename, file_size):
         """检查文件是否可编辑"""
@@ -121,31 +570,27 @@ class FileManager:
         ext = os.path.splitext(filename)[1].lower()
         return ext in self.text_extensions
     
-    def _sort_items(self, items, sort_type):
-        """排序文件列表"""
-        # 将父目录(..)始终放在最前面
-        parent_items = [item for item in items if item.get('is_parent', False)]
-        regular_items = [item for item in items if not item.get('is_parent', False)]
+    def _has_children(self, dir_path, signature=None):
+        """检查目录是否有子项，结果按子目录签名缓存"""
+        if signature is not None:
+            with self._listing_lock:
+                cached = self._children_cache.get(dir_path)
+                if cached is not None and cached[0] == signature:
+                    return cached[1]
         
-        if sort_type == 'name':
-            regular_items.sort(key=lambda x: (not x['is_dir'], x['name'].lower()))
-        elif sort_type == 'size':
-            regular_items.sort(key=lambda x: (not x['is_dir'], -x.get('size', 0)))
-        elif sort_type == 'modified':
-            regular_items.sort(key=lambda x: (not x['is_dir'], -x.get('modified', 0)))
-        else:  # default
-            regular_items.sort(key=lambda x: (not x['is_dir'], x['name'].lower()))
-        
-        return parent_items + regular_items
-    
-    def _has_children(self, dir_path):
-        """检查目录是否有子项"""
         try:
-            for _ in os.scandir(dir_path):
-                return True
-            return False
+            with os.scandir(dir_path) as entries:
+                has_children = next(entries, None) is not None
         except (OSError, PermissionError):
-            return False
+            has_children = False
+        
+        if signature is not None:
+            with self._listing_lock:
+                self._children_cache[dir_path] = (signature, has_children)
+                self._children_cache.move_to_end(dir_path)
+                while len(self._children_cache) > self._children_cache_max_size:
+                    self._children_cache.popitem(last=False)
+        return has_children
     
     def _get_file_type(self, filename):
         """获取文件类型"""
@@ -161,10 +606,13 @@ class FileManager:
         else:
             return 'other'
     
-    def _is_preview_supported(self, filename, file_size):
-        """检查文件是否支持预览"""
+    def _is_preview_supported(self, filename, file_size, mtime=None):
+        """检查文件是否支持预览（.bin 需传入完整路径以检查文件头）"""
+        if is_artifact(filename, mtime) or is_table_file(filename):
+            return True
         if file_size > self._max_preview_size:
-            return False
+            # 大图片仍可通过缩略图预览
+            return self._has_thumbnail(filename)
         
         ext = os.path.splitext(filename)[1].lower()
         return ext in (self.text_extensions | self.image_extensions | self.video_extensions)
@@ -198,20 +646,29 @@ class FileManager:
         if not os.path.isfile(abs_path):
             return {'error': 'Not a file'}, 404
         
-        # 文件大小检查
+        # 文件大小检查（模型/数组文件只读取头部，表格文件流式遍历，均不受限制）
         file_size = os.path.getsize(abs_path)
-        if file_size > self._max_preview_size:
+        if file_size > self._max_preview_size and not is_artifact(abs_path) and not is_table_file(abs_path):
+            mime, _ = mimetypes.guess_type(abs_path)
+            if self._has_thumbnail(abs_path):
+                return self._preview_image_file(abs_path, mime, file_size), 200
+            if self._is_text_file(abs_path, mime or ''):
+                # 大文本文件改为分页查看（/api/text_page）
+                return {
+                    'type': 'text_paged',
+                    'size': file_size,
+                    'language': self._detect_language(os.path.splitext(abs_path)[1].lower())
+                }, 200
             return {
                 'error': f'File too large for preview (max {self._max_preview_size // 1024 // 1024}MB)',
                 'size': file_size
             }, 413
         
         # 检查缓存
-        file_hash = self._get_file_hash(abs_path)
-        if file_hash in self._preview_cache:
-            cache_entry = self._preview_cache[file_hash]
-            if cache_entry['mtime'] == os.path.getmtime(abs_path):
-                return cache_entry['content'], 200
+        signature = self._get_file_signature(abs_path)
+        cached = self._get_cached_preview(abs_path, signature)
+        if cached is not None:
+            return cached, 200
         
         # 获取MIME类型
         mime, _ = mimetypes.guess_type(abs_path)
@@ -221,9 +678,17 @@ class FileManager:
         try:
             result = None
             
+            # 模型/数组文件只解析头部
+            if is_artifact(abs_path):
+                result = self._preview_artifact_file(abs_path, file_size)
+            
+            # 表格文件流式汇总
+            elif is_table_file(abs_path):
+                result = self._preview_table_file(abs_path, file_size, signature)
+            
             # 文本文件处理
-            if self._is_text_file(abs_path, mime):
-                result = self._preview_text_file(abs_path, file_size)
+            elif self._is_text_file(abs_path, mime):
+                result = self._preview_text_file(abs_path, file_size, signature)
             
             # 图片文件处理
             elif mime.startswith('image'):
@@ -245,19 +710,19 @@ class FileManager:
                     'message': 'Preview not supported for this file type'
                 }
             
-            # 缓存结果
-            if result and result.get('type') != 'error':
-                self._cache_preview(file_hash, abs_path, result)
+            # 缓存结果（后台仍在遍历的表格部分结果不缓存）
+            if result and result.get('type') != 'error' and result.get('complete', True):
+                self._cache_preview(abs_path, signature, result)
             
             return result, 200
                 
         except Exception as e:
             return {'error': str(e), 'type': 'error'}, 500
     
-    def _get_file_hash(self, file_path):
-        """获取文件哈希值用于缓存"""
+    def _get_file_signature(self, file_path):
+        """获取文件签名（inode、大小、修改时间），用于校验缓存是否过期"""
         stat = os.stat(file_path)
-        return hashlib.md5(f"{file_path}:{stat.st_size}:{stat.st_mtime}".encode()).hexdigest()
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
     
     def _is_text_file(self, file_path, mime):
         """判断是否为文本文件"""
@@ -266,33 +731,72 @@ class FileManager:
                 ext in self.text_extensions or
                 mime in {'application/json', 'application/xml', 'application/javascript'})
     
-    def _preview_text_file(self, file_path, file_size):
-        """预览文本文件"""
+    def _get_file_encoding(self, file_path, signature, data=None, complete=False):
+        """获取文件编码：按 stat 签名缓存，未命中时检测 data（未提供时读取文件开头的样本）"""
+        with self._cache_lock:
+            cached = self._encoding_cache.get(file_path)
+            if cached is not None and cached[0] == signature:
+                self._encoding_cache.move_to_end(file_path)
+                return cached[1]
+        
+        if data is None:
+            with open(file_path, 'rb') as f:
+                data = f.read(SAMPLE_SIZE)
+            complete = len(data) < SAMPLE_SIZE
+        encoding = detect_encoding(data[:SAMPLE_SIZE], complete and len(data) <= SAMPLE_SIZE)
+        self._store_file_encoding(file_path, signature, encoding)
+        return encoding
+    
+    def _store_file_encoding(self, file_path, signature, encoding):
+        """写入编码缓存"""
+        with self._cache_lock:
+            self._encoding_cache[file_path] = (signature, encoding)
+            self._encoding_cache.move_to_end(file_path)
+            while len(self._encoding_cache) > self._encoding_cache_max_size:
+                self._encoding_cache.popitem(last=False)
+    
+    def read_text_page(self, file_path, start_line=1, line_count=200, tail=None):
+        """分页读取文本文件（行号从 1 开始；tail 为读取末尾的行数）"""
+        abs_path = os.path.abspath(file_path)
+        
+        # 安全检查：防止越权访问
+        if not abs_path.startswith(os.path.abspath('.')):
+            return {'error': 'Permission denied'}, 403
+        
+        if not os.path.isfile(abs_path):
+            return {'error': 'Not a file'}, 404
+        
+        try:
+            encoding = self._get_file_encoding(abs_path, self._get_file_signature(abs_path))
+            if not is_byte_line_encoding(encoding):
+                return {'error': f'Paged view does not support {encoding} files'}, 422
+            if tail:
+                result = self.text_pager.read_tail(abs_path, tail, encoding)
+            else:
+                result = self.text_pager.read_page(abs_path, max(start_line, 1) - 1, line_count, encoding)
+            if result['start_line'] is not None:
+                result['start_line'] += 1
+                result['next_line'] += 1
+            return result, 200
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    def _preview_text_file(self, file_path, file_size, signature):
+        """预览文本文件（只读取一次，编码按样本检测）"""
         # 大文件只读取前部分
         max_chars = 100000  # 最大字符数
+        max_bytes = max_chars * 4  # UTF-8 单个字符最多 4 字节
         
         try:
-            # 尝试不同编码
-            encodings = ['utf-8', 'gbk', 'gb2312', 'latin1']
-            content = None
-            used_encoding = None
-            
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as f:
-                        if file_size > max_chars:
-                            content = f.read(max_chars)
-                            truncated = True
-                        else:
-                            content = f.read()
-                            truncated = False
-                    used_encoding = encoding
-                    break
-                except UnicodeDecodeError:
-                    continue
+            with open(file_path, 'rb') as f:
+                data = f.read(max_bytes)
+            complete = len(data) >= file_size
             
-            if content is None:
-                return {'error': 'Unable to decode file', 'type': 'error'}
+            used_encoding = self._get_file_encoding(file_path, signature, data, complete)
+            decoder = codecs.getincrementaldecoder(used_encoding)(errors='replace')
+            content = decoder.decode(data, final=complete)
+            truncated = not complete or len(content) > max_chars
+            content = content[:max_chars]
             
             # 检测编程语言
             ext = os.path.splitext(file_path)[1].lower()
@@ -303,7 +807,7 @@ class FileManager:
                 'content': content,
                 'encoding': used_encoding,
                 'language': language,
-                'truncated': truncated if file_size > max_chars else False,
+                'truncated': truncated,
                 'size': file_size,
                 'lines': content.count('\n') + 1
             }
@@ -311,30 +815,120 @@ class FileManager:
         except Exception as e:
             return {'error': str(e), 'type': 'error'}
     
+    def _preview_artifact_file(self, file_path, file_size):
+        """预览模型/数组文件的结构信息（只读取文件头部）"""
+        try:
+            result = inspect_artifact(file_path)
+            result['type'] = 'artifact'
+            result['size'] = file_size
+            return result
+        except Exception as e:
+            return {'error': f'Unable to parse header: {str(e)}', 'type': 'error'}
+    
+    def _preview_table_file(self, file_path, file_size, signature):
+        """预览表格文件：首末页、行样本和列统计（磁盘缓存命中时不重新遍历）
+        
+        请求内的遍历超过时间预算时返回部分结果（complete=False），并在后台完整遍历；
+        后台遍历期间再次请求直接返回同一份部分结果。
+        """
+        try:
+            summary = load_summary(self.cache_dir, file_path, signature) if self.cache_dir else None
+            if summary is None:
+                with self._table_lock:
+                    pending = self._table_partials.get(file_path)
+                if pending is not None and pending[0] == signature:
+                    summary = pending[1]
+                else:
+                    encoding = self._get_file_encoding(file_path, signature)
+                    summary = self.table_scanner.scan(file_path, encoding)
+                    summary['encoding'] = encoding
+                    if summary['complete']:
+                        if self.cache_dir:
+                            save_summary(self.cache_dir, file_path, signature, summary)
+                    else:
+                        self._schedule_table_scan(file_path, signature, summary)
+            result = dict(summary)
+            result['type'] = 'table'
+            result['size'] = file_size
+            return result
+        except Exception as e:
+            return {'error': f'Unable to parse table: {str(e)}', 'type': 'error'}
+    
+    def _schedule_table_scan(self, file_path, signature, partial):
+        """提交后台完整遍历（同一文件版本只提交一次）"""
+        with self._table_lock:
+            pending = self._table_partials.get(file_path)
+            if pending is not None and pending[0] == signature:
+                return
+            self._table_partials[file_path] = (signature, partial)
+        self._table_executor.submit(self._finish_table_scan, file_path, signature, partial['encoding'])
+    
+    def _finish_table_scan(self, file_path, signature, encoding):
+        """后台完整遍历表格文件，文件未变化时缓存结果"""
+        try:
+            summary = self.table_scanner.scan(file_path, encoding, time_budget=0)
+            summary['encoding'] = encoding
+            if self._get_file_signature(file_path) == signature:
+                if self.cache_dir:
+                    save_summary(self.cache_dir, file_path, signature, summary)
+                result = dict(summary)
+                result['type'] = 'table'
+                result['size'] = signature[1]
+                self._cache_preview(file_path, signature, result)
+        except Exception as e:
+            logging.warning(f"后台遍历表格失败 {file_path}: {str(e)}")
+        finally:
+            with self._table_lock:
+                pending = self._table_partials.get(file_path)
+                if pending is not None and pending[0] == signature:
+                    del self._table_partials[file_path]
+    
     def _preview_image_file(self, file_path, mime, file_size):
-        """预览图片文件"""
+        """预览图片文件（返回原图和缩略图地址，不再内联 base64）"""
+        result = {
+            'type': 'image',
+            'mimetype': mime,
+            'size': file_size,
+            'url': f'/api/file_content?path={urllib.parse.quote(file_path)}'
+        }
+        if self._has_thumbnail(file_path):
+            result['thumbnail_url'] = self._thumbnail_url(file_path, os.path.getmtime(file_path), 1024)
+        return result
+    
+    def _has_thumbnail(self, filename):
+        """文件是否可以生成缩略图"""
+        return self.thumbnailer is not None and self.thumbnailer.is_supported(filename)
+    
+    @staticmethod
+    def _thumbnail_url(path, mtime, size):
+        """缩略图地址，v 参数随修改时间变化，便于浏览器长期缓存"""
+        return f'/api/thumbnail?path={urllib.parse.quote(path)}&size={size}&v={int(mtime)}'
+    
+    def get_thumbnail(self, file_path, size=256):
+        """获取图片缩略图"""
+        abs_path = os.path.abspath(file_path)
+        
+        # 安全检查
+        if not abs_path.startswith(os.path.abspath('.')):
+            return None, 'Permission denied', 403
+        
+        if not os.path.isfile(abs_path):
+            return None, 'Not a file', 404
+        
+        if not self._has_thumbnail(abs_path):
+            return None, 'Thumbnail not supported', 422
+        
         try:
-            # 大图片文件警告
-            if file_size > 5 * 1024 * 1024:  # 5MB
-                return {
-                    'type': 'image',
-                    'size': file_size,
-                    'warning': 'Large image file, preview may be slow',
-                    'url': f'/api/file_content?path={urllib.parse.quote(file_path)}'
-                }
-            
-            with open(file_path, 'rb') as f:
-                b64 = base64.b64encode(f.read()).decode('utf-8')
-            
-            return {
-                'type': 'image',
-                'content': b64,
-                'mimetype': mime,
-                'size': file_size
-            }
-            
+            thumb_path = self.thumbnailer.get_thumbnail(abs_path, size)
+            response = send_file(thumb_path, mimetype=self.thumbnailer.mimetype, conditional=True)
+            # 地址带版本参数，原图变化后地址随之变化，可以长期缓存
+            response.headers['Cache-Control'] = 'private, max-age=604800'
+            return response, None, 200
+        except OSError as e:
+            # 无法识别或已损坏的图片
+            return None, f'Cannot create thumbnail: {str(e)}', 422
         except Exception as e:
-            return {'error': str(e), 'type': 'error'}
+            return None, str(e), 500
     
     def _preview_video_file(self, file_path, mime, file_size):
         """预览视频文件"""
@@ -384,23 +978,72 @@ class FileManager:
         }
         return language_map.get(ext, 'text')
     
-    def _cache_preview(self, file_hash, file_path, content):
-        """缓存预览内容"""
-        # 清理旧缓存
-        if len(self._preview_cache) >= self._cache_max_size:
-            # 移除最旧的缓存项
-            oldest_key = min(self._preview_cache.keys(), 
-                           key=lambda k: self._preview_cache[k]['timestamp'])
-            del self._preview_cache[oldest_key]
-        
-        self._preview_cache[file_hash] = {
-            'content': content,
-            'mtime': os.path.getmtime(file_path),
-            'timestamp': time.time()
-        }
+    def _estimate_entry_size(self, content):
+        """估算缓存项占用的字节数"""
+        size = 256  # 字典及元数据开销
+        for value in content.values():
+            if isinstance(value, str):
+                size += len(value)
+            elif isinstance(value, (bytes, bytearray)):
+                size += len(value)
+            elif isinstance(value, (list, dict)):
+                size += len(json.dumps(value, ensure_ascii=False, default=str))
+            else:
+                size += 32
+        return size
+    
+    def _get_cached_preview(self, file_path, signature):
+        """查询预览缓存（O(1)），命中时移到 LRU 队尾"""
+        with self._cache_lock:
+            entry = self._preview_cache.get(file_path)
+            if entry is not None and entry['signature'] == signature:
+                self._preview_cache.move_to_end(file_path)
+                self._cache_hits += 1
+                preview_cache_requests_total.inc(result='hit')
+                return entry['content']
+            
+            if entry is not None:
+                # 文件已变化，丢弃过期缓存
+                self._remove_cache_entry(file_path)
+            self._cache_misses += 1
+            preview_cache_requests_total.inc(result='miss')
+            return None
+    
+    def _remove_cache_entry(self, file_path):
+        """移除缓存项（调用方需持有锁）"""
+        entry = self._preview_cache.pop(file_path, None)
+        if entry is not None:
+            self._cache_bytes -= entry['size']
+        return entry
+    
+    def _cache_preview(self, file_path, signature, content):
+        """缓存预览内容，超出字节预算时从最久未使用的一端淘汰"""
+        entry_size = self._estimate_entry_size(content)
+        if entry_size > self._cache_max_bytes:
+            return
+        
+        with self._cache_lock:
+            self._remove_cache_entry(file_path)
+            while self._preview_cache and self._cache_bytes + entry_size > self._cache_max_bytes:
+                _, evicted = self._preview_cache.popitem(last=False)
+                self._cache_bytes -= evicted['size']
+                self._cache_evictions += 1
+                preview_cache_evictions_total.inc()
+            
+            self._preview_cache[file_path] = {
+                'content': content,
+                'signature': signature,
+                'size': entry_size
+            }
+            self._cache_bytes += entry_size
+    
+    def invalidate_cache(self, file_path):
+        """使指定文件的预览缓存失效"""
+        with self._cache_lock:
+            self._remove_cache_entry(os.path.abspath(file_path))
     
     def get_file_content(self, file_path):
-        """获取文件内容（用于大文件流式传输）"""
+        """获取文件内容（用于大文件流式传输和音视频预览，支持 Range 与条件请求）"""
         abs_path = os.path.abspath(file_path)
         
         # 安全检查
@@ -411,12 +1054,12 @@ class FileManager:
             return None, 'Not a file', 404
         
         try:
-            return send_file(abs_path), None, 200
+            return send_file_with_ranges(abs_path), None, 200
         except Exception as e:
             return None, str(e), 500
     
     def download_file(self, file_path):
-        """下载单个文件"""
+        """下载单个文件（支持断点续传）"""
         abs_path = os.path.abspath(file_path)
         
         # 安全检查
@@ -426,13 +1069,14 @@ class FileManager:
         if not os.path.isfile(abs_path):
             return None, 'Not a file', 404
         
-        dir_name = os.path.dirname(abs_path)
-        file_name = os.path.basename(abs_path)
-        
-        return send_from_directory(dir_name, file_name, as_attachment=True), None, 200
+        return send_file_with_ranges(abs_path, as_attachment=True), None, 200
     
-    def download_folder(self, folder_path):
-        """下载文件夹（压缩为ZIP）"""
+    def download_folder(self, folder_path, compress=True, workers=None, archive_format='zip'):
+        """下载文件夹（边遍历边流式输出归档，不生成临时文件）
+        
+        compress=False 时全部条目以 STORED 存储；否则已压缩格式存储、其余 deflate 压缩。
+        workers 为压缩线程数，不超过 zip_workers；archive_format='tar.zst' 时输出 tar+zstd。
+        """
         abs_path = os.path.abspath(folder_path)
         
         # 安全检查
@@ -442,21 +1086,27 @@ class FileManager:
         if not os.path.isdir(abs_path):
             return None, 'Not a folder', 404
         
-        # 创建临时ZIP文件
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
-        zip_path = tmp.name
-        tmp.close()
+        if archive_format not in ('zip', 'tar.zst'):
+            return None, 'Unsupported format', 400
+        
+        if archive_format == 'tar.zst' and not tar_zst_available():
+            return None, 'tar.zst requires the zstandard package', 400
+        
+        workers = self.zip_workers if workers is None else min(max(1, workers), self.zip_workers)
         
         try:
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                for root, dirs, files in os.walk(abs_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, abs_path)
-                        zf.write(file_path, arcname)
-            
-            download_name = os.path.basename(abs_path) + '.zip'
-            return send_file(zip_path, as_attachment=True, download_name=download_name), None, 200
+            download_name = os.path.basename(abs_path) + '.' + archive_format
+            if archive_format == 'tar.zst':
+                stream = iter_tar_zst_stream(abs_path, workers=workers)
+                mimetype = 'application/zstd'
+            else:
+                stream = iter_zip_stream(abs_path, compress=compress,
+                                         compresslevel=self.zip_compresslevel, workers=workers)
+                mimetype = 'application/zip'
+            response = Response(stream, mimetype=mimetype, direct_passthrough=True)
+            response.headers['Content-Disposition'] = attachment_header(download_name)
+            response.headers['X-Accel-Buffering'] = 'no'  # 禁止反向代理缓冲整个响应
+            return response, None, 200
             
         except Exception as e:
             return None, str(e), 500
@@ -481,12 +1131,164 @@ class FileManager:
                 save_path = os.path.join(abs_path, f.filename)
                 f.save(save_path)
                 uploaded_files.append(f.filename)
+            self.invalidate_listing(abs_path)
             
             return {'success': True, 'files': uploaded_files}
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def initiate_upload(self, target_path, filename, size, part_size=None):
+        """创建分块上传会话"""
+        abs_dir = os.path.abspath(target_path)
+        
+        # 安全检查：文件名不能包含路径
+        if not abs_dir.startswith(os.path.abspath('.')) or not filename \
+                or os.path.basename(filename) != filename or filename in ('.', '..'):
+            return {'error': 'Permission denied'}, 403
+        
+        if not os.path.isdir(abs_dir):
+            return {'error': 'Not a folder'}, 404
+        
+        try:
+            session = self.uploads.initiate(os.path.join(abs_dir, filename), size, part_size)
+            return session.to_dict(), 200
+        except UploadError as e:
+            return {'error': str(e)}, e.status
+        except OSError as e:
+            return {'error': str(e)}, 507 if e.errno == errno.ENOSPC else 500
+    
+    def upload_part(self, upload_id, part_number, stream, checksum=None):
+        """写入一个分块（分块序号从 0 开始）"""
+        try:
+            return self.uploads.write_part(upload_id, part_number, stream, checksum), 200
+        except UploadError as e:
+            return {'error': str(e)}, e.status
+    
+    def get_upload_status(self, upload_id):
+        """查询已接收和缺失的分块（用于续传）"""
+        try:
+            return self.uploads.get_session(upload_id).to_dict(), 200
+        except UploadError as e:
+            return {'error': str(e)}, e.status
+    
+    def complete_upload(self, upload_id):
+        """完成分块上传"""
+        try:
+            session = self.uploads.complete(upload_id)
+            self.invalidate_listing(session.target_path)
+            self.invalidate_cache(session.target_path)
+            return {'success': True, 'path': os.path.relpath(session.target_path), 'size': session.size}, 200
+        except UploadError as e:
+            return {'error': str(e)}, e.status
+    
+    def abort_upload(self, upload_id):
+        """取消分块上传"""
+        try:
+            self.uploads.abort(upload_id)
+            return {'success': True}, 200
+        except UploadError as e:
+            return {'error': str(e)}, e.status
+    
+    def _resolve_sync_path(self, target_path, relative_file=None):
+        """解析增量同步的目标目录和其中的文件路径，越权时返回 None"""
+        abs_dir = os.path.abspath(target_path)
+        if not abs_dir.startswith(os.path.abspath('.')):
+            return None, None
+        if relative_file is None:
+            return abs_dir, None
+        abs_file = os.path.abspath(os.path.join(abs_dir, relative_file))
+        if not abs_file.startswith(abs_dir + os.sep):
+            return None, None
+        return abs_dir, abs_file
+    
+    def iter_sync_files(self, target_path):
+        """列出目标目录下所有文件的相对路径、大小和修改时间（不读取内容）"""
+        abs_dir, _ = self._resolve_sync_path(target_path)
+        if abs_dir is None:
+            return None, 'Permission denied', 403
+        if not os.path.isdir(abs_dir):
+            return None, 'Not a folder', 404
+        
+        def generate():
+            for dirpath, dirnames, filenames in os.walk(abs_dir):
+                dirnames[:] = [d for d in dirnames if not self._is_filtered(d)]
+                for filename in filenames:
+                    if self._is_filtered(filename):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat_info = os.stat(path)
+                    except OSError:
+                        continue
+                    yield {
+                        'path': os.path.relpath(path, abs_dir).replace(os.sep, '/'),
+                        'size': stat_info.st_size,
+                        'mtime': stat_info.st_mtime
+                    }
+        
+        return generate(), None, 200
+    
+    def get_sync_manifest(self, target_path, relative_file):
+        """获取单个文件的块哈希清单"""
+        _, abs_file = self._resolve_sync_path(target_path, relative_file)
+        if abs_file is None:
+            return {'error': 'Permission denied'}, 403
+        if not os.path.isfile(abs_file):
+            return {'error': 'Not a file'}, 404
+        
+        try:
+            manifest = self.sync_manifests.get(abs_file)
+            manifest['path'] = relative_file
+            return manifest, 200
+        except DeltaError as e:
+            return {'error': str(e)}, e.status
+    
+    def hash_path(self, path, algo=None, include_files=False):
+        """计算文件或文件夹的内容摘要（文件夹的过滤规则与增量同步一致）"""
+        algo = algo or default_algorithm()
+        if algo not in available_algorithms():
+            return {'error': f'Unsupported algorithm: {algo}', 'algorithms': available_algorithms()}, 400
+        
+        abs_path = os.path.abspath(path)
+        workspace = os.path.abspath('.')
+        if abs_path != workspace and not abs_path.startswith(workspace + os.sep):
+            return {'error': 'Permission denied'}, 403
+        
+        try:
+            if os.path.isfile(abs_path):
+                result = self.content_hashes.hash_file(abs_path, algo)
+            elif os.path.isdir(abs_path):
+                result = self.content_hashes.hash_folder(abs_path, algo, self._is_filtered, include_files)
+            else:
+                return {'error': 'Path not found'}, 404
+            result['path'] = path
+            return result, 200
+        except HashError as e:
+            return {'error': str(e)}, e.status
+        except PermissionError:
+            return {'error': 'Permission denied'}, 403
+        finally:
+            self.content_hashes.save()
+    
+    def apply_sync_delta(self, target_path, relative_file, stream, md5, base=None, mtime=None):
+        """按增量指令重建文件（原子替换）"""
+        abs_dir, abs_file = self._resolve_sync_path(target_path, relative_file)
+        if abs_file is None:
+            return {'error': 'Permission denied'}, 403
+        if not md5:
+            return {'error': 'md5 is required'}, 400
+        
+        try:
+            os.makedirs(os.path.dirname(abs_file), exist_ok=True)
+            result = apply_delta(abs_file, stream, md5.lower(), base or None, mtime)
+            self.invalidate_listing(abs_file)
+            self.invalidate_cache(abs_file)
+            result['path'] = relative_file
+            return result, 200
+        except DeltaError as e:
+            return {'error': str(e)}, e.status
+    
     def delete_file_or_folder(self, path, file_type):
         """删除文件或文件夹"""
         # 路径解码
@@ -496,12 +1298,14 @@ class FileManager:
             if file_type == 'folder':
                 if os.path.exists(path):
                     shutil.rmtree(path)
+                    self.invalidate_listing(path)
                     return {'success': True}
                 else:
                     return {'success': False, 'error': '文件夹不存在'}
             else:
                 if os.path.exists(path):
                     os.remove(path)
+                    self.invalidate_listing(path)
                     return {'success': True}
                 else:
                     return {'success': False, 'error': '文件不存在'}
@@ -511,15 +1315,23 @@ class FileManager:
     
     def clear_cache(self):
         """清理预览缓存"""
-        self._preview_cache.clear()
+        with self._cache_lock:
+            self._preview_cache.clear()
+            self._cache_bytes = 0
+            self._encoding_cache.clear()
     
     def get_cache_stats(self):
         """获取缓存统计信息"""
-        return {
-            'cache_size': len(self._preview_cache),
-            'max_size': self._cache_max_size,
-            'max_preview_size': self._max_preview_size
-        }
+        with self._cache_lock:
+            return {
+                'cache_size': len(self._preview_cache),
+                'cache_bytes': self._cache_bytes,
+                'max_bytes': self._cache_max_bytes,
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'evictions': self._cache_evictions,
+                'max_preview_size': self._max_preview_size
+            }
     
     def edit_file(self, file_path):
         """获取文件内容用于编辑"""
@@ -546,22 +1358,18 @@ class FileManager:
             return {'error': 'File type not supported for editing'}, 422
         
         try:
-            # 尝试不同编码读取文件
-            encodings = ['utf-8', 'gbk', 'gb2312', 'latin1']
-            content = None
-            used_encoding = None
-            
-            for encoding in encodings:
-                try:
-                    with open(abs_path, 'r', encoding=encoding) as f:
-                        content = f.read()
-                    used_encoding = encoding
-                    break
-                except UnicodeDecodeError:
-                    continue
+            with open(abs_path, 'rb') as f:
+                data = f.read()
             
-            if content is None:
-                return {'error': 'Unable to decode file'}, 422
+            signature = self._get_file_signature(abs_path)
+            used_encoding = self._get_file_encoding(abs_path, signature, data, complete=True)
+            try:
+                content = data.decode(used_encoding)
+            except UnicodeDecodeError:
+                # 样本之后出现非法字节：按完整内容重新检测
+                used_encoding = detect_encoding(data, complete=True)
+                self._store_file_encoding(abs_path, signature, used_encoding)
+                content = data.decode(used_encoding)
             
             # 获取文件信息
             stat_info = os.stat(abs_path)
@@ -574,14 +1382,16 @@ class FileManager:
                 'size': file_size,
                 'lines': content.count('\n') + 1,
                 'modified': stat_info.st_mtime,
-                'readonly': not os.access(abs_path, os.W_OK)
+                'readonly': not os.access(abs_path, os.W_OK),
+                # 增量保存的基准版本
+                'version': content_version(data, stat_info)
             }, 200
             
         except Exception as e:
             return {'error': str(e)}, 500
     
-    def save_file(self, file_path, content, encoding='utf-8'):
-        """保存文件内容"""
+    def save_file(self, file_path, content, encoding='utf-8', base=None):
+        """保存完整文件内容（写入临时文件后原子替换）；提供 base 时文件已被修改则返回 409"""
         abs_path = os.path.abspath(file_path)
         
         # 安全检查：防止越权访问
@@ -594,41 +1404,84 @@ class FileManager:
             return {'error': 'File type not supported for editing'}, 422
         
         try:
-            # 创建备份（如果文件存在）
-            backup_path = None
-            if os.path.exists(abs_path):
-                backup_path = abs_path + '.backup'
-                shutil.copy2(abs_path, backup_path)
-            
-            # 保存文件
-            with open(abs_path, 'w', encoding=encoding) as f:
-                f.write(content)
-            
-            # 获取新的文件信息
-            stat_info = os.stat(abs_path)
-            
-            # 清理相关缓存
-            file_hash = self._get_file_hash(abs_path)
-            if file_hash in self._preview_cache:
-                del self._preview_cache[file_hash]
-            
-            return {
-                'success': True,
-                'size': stat_info.st_size,
-                'modified': stat_info.st_mtime,
-                'lines': content.count('\n') + 1,
-                'backup_created': backup_path is not None
-            }, 200
+            if base is not None and os.path.exists(abs_path):
+                with open(abs_path, 'rb') as f:
+                    check_base(f.read(), os.fstat(f.fileno()), base)
+            return self._write_edited_file(abs_path, content, encoding), 200
+        except PatchError as e:
+            return self._patch_error(abs_path, e)
+        except (LookupError, UnicodeEncodeError) as e:
+            return {'error': f'Cannot encode content as {encoding}: {str(e)}'}, 422
+        except Exception as e:
+            return {'error': str(e)}, 500
+    
+    def save_file_patch(self, file_path, patch, base, encoding=None):
+        """按行补丁增量保存：基准版本已过期时返回 409，否则应用补丁并原子替换"""
+        abs_path = os.path.abspath(file_path)
+        
+        # 安全检查：防止越权访问
+        if not abs_path.startswith(os.path.abspath('.')):
+            return {'error': 'Permission denied'}, 403
+        
+        if not os.path.isfile(abs_path):
+            return {'error': 'Not a file'}, 404
+        
+        ext = os.path.splitext(abs_path)[1].lower()
+        if ext not in self.text_extensions:
+            return {'error': 'File type not supported for editing'}, 422
+        
+        try:
+            with open(abs_path, 'rb') as f:
+                data = f.read()
+                stat_info = os.fstat(f.fileno())
+            check_base(data, stat_info, base)
             
+            if not encoding:
+                encoding = self._get_file_encoding(abs_path, self._get_file_signature(abs_path), data, complete=True)
+            content = apply_line_patch(data.decode(encoding), patch)
+            return self._write_edited_file(abs_path, content, encoding), 200
+        except PatchError as e:
+            return self._patch_error(abs_path, e)
+        except (LookupError, UnicodeError) as e:
+            return {'error': f'Cannot convert content with {encoding}: {str(e)}'}, 422
         except Exception as e:
-            # 如果保存失败且有备份，尝试恢复
-            if backup_path and os.path.exists(backup_path):
-                try:
-                    shutil.move(backup_path, abs_path)
-                except:
-                    pass
             return {'error': str(e)}, 500
     
+    def _write_edited_file(self, abs_path, content, encoding):
+        """编码并原子写入编辑后的内容，返回新的文件信息和版本
+        
+        符号链接按其指向的真实文件写入，真实路径同样必须位于工作区内。
+        """
+        real_path = os.path.realpath(abs_path)
+        workspace = os.path.realpath('.')
+        if real_path != workspace and not real_path.startswith(workspace + os.sep):
+            raise PatchError('Permission denied', 403)
+        data = content.encode(encoding)
+        stat_info = write_atomic(real_path, data)
+        
+        # 清理相关缓存
+        self.invalidate_cache(abs_path)
+        self.invalidate_listing(abs_path)
+        
+        return {
+            'success': True,
+            'size': stat_info.st_size,
+            'modified': stat_info.st_mtime,
+            'lines': content.count('\n') + 1,
+            'version': content_version(data, stat_info)
+        }
+    
+    def _patch_error(self, abs_path, error):
+        """补丁保存错误的返回值，冲突时附带文件当前的版本"""
+        result = {'error': str(error)}
+        if error.status == 409:
+            try:
+                with open(abs_path, 'rb') as f:
+                    result['current'] = content_version(f.read(), os.fstat(f.fileno()))
+            except OSError:
+                pass
+        return result, error.status
+    
     def create_file(self, file_path, content='', encoding='utf-8'):
         """创建新文件"""
         abs_path = os.path.abspath(file_path)
@@ -655,6 +1508,7 @@ class FileManager:
             # 创建文件
             with open(abs_path, 'w', encoding=encoding) as f:
                 f.write(content)
+            self.invalidate_listing(abs_path)
             
             # 获取文件信息
             stat_info = os.stat(abs_path)
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+工作区文件搜索模块
+
+- 名称搜索：在增量维护的路径索引上做通配符（glob）或子串匹配。
+  索引按目录记录文件名和子目录名，目录签名（inode、mtime、大小）未变化时直接复用，
+  再次搜索只需 stat 各个目录，不必重新列出目录内容。
+- 内容搜索：在共享的有界线程池中逐个文本文件逐行查找（类似 grep），结果边找到边返回，
+  超过时间预算或结果数上限时提前停止（正在查找的文件也按行检查截止时间）。
+  每行只对前 MAX_SCAN_LINE_LENGTH 个字符匹配，避免用户正则在超长行上长时间回溯。
+"""
+
+import os
+import re
+import time
+import fnmatch
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+# 判断二进制文件时检查的文件开头字节数
+BINARY_SNIFF_SIZE = 8 * 1024
+# 内容搜索中单个文件最多返回的匹配行数
+MAX_MATCHES_PER_FILE = 20
+# 匹配行返回的最大字符数
+MAX_LINE_LENGTH = 300
+# 正则匹配时每行最多检查的字符数
+MAX_SCAN_LINE_LENGTH = 1024
+# 单个文件内每查找若干行检查一次截止时间
+_DEADLINE_CHECK_LINES = 1024
+
+_GLOB_CHARS = set('*?[')
+
+
+class PathIndex:
+    """增量维护的路径索引类"""
+
+    def __init__(self, is_filtered, max_names=2000000):
+        # 判断条目是否隐藏的回调（与文件树的过滤规则一致）
+        self._is_filtered = is_filtered
+        # 索引中最多保存的名称总数，超出后新目录不再缓存（每次搜索重新列出）
+        self.max_names = max_names
+        # abs_dir -> (signature, files, subdirs)
+        self._dirs = {}
+        self._names = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, path):
+        """文件系统变更：丢弃路径本身及其父目录的索引"""
+        abs_path = os.path.abspath(path)
+        with self._lock:
+            for candidate in (abs_path, os.path.dirname(abs_path)):
+                self._pop(candidate)
+
+    def _pop(self, abs_dir):
+        """删除单个目录的索引（调用方持有锁）"""
+        cached = self._dirs.pop(abs_dir, None)
+        if cached is not None:
+            self._names -= len(cached[1]) + len(cached[2])
+        return cached
+
+    def _list_dir(self, abs_dir):
+        """获取目录下的文件名和子目录名：签名未变化时复用索引（不跟随目录符号链接）"""
+        try:
+            stat_info = os.stat(abs_dir)
+        except OSError:
+            with self._lock:
+                self._pop(abs_dir)
+            return (), ()
+        signature = (stat_info.st_ino, stat_info.st_mtime_ns, stat_info.st_size)
+
+        with self._lock:
+            cached = self._dirs.get(abs_dir)
+            if cached is not None and cached[0] == signature:
+                return cached[1], cached[2]
+
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(abs_dir) as entries:
+                for entry in entries:
+                    if self._is_filtered(entry.name):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                        else:
+                            files.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            return (), ()
+        files, subdirs = tuple(files), tuple(subdirs)
+
+        with self._lock:
+            old = self._pop(abs_dir)
+            if old is not None:
+                # 已删除或改名的子目录，其子树索引不再有效
+                for name in set(old[2]) - set(subdirs):
+                    prefix = os.path.join(abs_dir, name)
+                    for path in [p for p in self._dirs if p == prefix or p.startswith(prefix + os.sep)]:
+                        self._pop(path)
+            if self._names + len(files) + len(subdirs) <= self.max_names:
+                self._dirs[abs_dir] = (signature, files, subdirs)
+                self._names += len(files) + len(subdirs)
+        return files, subdirs
+
+    def walk(self, abs_root, deadline=None):
+        """深度优先遍历 abs_root，生成 (所在目录, 名称, 是否目录)；超过 deadline 时停止"""
+        stack = [abs_root]
+        while stack:
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            abs_dir = stack.pop()
+            files, subdirs = self._list_dir(abs_dir)
+            for name in subdirs:
+                yield abs_dir, name, True
+            for name in files:
+                yield abs_dir, name, False
+            stack.extend(os.path.join(abs_dir, name) for name in reversed(subdirs))
+
+    def stats(self):
+        """索引统计信息"""
+        with self._lock:
+            return {'dirs': len(self._dirs), 'names': self._names}
+
+
+def compile_name_pattern(pattern):
+    """编译名称匹配规则（不区分大小写）
+
+    含 * ? [ 时按通配符匹配，否则按子串匹配；含 / 时匹配相对路径，否则只匹配名称。
+    """
+    match_path = '/' in pattern
+    if _GLOB_CHARS & set(pattern):
+        regex = re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+        return match_path, lambda text: regex.match(text) is not None
+    needle = pattern.lower()
+    return match_path, lambda text: needle in text.lower()
+
+
+def compile_content_pattern(query, use_regex=False, case_sensitive=False):
+    """编译内容搜索的正则表达式（非 regex 模式下按字面文本查找），非法表达式抛出 re.error"""
+    flags = 0 if case_sensitive else re.IGNORECASE
+    return re.compile(query if use_regex else re.escape(query), flags | re.MULTILINE)
+
+
+def search_names(index, abs_root, pattern, max_results=500, time_budget=10.0):
+    """名称搜索：生成 {'path', 'name', 'is_dir'}（path 为相对 abs_root 的路径），最后生成一条汇总"""
+    match_path, matcher = compile_name_pattern(pattern)
+    start = time.monotonic()
+    deadline = start + time_budget
+    count = 0
+    truncated = False
+    for abs_dir, name, is_dir in index.walk(abs_root, deadline):
+        relative = os.path.relpath(os.path.join(abs_dir, name), abs_root).replace(os.sep, '/')
+        if matcher(relative if match_path else name):
+            yield {'path': relative, 'name': name, 'is_dir': is_dir}
+            count += 1
+            if count >= max_results:
+                truncated = True
+                break
+    yield {
+        'done': True,
+        'matches': count,
+        'truncated': truncated or time.monotonic() > deadline,
+        'elapsed': round(time.monotonic() - start, 3)
+    }
+
+
+def grep_file(abs_path, regex, encoding_for, max_file_size, should_stop=None):
+    """在单个文件中逐行查找，返回 [{'line', 'text'}]；二进制或过大的文件返回 None
+
+    encoding_for(abs_path, sample) 返回文件编码（调用方负责缓存）。
+    should_stop() 为 True 时（超时或搜索已结束）停止，返回已找到的匹配。
+    """
+    try:
+        if os.path.getsize(abs_path) > max_file_size:
+            return None
+        with open(abs_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if b'\x00' in data[:BINARY_SNIFF_SIZE]:
+        return None
+
+    text = data.decode(encoding_for(abs_path, data), errors='replace')
+    matches = []
+    line_number = 0
+    line_start = 0
+    size = len(text)
+    while line_start < size:
+        line_end = text.find('\n', line_start)
+        if line_end == -1:
+            line_end = size
+        line_number += 1
+        if regex.search(text, line_start, min(line_end, line_start + MAX_SCAN_LINE_LENGTH)):
+            line = text[line_start:min(line_end, line_start + MAX_LINE_LENGTH + 1)].rstrip('\r')
+            matches.append({'line': line_number, 'text': line[:MAX_LINE_LENGTH]})
+            if len(matches) >= MAX_MATCHES_PER_FILE:
+                break
+        line_start = line_end + 1
+        if should_stop is not None and line_number % _DEADLINE_CHECK_LINES == 0 and should_stop():
+            break
+    return matches
+
+
+def search_content(index, abs_root, regex, encoding_for, executor, skip_file=None, workers=4,
+                   max_results=500, time_budget=10.0, max_file_size=16 * 1024 * 1024):
+    """内容搜索：在共享线程池 executor 中查找，按完成顺序生成 {'path', 'matches'}，最后生成一条汇总
+
+    每次搜索同时提交的任务数有上限，提前停止（达到结果上限、超时或调用方关闭生成器）时
+    取消排队的任务，正在查找的文件也会随之停止；skip_file(name) 为 True 的文件（图片、模型等）直接跳过。
+    """
+    start = time.monotonic()
+    deadline = start + time_budget
+    stopped = threading.Event()
+
+    def should_stop():
+        return stopped.is_set() or time.monotonic() > deadline
+
+    files = (
+        os.path.join(abs_dir, name)
+        for abs_dir, name, is_dir in index.walk(abs_root, deadline)
+        if not is_dir and not (skip_file and skip_file(name))
+    )
+    scanned = 0
+    total = 0
+    truncated = False
+    pending = {}
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < workers * 4:
+                abs_path = next(files, None)
+                if abs_path is None:
+                    exhausted = True
+                    break
+                pending[executor.submit(grep_file, abs_path, regex, encoding_for, max_file_size,
+                                        should_stop)] = abs_path
+            if not pending:
+                break
+
+            remaining = deadline - time.monotonic()
+            done, _ = wait(pending, timeout=max(0, remaining), return_when=FIRST_COMPLETED)
+            if not done:
+                truncated = True
+                break
+            for future in done:
+                abs_path = pending.pop(future)
+                scanned += 1
+                matches = future.result()
+                if not matches:
+                    continue
+                matches = matches[:max_results - total]
+                total += len(matches)
+                yield {
+                    'path': os.path.relpath(abs_path, abs_root).replace(os.sep, '/'),
+                    'matches': matches
+                }
+                if total >= max_results:
+                    truncated = True
+                    break
+            if truncated:
+                break
+        if not truncated and time.monotonic() > deadline:
+            # 遍历目录时已超时
+            truncated = True
+    finally:
+        stopped.set()
+        for future in pending:
+            future.cancel()
+
+    yield {
+        'done': True,
+        'files_scanned': scanned,
+        'matches': total,
+        'truncated': truncated,
+        'elapsed': round(time.monotonic() - start, 3)
+    }
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+文件系统变更推送模块
+
+只监听客户端当前打开的目录，多个客户端查看同一目录时共享同一个监听（Socket.IO 房间）。
+Linux 上通过 inotify（ctypes 调用 libc，无额外依赖）接收事件，不可用或达到监听数上限时
+退回定期轮询目录快照。短时间内的多次事件合并后按目录推送一次增量：
+- created / modified 附带与目录列表接口格式一致的条目
+- deleted 只包含名称
+- resync 表示事件丢失（inotify 队列溢出或目录过大无法轮询比较），客户端需重新加载
+- removed 表示目录本身已被删除或移走
+推送前同时使目录列表缓存失效（FileManager.invalidate_listing）。
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+from .metrics import socketio_emits_total
+
+
+# inotify 事件掩码（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+               IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT_STRUCT = struct.Struct('iIII')
+
+
+class _Inotify:
+    """inotify 文件描述符的最小封装"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path):
+        """添加目录监听，返回 watch 描述符"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        """移除监听（目录已删除时内核已自动移除，忽略错误）"""
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """读取当前可用的全部事件，返回 [(wd, mask, name)]"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset + _EVENT_STRUCT.size <= len(data):
+                wd, mask, _, length = _EVENT_STRUCT.unpack_from(data, offset)
+                offset += _EVENT_STRUCT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                events.append((wd, mask, name))
+
+
+class _Watch:
+    """单个被监听的目录"""
+
+    __slots__ = ('sids', 'wd', 'snapshot', 'signature')
+
+    def __init__(self):
+        # 正在查看该目录的客户端
+        self.sids = set()
+        # inotify watch 描述符，为 None 时使用轮询
+        self.wd = None
+        # 轮询快照：name -> (inode, 大小, 修改时间)，首次轮询时建立
+        self.snapshot = None
+        self.signature = None
+
+
+class FileWatcher:
+    """目录变更监听与推送类"""
+
+    def __init__(self, socketio, file_manager, poll_interval=2.0, coalesce_delay=0.5,
+                 use_inotify=True, max_poll_entries=10000):
+        self.socketio = socketio
+        self.file_manager = file_manager
+        self.poll_interval = poll_interval
+        # 事件合并窗口：目录收到第一个事件后等待该时长再推送
+        self.coalesce_delay = coalesce_delay
+        self.use_inotify = use_inotify and sys.platform.startswith('linux')
+        # 轮询时超过该条目数的目录只比较目录签名，变化时通知客户端重新加载
+        self.max_poll_entries = max_poll_entries
+
+        self._watches = {}
+        self._sid_dirs = {}
+        self._wd_dirs = {}
+        # abs_dir -> {name: 首个事件是否为创建}
+        self._pending = {}
+        self._pending_since = {}
+        # 需要整体通知的目录：abs_dir -> 'resync' / 'removed'
+        self._notices = {}
+        self._lock = threading.Lock()
+        self._inotify = None
+        self._thread = None
+        self._wakeup = threading.Event()
+
+    @staticmethod
+    def room_for(abs_dir):
+        """目录对应的 Socket.IO 房间名"""
+        return 'fs:' + abs_dir
+
+    # ---------- 订阅 ----------
+
+    def watch(self, sid, abs_dir):
+        """客户端 sid 切换到查看 abs_dir（每个客户端同时只订阅一个目录），返回之前订阅的目录"""
+        self._ensure_started()
+        with self._lock:
+            old = self._sid_dirs.get(sid)
+            if old == abs_dir:
+                return None
+            if old is not None:
+                self._release(sid, old)
+            self._sid_dirs[sid] = abs_dir
+            watch = self._watches.get(abs_dir)
+            if watch is None:
+                watch = self._watches[abs_dir] = _Watch()
+                if self._inotify is not None:
+                    try:
+                        watch.wd = self._inotify.add_watch(abs_dir)
+                        self._wd_dirs[watch.wd] = abs_dir
+                    except OSError as e:
+                        # 达到 max_user_watches 等情况下退回轮询
+                        if e.errno == errno.ENOSPC:
+                            logging.warning(f"inotify 监听数已达上限，改为轮询: {abs_dir}")
+            watch.sids.add(sid)
+        self._wakeup.set()
+        return old
+
+    def unwatch(self, sid):
+        """取消客户端的订阅（断开连接时调用），返回之前订阅的目录"""
+        with self._lock:
+            old = self._sid_dirs.pop(sid, None)
+            if old is not None:
+                self._release(sid, old)
+        return old
+
+    def _release(self, sid, abs_dir):
+        """移除目录的一个订阅者，无人订阅时停止监听（调用方持有锁）"""
+        watch = self._watches.get(abs_dir)
+        if watch is None:
+            return
+        watch.sids.discard(sid)
+        if watch.sids:
+            return
+        del self._watches[abs_dir]
+        if watch.wd is not None:
+            self._wd_dirs.pop(watch.wd, None)
+            self._inotify.rm_watch(watch.wd)
+        self._pending.pop(abs_dir, None)
+        self._pending_since.pop(abs_dir, None)
+        self._notices.pop(abs_dir, None)
+
+    def get_stats(self):
+        """监听统计信息"""
+        with self._lock:
+            return {
+                'watched_dirs': len(self._watches),
+                'clients': len(self._sid_dirs),
+                'inotify': self._inotify is not None,
+                'polling_dirs': sum(1 for w in self._watches.values() if w.wd is None)
+            }
+
+    # ---------- 后台线程 ----------
+
+    def _ensure_started(self):
+        """首次订阅时初始化 inotify 并启动后台线程"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            if self.use_inotify:
+                try:
+                    self._inotify = _Inotify()
+                except (OSError, AttributeError) as e:
+                    logging.warning(f"inotify 不可用，目录变更改为轮询检测: {str(e)}")
+            self._thread = threading.Thread(target=self._run, name='fs-watcher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """后台循环：读取 inotify 事件、轮询快照、推送到期的合并事件"""
+        next_poll = time.monotonic()
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                timeout = next_poll - now
+                if self._pending_since:
+                    timeout = min(timeout, min(self._pending_since.values()) + self.coalesce_delay - now)
+            timeout = max(0.0, timeout)
+
+            try:
+                if self._inotify is not None:
+                    readable, _, _ = select.select([self._inotify.fd], [], [], timeout)
+                    if readable:
+                        self._handle_inotify(self._inotify.read_events())
+                else:
+                    self._wakeup.wait(timeout)
+                    self._wakeup.clear()
+
+                now = time.monotonic()
+                if now >= next_poll:
+                    next_poll = now + self.poll_interval
+                    self._poll()
+                self._flush(now)
+            except Exception as e:
+                logging.error(f"目录变更监听失败: {str(e)}", exc_info=True)
+                time.sleep(self.poll_interval)
+
+    def _note(self, abs_dir, name, created):
+        """记录目录内一个条目的变更（调用方持有锁）"""
+        if self.file_manager._is_filtered(name):
+            return
+        pending = self._pending.setdefault(abs_dir, {})
+        pending.setdefault(name, created)
+        self._pending_since.setdefault(abs_dir, time.monotonic())
+
+    def _notice(self, abs_dir, kind):
+        """记录需要整体通知的目录（调用方持有锁），removed 优先于 resync"""
+        if self._notices.get(abs_dir) != 'removed':
+            self._notices[abs_dir] = kind
+        self._pending_since.setdefault(abs_dir, time.monotonic())
+
+    def _handle_inotify(self, events):
+        """把 inotify 事件转换为待推送的变更"""
+        with self._lock:
+            for wd, mask, name in events:
+                if mask & IN_Q_OVERFLOW:
+                    # 事件已丢失，所有目录都需要重新加载
+                    for abs_dir in self._watches:
+                        self._notice(abs_dir, 'resync')
+                    continue
+                abs_dir = self._wd_dirs.get(wd)
+                if abs_dir is None:
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    self._notice(abs_dir, 'removed')
+                    if mask & IN_IGNORED:
+                        self._wd_dirs.pop(wd, None)
+                        watch = self._watches.get(abs_dir)
+                        if watch is not None:
+                            watch.wd = None
+                    continue
+                if name:
+                    self._note(abs_dir, name, bool(mask & (IN_CREATE | IN_MOVED_TO)))
+
+    def _take_snapshot(self, abs_dir):
+        """轮询快照：目录签名和各条目的 (inode, 大小, 修改时间)，条目过多时只返回签名"""
+        stat_info = os.stat(abs_dir)
+        signature = (stat_info.st_ino, stat_info.st_mtime_ns, stat_info.st_size)
+        snapshot = {}
+        with os.scandir(abs_dir) as entries:
+            for entry in entries:
+                if len(snapshot) >= self.max_poll_entries:
+                    return signature, None
+                try:
+                    entry_stat = entry.stat()
+                except OSError:
+                    continue
+                snapshot[entry.name] = (entry_stat.st_ino, entry_stat.st_size, entry_stat.st_mtime_ns)
+        return signature, snapshot
+
+    def _poll(self):
+        """比较轮询目录的快照"""
+        with self._lock:
+            polled = [(abs_dir, watch) for abs_dir, watch in self._watches.items() if watch.wd is None]
+
+        for abs_dir, watch in polled:
+            try:
+                signature, snapshot = self._take_snapshot(abs_dir)
+            except OSError:
+                with self._lock:
+                    self._notice(abs_dir, 'removed')
+                continue
+
+            with self._lock:
+                if self._watches.get(abs_dir) is not watch:
+                    continue
+                old_signature, old_snapshot = watch.signature, watch.snapshot
+                watch.signature, watch.snapshot = signature, snapshot
+                if old_signature is None:
+                    # 首次轮询只建立基线
+                    continue
+                if snapshot is None or old_snapshot is None:
+                    if signature != old_signature:
+                        self._notice(abs_dir, 'resync')
+                    continue
+                for name, info in snapshot.items():
+                    old_info = old_snapshot.get(name)
+                    if old_info is None:
+                        self._note(abs_dir, name, True)
+                    elif old_info != info:
+                        self._note(abs_dir, name, False)
+                for name in old_snapshot.keys() - snapshot.keys():
+                    self._note(abs_dir, name, False)
+
+    def _flush(self, now):
+        """推送合并窗口已到期的目录变更"""
+        with self._lock:
+            due = [d for d, since in self._pending_since.items() if now - since >= self.coalesce_delay]
+            batches = []
+            for abs_dir in due:
+                del self._pending_since[abs_dir]
+                batches.append((abs_dir, self._pending.pop(abs_dir, {}), self._notices.pop(abs_dir, None)))
+
+        for abs_dir, names, notice in batches:
+            if notice is not None:
+                self.file_manager.invalidate_listing(abs_dir)
+                if notice == 'removed':
+                    self._drop_watch(abs_dir)
+                self._emit(abs_dir, {'dir': abs_dir, notice: True})
+                continue
+
+            changes = []
+            for name, created in names.items():
+                # 同时使目录本身和（若为子目录）子目录的缓存失效
+                self.file_manager.invalidate_listing(os.path.join(abs_dir, name))
+                item = self.file_manager.describe_entry(abs_dir, name)
+                if item is None:
+                    # 创建后又被删除的条目客户端从未见过，无需推送
+                    if not created:
+                        changes.append({'action': 'deleted', 'name': name})
+                else:
+                    changes.append({'action': 'created' if created else 'modified', 'name': name, 'item': item})
+            if changes:
+                self._emit(abs_dir, {'dir': abs_dir, 'changes': changes})
+
+    def _drop_watch(self, abs_dir):
+        """目录已不存在：停止监听并移除其订阅者"""
+        with self._lock:
+            watch = self._watches.pop(abs_dir, None)
+            if watch is None:
+                return
+            if watch.wd is not None:
+                self._wd_dirs.pop(watch.wd, None)
+                self._inotify.rm_watch(watch.wd)
+            for sid in watch.sids:
+                if self._sid_dirs.get(sid) == abs_dir:
+                    del self._sid_dirs[sid]
+
+    def _emit(self, abs_dir, payload):
+        """推送到查看该目录的所有客户端"""
+        self.socketio.emit('fs_changes', payload, to=self.room_for(abs_dir))
+        socketio_emits_total.inc(event='fs_changes')
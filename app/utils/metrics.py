@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+应用指标模块（Prometheus 文本格式）
+
+各模块在运行过程中直接累加计数器/直方图，/metrics 抓取时只读取已聚合的值，
+不会触发新的数据采集。
+"""
+
+import math
+from threading import Lock
+
+
+def _format_value(value):
+    """格式化指标数值"""
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape_label(value):
+    """转义标签值"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    """格式化标签集合"""
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.extend(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + '}'
+
+
+class _Metric:
+    """指标基类"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = Lock()
+
+    def _key(self, labels):
+        """将标签字典转为有序元组"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        """返回 (后缀, 标签值, 额外标签, 数值) 列表"""
+        with self._lock:
+            return [('', key, None, value) for key, value in self._values.items()]
+
+    def render(self):
+        """渲染为 Prometheus 文本行"""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}'
+        ]
+        for suffix, key, extra, value in self._samples():
+            labels = _format_labels(self.labelnames, key, extra)
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """计数器累加"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """读取当前值"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """瞬时值指标，可直接设置或由回调函数在抓取时提供"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), value_function=None):
+        super().__init__(name, documentation, labelnames)
+        self._value_function = value_function
+
+    def set(self, value, **labels):
+        """设置当前值"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, value_function):
+        """设置取值回调：返回 {标签值元组: 数值}，须为已聚合的廉价读取"""
+        self._value_function = value_function
+
+    def _samples(self):
+        if self._value_function is None:
+            return super()._samples()
+        values = self._value_function() or {}
+        return [('', tuple(str(v) for v in key), None, value) for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    metric_type = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        """记录一次观测值"""
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['counts'][i] += 1
+                    break
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, entry in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry['counts']):
+                    cumulative += count
+                    samples.append(('_bucket', key, [('le', _format_value(float(bound)))], cumulative))
+                samples.append(('_sum', key, None, entry['sum']))
+                samples.append(('_count', key, None, entry['count']))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = Lock()
+
+    def register(self, metric):
+        """注册指标（同名指标只注册一次）"""
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        """创建并注册计数器"""
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), value_function=None):
+        """创建并注册瞬时值指标"""
+        return self.register(Gauge(name, documentation, labelnames, value_function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        """创建并注册直方图"""
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        """按名称获取指标"""
+        return self._metrics.get(name)
+
+    def render(self):
+        """渲染所有指标为 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# 全局指标注册表
+metrics_registry = MetricsRegistry()
+
+# 应用内部计数器
+command_lines_total = metrics_registry.counter(
+    'train_tools_command_lines_total', '命令执行器处理的输出行数')
+socketio_emits_total = metrics_registry.counter(
+    'train_tools_socketio_emits_total', '已发送的 SocketIO 消息数', ['event'])
+socketio_dropped_total = metrics_registry.counter(
+    'train_tools_socketio_dropped_total', '未发送（被丢弃）的 SocketIO 消息数', ['event', 'reason'])
+preview_cache_requests_total = metrics_registry.counter(
+    'train_tools_preview_cache_requests_total', '文件预览缓存查询次数', ['result'])
+preview_cache_evictions_total = metrics_registry.counter(
+    'train_tools_preview_cache_evictions_total', '文件预览缓存淘汰次数')
+proxy_request_duration_seconds = metrics_registry.histogram(
+    'train_tools_proxy_request_duration_seconds', 'TensorBoard 代理请求耗时（秒）', ['method', 'status'])
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+文件响应模块（Range / 条件请求）
+
+为文件内容、下载和音视频预览提供统一的 HTTP 语义：
+强 ETag（inode + 大小 + 修改时间）、If-None-Match / If-Modified-Since 返回 304、
+单区间和多区间（multipart/byteranges）Range 请求返回 206，If-Range 不匹配时返回完整内容。
+"""
+
+import os
+import uuid
+import mimetypes
+import urllib.parse
+from flask import request, send_file, Response
+from werkzeug.http import http_date, parse_date, quote_etag
+
+
+CHUNK_SIZE = 256 * 1024
+
+
+def make_etag(stat_info):
+    """由 inode、大小和修改时间生成强 ETag（不含引号）"""
+    return f"{stat_info.st_ino:x}-{stat_info.st_size:x}-{stat_info.st_mtime_ns:x}"
+
+
+def attachment_header(download_name):
+    """构造附件下载头，兼容非 ASCII 文件名"""
+    ascii_name = download_name.encode('ascii', 'replace').decode('ascii').replace('?', '_').replace('"', '_')
+    quoted_name = urllib.parse.quote(download_name)
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quoted_name}"
+
+
+def _not_modified(etag, mtime):
+    """判断条件请求是否命中（If-None-Match 优先于 If-Modified-Since）"""
+    if request.headers.get('If-None-Match'):
+        return request.if_none_match.contains_weak(etag)
+    if_modified_since = request.if_modified_since
+    if if_modified_since is not None:
+        return int(mtime) <= int(if_modified_since.timestamp())
+    return False
+
+
+def _range_applies(etag, mtime):
+    """If-Range 校验：仅在表示未变化时才按 Range 响应"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        # If-Range 要求强比较，弱 ETag 永远不匹配
+        return if_range == quote_etag(etag)
+    date = parse_date(if_range)
+    return date is not None and int(mtime) == int(date.timestamp())
+
+
+def _resolve_ranges(size):
+    """解析 Range 头为 [(start, end_exclusive)]；无 Range 返回 None，无可满足区间返回 []"""
+    if not request.headers.get('Range'):
+        return None
+    parsed = request.range
+    if parsed is None or parsed.units != 'bytes':
+        # 无法解析的 Range 按规范忽略
+        return None
+
+    ranges = []
+    for start, stop in parsed.ranges:
+        if start < 0:
+            start, stop = max(0, size + start), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            ranges.append((start, stop))
+    return ranges
+
+
+def _iter_ranges(abs_path, ranges, parts=None):
+    """按区间读取文件；parts 为各区间前的 multipart 头部"""
+    with open(abs_path, 'rb') as f:
+        for index, (start, stop) in enumerate(ranges):
+            if parts is not None:
+                yield parts[index]
+            f.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        if parts is not None:
+            yield parts[-1]
+
+
+def send_file_with_ranges(abs_path, as_attachment=False, download_name=None):
+    """发送文件，支持条件请求和（多）区间请求"""
+    stat_info = os.stat(abs_path)
+    size = stat_info.st_size
+    mtime = stat_info.st_mtime
+    etag = make_etag(stat_info)
+    mimetype = mimetypes.guess_type(download_name or abs_path)[0] or 'application/octet-stream'
+
+    headers = {
+        'ETag': quote_etag(etag),
+        'Last-Modified': http_date(mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'no-cache'  # 可缓存，但每次使用前须用 ETag 重新验证
+    }
+    if as_attachment:
+        headers['Content-Disposition'] = attachment_header(download_name or os.path.basename(abs_path))
+
+    if request.method in ('GET', 'HEAD') and _not_modified(etag, mtime):
+        return Response(status=304, headers=headers)
+
+    ranges = _resolve_ranges(size) if _range_applies(etag, mtime) else None
+
+    if ranges is None:
+        response = send_file(abs_path, mimetype=mimetype, conditional=False, etag=False)
+        response.headers.update(headers)
+        return response
+
+    if not ranges:
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
+
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        headers['Content-Length'] = str(stop - start)
+        return Response(_iter_ranges(abs_path, ranges), status=206, mimetype=mimetype,
+                        headers=headers, direct_passthrough=True)
+
+    # 多区间：multipart/byteranges，预先构造各部分头部以计算准确的 Content-Length
+    boundary = uuid.uuid4().hex
+    parts = [
+        (f'\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n'
+         f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n').encode('latin-1')
+        for start, stop in ranges
+    ]
+    parts.append(f'\r\n--{boundary}--\r\n'.encode('latin-1'))
+    headers['Content-Length'] = str(sum(len(p) for p in parts) + sum(stop - start for start, stop in ranges))
+    return Response(_iter_ranges(abs_path, ranges, parts), status=206,
+                    content_type=f'multipart/byteranges; boundary={boundary}',
+                    headers=headers, direct_passthrough=True)
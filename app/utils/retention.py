@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+检查点保留策略模块
+
+按目录配置保留规则：保留最新的 N 个、按文件名中的指标保留最好的 N 个，其余超过指定时长的删除。
+后台线程定期评估规则，目录内容来自 FileManager 的目录索引缓存，删除走 FileManager 的删除接口；
+每次删除（或失败）都追加写入审计日志（JSON Lines）。
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import fnmatch
+import logging
+from collections import deque
+from threading import Thread, Event, Lock
+from .metrics import metrics_registry
+
+
+retention_deleted_total = metrics_registry.counter(
+    'train_tools_retention_deleted_total', '保留策略删除的条目数', ['rule'])
+retention_deleted_bytes_total = metrics_registry.counter(
+    'train_tools_retention_deleted_bytes_total', '保留策略释放的字节数', ['rule'])
+
+# 指标值：名称后可跟 = _ - : 分隔符，如 val_loss=0.123、acc0.91、loss-1.5e-3
+NUMBER_PATTERN = r'[=_:-]?(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)'
+
+
+class RetentionRule:
+    """保留规则"""
+
+    MODES = ('min', 'max')
+
+    def __init__(self, name, path, pattern='*', keep_last=1, keep_best=0, metric=None,
+                 mode='min', older_than=0, min_free_gb=None, include_dirs=True):
+        if mode not in self.MODES:
+            raise ValueError(f"不支持的指标排序方式: {mode}")
+        if keep_best and not metric:
+            raise ValueError("keep_best 需要同时指定 metric")
+        if keep_last < 0 or keep_best < 0 or older_than < 0:
+            raise ValueError("keep_last、keep_best、older_than 不能为负数")
+
+        self.name = name
+        self.path = path
+        self.pattern = pattern
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.metric = metric
+        self.mode = mode
+        self.older_than = older_than
+        self.min_free_gb = min_free_gb
+        self.include_dirs = include_dirs
+        self._metric_regex = re.compile(
+            r'(?<![A-Za-z0-9])' + re.escape(metric) + NUMBER_PATTERN) if metric else None
+
+    @classmethod
+    def from_dict(cls, data):
+        """从字典创建规则"""
+        return cls(
+            name=data.get('name') or data['path'],
+            path=data['path'],
+            pattern=data.get('pattern', '*'),
+            keep_last=int(data.get('keep_last', 1)),
+            keep_best=int(data.get('keep_best', 0)),
+            metric=data.get('metric'),
+            mode=data.get('mode', 'min'),
+            older_than=float(data.get('older_than', 0)),
+            min_free_gb=data.get('min_free_gb'),
+            include_dirs=data.get('include_dirs', True)
+        )
+
+    def parse_metric(self, name):
+        """从文件名中解析指标值，没有时返回 None"""
+        if self._metric_regex is None:
+            return None
+        match = self._metric_regex.search(name)
+        return float(match.group(1)) if match else None
+
+    def to_dict(self):
+        """转换为字典（返回给前端）"""
+        return {
+            'name': self.name,
+            'path': self.path,
+            'pattern': self.pattern,
+            'keep_last': self.keep_last,
+            'keep_best': self.keep_best,
+            'metric': self.metric,
+            'mode': self.mode,
+            'older_than': self.older_than,
+            'min_free_gb': self.min_free_gb,
+            'include_dirs': self.include_dirs
+        }
+
+
+class RetentionManager:
+    """检查点保留策略管理类"""
+
+    def __init__(self, file_manager, rules=None, interval=600, audit_path=None, max_history=500):
+        self.file_manager = file_manager
+        self.rules = [RetentionRule.from_dict(rule) for rule in (rules or [])]
+        self.interval = interval
+        self.audit_path = audit_path
+        self.last_run = None
+        self._history = deque(maxlen=max_history)
+        self._lock = Lock()
+        # 后台扫描和手动执行不能同时删除
+        self._run_lock = Lock()
+        self._stop_event = Event()
+        self.scan_thread = None
+        self._load_audit()
+
+    def start(self):
+        """启动后台扫描线程（没有规则时不启动）"""
+        if self.scan_thread is None and self.rules:
+            self.scan_thread = Thread(target=self._scan_loop)
+            self.scan_thread.daemon = True
+            self.scan_thread.start()
+
+    def stop(self):
+        """停止后台扫描线程"""
+        self._stop_event.set()
+        if self.scan_thread:
+            self.scan_thread.join()
+            self.scan_thread = None
+
+    def get_rules(self):
+        """获取规则列表"""
+        return [rule.to_dict() for rule in self.rules]
+
+    def get_rule(self, name):
+        """按名称查找规则"""
+        for rule in self.rules:
+            if rule.name == name:
+                return rule
+        return None
+
+    def get_audit(self, limit=100):
+        """最近的审计记录（新记录在前）"""
+        with self._lock:
+            records = list(self._history)
+        return records[::-1][:limit]
+
+    # ---------- 评估 ----------
+
+    def plan(self, rule, now=None):
+        """计算规则的执行计划（不删除任何文件），即 dry-run 预览"""
+        now = time.time() if now is None else now
+        workspace = os.path.abspath('.')
+        abs_dir = os.path.abspath(rule.path)
+        result = {'rule': rule.name, 'path': rule.path, 'keep': [], 'delete': [], 'reclaim_bytes': 0,
+                  'active': True}
+        if not abs_dir.startswith(workspace + os.sep):
+            result['error'] = 'Permission denied'
+            return result
+        if not os.path.isdir(abs_dir):
+            result['error'] = 'Folder not found'
+            return result
+
+        if rule.min_free_gb is not None:
+            free_gb = shutil.disk_usage(abs_dir).free / (1024 ** 3)
+            result['free_gb'] = round(free_gb, 2)
+            # 磁盘空间充足时只预览，不删除
+            result['active'] = free_gb < rule.min_free_gb
+
+        entries = [
+            entry for entry in self.file_manager._get_listing(abs_dir)['entries']
+            if (rule.include_dirs or not entry.is_dir) and fnmatch.fnmatch(entry.name, rule.pattern)
+        ]
+        # 最新在前
+        entries.sort(key=lambda e: e.mtime, reverse=True)
+
+        reasons = {}
+        for entry in entries[:rule.keep_last]:
+            reasons[entry.name] = 'last'
+        if rule.keep_best:
+            scored = [(rule.parse_metric(entry.name), entry) for entry in entries]
+            scored = [item for item in scored if item[0] is not None]
+            scored.sort(key=lambda item: item[0], reverse=rule.mode == 'max')
+            for _, entry in scored[:rule.keep_best]:
+                reasons.setdefault(entry.name, 'best')
+
+        for entry in entries:
+            reason = reasons.get(entry.name)
+            if reason is None and now - entry.mtime < rule.older_than:
+                reason = 'recent'
+            item = self._describe(rule, abs_dir, entry, reason)
+            if reason is None:
+                result['delete'].append(item)
+                result['reclaim_bytes'] += item['size'] or 0
+            else:
+                result['keep'].append(item)
+        return result
+
+    def _describe(self, rule, abs_dir, entry, reason):
+        """计划中的单个条目"""
+        size = entry.size
+        if entry.is_dir:
+            dir_size = self.file_manager._get_dir_size(os.path.join(abs_dir, entry.name), entry.signature)
+            size = dir_size[0] if dir_size else None
+        return {
+            'name': entry.name,
+            'path': os.path.relpath(os.path.join(abs_dir, entry.name), os.path.abspath('.')),
+            'is_dir': entry.is_dir,
+            'size': size,
+            'mtime': entry.mtime,
+            'metric': rule.parse_metric(entry.name),
+            'reason': reason
+        }
+
+    def preview(self, rule_name=None):
+        """预览一条或全部规则的执行计划"""
+        rules = self.rules if rule_name is None else [self.get_rule(rule_name)]
+        return [self.plan(rule) for rule in rules if rule is not None]
+
+    def run_once(self):
+        """评估全部规则并执行删除，返回每条规则的执行结果"""
+        with self._run_lock:
+            results = []
+            for rule in self.rules:
+                try:
+                    results.append(self._apply(rule))
+                except Exception as e:
+                    logging.error(f"保留策略执行失败 {rule.name}: {str(e)}", exc_info=True)
+                    results.append({'rule': rule.name, 'error': str(e)})
+            self.last_run = {'time': time.time(), 'results': results}
+            return results
+
+    def _apply(self, rule):
+        """执行单条规则"""
+        plan = self.plan(rule)
+        summary = {'rule': rule.name, 'deleted': 0, 'failed': 0, 'reclaimed_bytes': 0}
+        if plan.get('error'):
+            summary['error'] = plan['error']
+            return summary
+        if not plan['active']:
+            summary['skipped'] = 'disk free above min_free_gb'
+            return summary
+
+        for item in plan['delete']:
+            abs_path = os.path.abspath(item['path'])
+            try:
+                # 评估之后又被写入的条目不删除
+                if os.stat(abs_path).st_mtime != item['mtime']:
+                    continue
+            except OSError:
+                continue
+            result = self.file_manager.delete_file_or_folder(abs_path, 'folder' if item['is_dir'] else 'file')
+            self._audit(rule, item, result)
+            if result.get('success'):
+                summary['deleted'] += 1
+                summary['reclaimed_bytes'] += item['size'] or 0
+                retention_deleted_total.inc(rule=rule.name)
+                retention_deleted_bytes_total.inc(item['size'] or 0, rule=rule.name)
+            else:
+                summary['failed'] += 1
+        if summary['deleted'] or summary['failed']:
+            logging.info(f"保留策略 {rule.name}: 删除 {summary['deleted']} 项，"
+                         f"释放 {summary['reclaimed_bytes']} 字节，失败 {summary['failed']} 项")
+        return summary
+
+    def _scan_loop(self):
+        """后台扫描循环"""
+        while not self._stop_event.wait(self.interval):
+            self.run_once()
+
+    # ---------- 审计日志 ----------
+
+    def _audit(self, rule, item, result):
+        """记录一次删除"""
+        record = {
+            'time': time.time(),
+            'rule': rule.name,
+            'path': item['path'],
+            'is_dir': item['is_dir'],
+            'size': item['size'],
+            'mtime': item['mtime'],
+            'metric': item['metric'],
+            'success': bool(result.get('success')),
+            'error': result.get('error')
+        }
+        with self._lock:
+            self._history.append(record)
+            if self.audit_path:
+                try:
+                    os.makedirs(os.path.dirname(self.audit_path), exist_ok=True)
+                    with open(self.audit_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                except OSError as e:
+                    logging.warning(f"写入保留策略审计日志失败: {str(e)}")
+
+    def _load_audit(self):
+        """启动时载入审计日志的最近记录"""
+        if not self.audit_path:
+            return
+        try:
+            with open(self.audit_path, 'r', encoding='utf-8') as f:
+                lines = deque(f, maxlen=self._history.maxlen)
+        except OSError:
+            return
+        for line in lines:
+            try:
+                self._history.append(json.loads(line))
+            except ValueError:
+                continue
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+目录大小索引模块（类似 du）
+
+后台线程递归统计目录的总大小和文件数，目录列表只读取索引、从不阻塞请求。
+每个目录记录自身直接包含的文件大小和子目录名，总量由子目录自底向上汇总：
+- 目录签名（mtime 等）未变化时复用自身统计，只需 stat 子目录，不必重新遍历文件
+- 文件变更事件（invalidate）标记所在目录需要重新扫描，并向上更新祖先目录的总量
+- 原地追加的文件不改变目录 mtime，因此自身统计超过 rescan_age 后也会重新扫描
+- 只有正在被查看的目录登记为复查根目录（其子树一并复查），超过 root_ttl 未被查看的根目录不再复查
+索引保存到缓存目录，服务重启后直接可用，随后在后台校验更新。
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+
+
+_INDEX_VERSION = 1
+
+
+class DirSizeEntry:
+    """单个目录的统计"""
+
+    __slots__ = ('signature', 'own_bytes', 'own_files', 'subdirs', 'total_bytes', 'total_files', 'scanned_at')
+
+    def __init__(self, signature, own_bytes, own_files, subdirs, scanned_at,
+                 total_bytes=None, total_files=None):
+        self.signature = signature
+        self.own_bytes = own_bytes
+        self.own_files = own_files
+        self.subdirs = subdirs
+        self.scanned_at = scanned_at
+        # 子树尚未统计完成时为 None
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+
+
+class DirectorySizeIndex:
+    """目录大小后台索引类"""
+
+    def __init__(self, cache_dir=None, refresh_interval=60, rescan_age=300, root_ttl=600):
+        self.index_path = os.path.join(cache_dir, 'size_index.json') if cache_dir else None
+        # 后台定期复查最近被查看过的目录
+        self.refresh_interval = refresh_interval
+        # 目录自身统计的最长复用时间（覆盖原地追加写入的文件）
+        self.rescan_age = rescan_age
+        # 超过该时长未被查看的目录不再定期复查
+        self.root_ttl = root_ttl
+        # 统计结果变化时递增，用于使按大小排序的缓存失效
+        self.version = 0
+
+        self._entries = {}
+        self._dirty = set()
+        self._roots = {}
+        self._queue = deque()
+        self._queued = set()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._changed_since_save = False
+        self._load()
+
+    # ---------- 查询 ----------
+
+    def add_root(self, abs_dir):
+        """登记正在被查看的目录：后台定期复查其子树，尚未统计时立即加入队列"""
+        self._ensure_started()
+        with self._cond:
+            self._roots[abs_dir] = time.time()
+            if abs_dir not in self._entries:
+                self._enqueue(abs_dir)
+
+    def lookup(self, abs_dir, signature=None):
+        """返回 (总大小, 文件数)，尚未统计完成时返回 None；缺失或已变化的目录加入后台队列
+
+        不访问文件系统：signature 为调用方已有的目录签名（如目录列表缓存中的），与索引不一致时重新统计。
+        """
+        self._ensure_started()
+        with self._cond:
+            entry = self._entries.get(abs_dir)
+            if entry is None or entry.total_bytes is None or \
+                    (signature is not None and entry.signature != signature):
+                self._enqueue(abs_dir)
+            if entry is None or entry.total_bytes is None:
+                return None
+            return entry.total_bytes, entry.total_files
+
+    def invalidate(self, path):
+        """文件系统变更：标记所在目录需要重新扫描"""
+        abs_path = os.path.abspath(path)
+        with self._cond:
+            # 目录本身被删除或改名时，其父目录的子目录列表也需要更新
+            for candidate in (abs_path, os.path.dirname(abs_path)):
+                if candidate in self._entries:
+                    self._dirty.add(candidate)
+                    self._enqueue(candidate)
+
+    def _enqueue(self, abs_dir):
+        """加入后台队列（调用方持有锁）"""
+        if abs_dir not in self._queued:
+            self._queued.add(abs_dir)
+            self._queue.append(abs_dir)
+            self._cond.notify()
+
+    # ---------- 后台统计 ----------
+
+    def _ensure_started(self):
+        """首次查询时启动后台线程"""
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='size-index', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        """后台循环：处理队列，空闲时定期复查最近查看过的目录并保存索引"""
+        last_refresh = time.time()
+        while True:
+            with self._cond:
+                if not self._queue:
+                    self._cond.wait(timeout=self.refresh_interval)
+                abs_dir = self._queue.popleft() if self._queue else None
+                self._queued.discard(abs_dir)
+
+            if abs_dir is not None:
+                try:
+                    self._refresh(abs_dir)
+                except Exception as e:
+                    logging.error(f"统计目录大小失败 {abs_dir}: {str(e)}", exc_info=True)
+                with self._cond:
+                    idle = not self._queue
+                if idle:
+                    self._save()
+                continue
+
+            now = time.time()
+            if now - last_refresh >= self.refresh_interval:
+                last_refresh = now
+                with self._cond:
+                    for root, requested_at in list(self._roots.items()):
+                        if now - requested_at > self.root_ttl:
+                            del self._roots[root]
+                        else:
+                            self._enqueue(root)
+            self._save()
+
+    def _scan_own(self, abs_dir):
+        """扫描目录自身：直接包含的文件总大小、文件数和子目录名（不跟随符号链接）"""
+        own_bytes = own_files = 0
+        subdirs = []
+        with os.scandir(abs_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    else:
+                        own_bytes += entry.stat(follow_symlinks=False).st_size
+                        own_files += 1
+                except OSError:
+                    continue
+        return own_bytes, own_files, tuple(subdirs)
+
+    def _refresh(self, top):
+        """增量统计 top 子树：签名未变且未过期的目录复用自身统计，只下探子目录"""
+        changed = False
+        stack = [(top, False)]
+        while stack:
+            abs_dir, children_done = stack.pop()
+            if children_done:
+                changed |= self._sum_totals(abs_dir)
+                continue
+
+            try:
+                stat_info = os.stat(abs_dir)
+            except OSError:
+                with self._cond:
+                    changed |= self._remove_subtree(abs_dir)
+                continue
+            signature = (stat_info.st_ino, stat_info.st_mtime_ns, stat_info.st_size)
+            now = time.time()
+
+            with self._cond:
+                entry = self._entries.get(abs_dir)
+                reuse = (entry is not None and entry.signature == signature and
+                         abs_dir not in self._dirty and now - entry.scanned_at < self.rescan_age)
+                self._dirty.discard(abs_dir)
+
+            if not reuse:
+                try:
+                    own_bytes, own_files, subdirs = self._scan_own(abs_dir)
+                except OSError:
+                    own_bytes, own_files, subdirs = 0, 0, ()
+                with self._cond:
+                    old = self._entries.get(abs_dir)
+                    if old is not None:
+                        for name in set(old.subdirs) - set(subdirs):
+                            self._remove_subtree(os.path.join(abs_dir, name))
+                    self._entries[abs_dir] = entry = DirSizeEntry(
+                        signature, own_bytes, own_files, subdirs, now,
+                        old.total_bytes if old else None, old.total_files if old else None)
+                changed = True
+
+            stack.append((abs_dir, True))
+            stack.extend((os.path.join(abs_dir, name), False) for name in entry.subdirs)
+
+        # 向上更新已索引的祖先目录的总量
+        parent = os.path.dirname(top)
+        while parent != top and parent in self._entries:
+            changed |= self._sum_totals(parent)
+            top, parent = parent, os.path.dirname(parent)
+
+        if changed:
+            with self._cond:
+                self.version += 1
+                self._changed_since_save = True
+
+    def _sum_totals(self, abs_dir):
+        """由自身统计和子目录总量汇总目录总量，返回是否变化"""
+        with self._cond:
+            entry = self._entries.get(abs_dir)
+            if entry is None:
+                return False
+            total_bytes, total_files = entry.own_bytes, entry.own_files
+            for name in entry.subdirs:
+                child = self._entries.get(os.path.join(abs_dir, name))
+                if child is None or child.total_bytes is None:
+                    # 子树未统计完成（例如无权限），按 0 计
+                    continue
+                total_bytes += child.total_bytes
+                total_files += child.total_files
+            changed = (total_bytes, total_files) != (entry.total_bytes, entry.total_files)
+            entry.total_bytes, entry.total_files = total_bytes, total_files
+            return changed
+
+    def _remove_subtree(self, abs_dir):
+        """删除目录及其所有子目录的统计（调用方持有锁）"""
+        if abs_dir not in self._entries:
+            return False
+        prefix = abs_dir + os.sep
+        for path in [p for p in self._entries if p == abs_dir or p.startswith(prefix)]:
+            del self._entries[path]
+        return True
+
+    # ---------- 持久化 ----------
+
+    def _load(self):
+        """从缓存目录读取索引"""
+        if not self.index_path:
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != _INDEX_VERSION:
+                return
+            for path, row in data['entries'].items():
+                signature, own_bytes, own_files, subdirs, scanned_at, total_bytes, total_files = row
+                self._entries[path] = DirSizeEntry(tuple(signature), own_bytes, own_files, tuple(subdirs),
+                                                   scanned_at, total_bytes, total_files)
+        except (OSError, ValueError, KeyError, TypeError):
+            self._entries = {}
+
+    def _save(self):
+        """统计结果有变化时写入缓存目录（临时文件 + 原子替换）"""
+        if not self.index_path:
+            return
+        with self._cond:
+            if not self._changed_since_save:
+                return
+            self._changed_since_save = False
+            rows = {
+                path: [list(e.signature), e.own_bytes, e.own_files, list(e.subdirs), e.scanned_at,
+                       e.total_bytes, e.total_files]
+                for path, e in self._entries.items()
+            }
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': _INDEX_VERSION, 'entries': rows}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logging.warning(f"保存目录大小索引失败: {str(e)}")
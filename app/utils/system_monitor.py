@@ -7,22 +7,38 @@ import time
 import logging
 import psutil
 import GPUtil
-from threading import Thread
+from threading import Thread, Event, Lock
+from .metrics import socketio_emits_total, socketio_dropped_total
 
 
 class SystemMonitor:
-    """系统资源监控类"""
+    """系统资源监控类
+
+    按订阅者数量切换采样频率：有客户端订阅时以 active_interval 全速采样并推送，
+    无人订阅时以 idle_interval 低频采样，仅用于保留历史数据。
+    """
     
-    def __init__(self, socketio):
+    def __init__(self, socketio, active_interval=1, idle_interval=10):
         self.socketio = socketio
         self.system_data_history = []
         self.is_running = False
         self.monitor_thread = None
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        # 订阅者（SocketIO 会话ID）集合
+        self._subscribers = set()
+        self._subscribers_lock = Lock()
+        # 用于在订阅状态变化或停止时唤醒监控线程
+        self._wakeup = Event()
+        # 每次采样后调用的监听器（如告警引擎）
+        self._listeners = []
     
     def start_monitoring(self):
         """启动系统监控"""
         if not self.is_running:
             self.is_running = True
+            # 预热 CPU 统计，之后每次取值均为距上次采样的平均值
+            psutil.cpu_percent(interval=None)
             self.monitor_thread = Thread(target=self._monitor_loop)
             self.monitor_thread.daemon = True
             self.monitor_thread.start()
@@ -31,13 +47,50 @@ class SystemMonitor:
     def stop_monitoring(self):
         """停止系统监控"""
         self.is_running = False
+        self._wakeup.set()
         if self.monitor_thread:
             self.monitor_thread.join()
         logging.info("系统监控已停止")
     
+    def add_listener(self, callback):
+        """注册采样监听器，每次采样后以数据点为参数调用"""
+        self._listeners.append(callback)
+    
+    def subscribe(self, sid):
+        """添加订阅者，首个订阅者到达时立即切换到全速采样"""
+        with self._subscribers_lock:
+            was_idle = not self._subscribers
+            self._subscribers.add(sid)
+        if was_idle:
+            logging.info("系统监控切换到实时采样模式")
+            self._wakeup.set()
+    
+    def unsubscribe(self, sid):
+        """移除订阅者"""
+        with self._subscribers_lock:
+            self._subscribers.discard(sid)
+            now_idle = not self._subscribers
+        if now_idle:
+            logging.info("系统监控切换到后台采样模式")
+    
+    def has_subscribers(self):
+        """是否有客户端正在订阅监控数据"""
+        with self._subscribers_lock:
+            return bool(self._subscribers)
+    
+    def get_subscriber_count(self):
+        """获取订阅者数量"""
+        with self._subscribers_lock:
+            return len(self._subscribers)
+    
+    def get_interval(self):
+        """获取当前采样间隔（秒）"""
+        return self.active_interval if self.has_subscribers() else self.idle_interval
+    
     def _monitor_loop(self):
         """监控循环"""
         while self.is_running:
+            self._wakeup.clear()
             try:
                 data_point = self._collect_system_data()
                 self.system_data_history.append(data_point)
@@ -46,18 +99,32 @@ class SystemMonitor:
                 if len(self.system_data_history) > 21:
                     self.system_data_history.pop(0)
                 
-                # 发送数据到前端
-                self.socketio.emit('usage', data_point)
+                # 仅在有订阅者时发送数据到前端
+                if self.has_subscribers():
+                    self.socketio.emit('usage', data_point)
+                    socketio_emits_total.inc(event='usage')
+                else:
+                    socketio_dropped_total.inc(event='usage', reason='no_subscribers')
                 
             except Exception as e:
                 logging.error("系统监控数据收集失败", exc_info=True)
+                data_point = None
             
-            time.sleep(1)
+            if data_point is not None:
+                for listener in self._listeners:
+                    try:
+                        listener(data_point)
+                    except Exception:
+                        logging.error("系统监控监听器执行失败", exc_info=True)
+            
+            # 等待下一次采样；订阅状态变化时提前唤醒，保证切换模式时序列不断档
+            self._wakeup.wait(self.get_interval())
     
     def _collect_system_data(self):
         """收集系统数据"""
-        cpu_usage = psutil.cpu_percent(interval=1)
-        memory_usage = round(psutil.virtual_memory().used / (1024 ** 3), 2)
+        cpu_usage = psutil.cpu_percent(interval=None)
+        virtual_memory = psutil.virtual_memory()
+        memory_usage = round(virtual_memory.used / (1024 ** 3), 2)
         
         # GPU 信息
         gpus = GPUtil.getGPUs()
@@ -74,6 +141,7 @@ class SystemMonitor:
         return {
             'cpu': cpu_usage,
             'memory': memory_usage,
+            'memory_percent': virtual_memory.percent,
             'gpu': gpu_usages,
             'gpu_memory': gpu_memory_usages,
             'save_memory': save_memory,
@@ -98,3 +166,8 @@ class SystemMonitor:
     def get_history(self):
         """获取历史数据"""
         return self.system_data_history
+    
+    def get_latest(self):
+        """获取最近一次采样数据（不触发新的采集）"""
+        history = self.system_data_history
+        return history[-1] if history else None
@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+表格文件预览模块（CSV / TSV / JSONL）
+
+单次流式遍历，内存占用有界：保留首页和末页、行的水塘样本，并增量计算每列的
+推断类型、空值数、最小/最大值和近似不同值个数（HyperLogLog）。
+请求内的遍历超过时间预算时提前停止（末页改为从文件尾部读取），完整遍历在后台进行；
+只有完整遍历的结果会被缓存。无法解析的行计入 bad_rows 并跳过。
+"""
+
+import io
+import os
+import csv
+import json
+import math
+import time
+import random
+import hashlib
+import logging
+from collections import deque
+
+
+TABLE_EXTENSIONS = {'.csv', '.tsv', '.jsonl', '.ndjson'}
+
+NULL_TOKENS = {'', 'na', 'n/a', 'nan', 'null', 'none', '-'}
+_BOOL_TOKENS = {'true': True, 'false': False}
+
+# 字符串最小/最大值只保留前若干字符
+_MAX_STRING_STAT = 200
+# 单元格返回给前端的最大长度
+_MAX_CELL_LENGTH = 500
+_SUMMARY_VERSION = 1
+
+
+def is_table_file(filename):
+    """是否为支持表格预览的文件"""
+    return os.path.splitext(filename)[1].lower() in TABLE_EXTENSIONS
+
+
+class HyperLogLog:
+    """HyperLogLog 近似基数估计（2^p 个寄存器，标准误差约 1.04 / sqrt(2^p)）"""
+
+    def __init__(self, p=12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        """加入一个字符串值"""
+        h = hash(value) & 0xFFFFFFFFFFFFFFFF
+        index = h & (self.m - 1)
+        w = h >> self.p
+        rank = (64 - self.p) - w.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        """估计不同值个数"""
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # 小基数时使用线性计数修正
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class ColumnStats:
+    """单列增量统计"""
+
+    # 类型推断格：bool / int / float 可逐步放宽，出现其他类型即为 string
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.nulls = 0
+        self.types = set()
+        self.min = None
+        self.max = None
+        self.str_min = None
+        self.str_max = None
+        self.distinct = HyperLogLog()
+
+    def add_text(self, value):
+        """加入一个 CSV 单元格（字符串，推断类型）"""
+        self.count += 1
+        if value.strip().lower() in NULL_TOKENS:
+            self.nulls += 1
+            return
+        self.distinct.add(value)
+
+        if 'string' not in self.types:
+            lowered = value.strip().lower()
+            if lowered in _BOOL_TOKENS:
+                self.types.add('bool')
+                return
+            try:
+                number = int(value)
+                self.types.add('int')
+                self._update_number(number)
+                return
+            except ValueError:
+                pass
+            try:
+                number = float(value)
+                if math.isfinite(number):
+                    self.types.add('float')
+                    self._update_number(number)
+                    return
+            except ValueError:
+                pass
+            self.types.add('string')
+        self._update_string(value)
+
+    def add_value(self, value):
+        """加入一个 JSON 值（类型已知）"""
+        self.count += 1
+        if value is None:
+            self.nulls += 1
+            return
+
+        if isinstance(value, bool):
+            self.types.add('bool')
+            self.distinct.add(str(value))
+        elif isinstance(value, (int, float)):
+            self.types.add('int' if isinstance(value, int) else 'float')
+            self.distinct.add(repr(value))
+            self._update_number(value)
+        elif isinstance(value, str):
+            self.types.add('string')
+            self.distinct.add(value)
+            self._update_string(value)
+        else:
+            self.types.add('array' if isinstance(value, list) else 'object')
+            self.distinct.add(json.dumps(value, sort_keys=True, ensure_ascii=False))
+
+    def _update_number(self, number):
+        if self.min is None or number < self.min:
+            self.min = number
+        if self.max is None or number > self.max:
+            self.max = number
+
+    def _update_string(self, value):
+        value = value[:_MAX_STRING_STAT]
+        if self.str_min is None or value < self.str_min:
+            self.str_min = value
+        if self.str_max is None or value > self.str_max:
+            self.str_max = value
+
+    def inferred_type(self):
+        """推断的列类型"""
+        types = self.types
+        if not types:
+            return 'null'
+        if len(types) == 1:
+            return next(iter(types))
+        if types <= {'int', 'float'}:
+            return 'float'
+        return 'mixed' if types & {'array', 'object'} else 'string'
+
+    def to_dict(self):
+        """转换为字典"""
+        column_type = self.inferred_type()
+        numeric = column_type in ('int', 'float')
+        return {
+            'name': self.name,
+            'type': column_type,
+            'count': self.count,
+            'nulls': self.nulls,
+            'min': self.min if numeric else self.str_min,
+            'max': self.max if numeric else self.str_max,
+            'distinct': self.distinct.count() if self.count > self.nulls else 0
+        }
+
+
+def _clip(value):
+    """截断过长的单元格"""
+    if isinstance(value, str) and len(value) > _MAX_CELL_LENGTH:
+        return value[:_MAX_CELL_LENGTH] + '…'
+    return value
+
+
+class TableScanner:
+    """单次遍历表格文件并汇总"""
+
+    def __init__(self, page_rows=50, sample_size=100, max_columns=200, time_budget=30.0):
+        self.page_rows = page_rows
+        self.sample_size = sample_size
+        self.max_columns = max_columns
+        self.time_budget = time_budget
+
+    def scan(self, file_path, encoding='utf-8', time_budget=None):
+        """遍历文件，返回表格预览结果；time_budget 为 None 时使用默认预算，为 0 时不限时"""
+        ext = os.path.splitext(file_path)[1].lower()
+        json_lines = ext in ('.jsonl', '.ndjson')
+        delimiter = '\t' if ext == '.tsv' else ','
+
+        columns = []
+        stats = []
+        first_rows = []
+        last_rows = deque(maxlen=self.page_rows)
+        sample = []
+        rng = random.Random(0)
+        row_count = 0
+        bad_rows = 0
+        complete = True
+        time_budget = self.time_budget if time_budget is None else time_budget
+        deadline = time.monotonic() + time_budget if time_budget else None
+
+        with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as f:
+            if json_lines:
+                rows = self._iter_json_rows(f, columns, stats)
+            else:
+                reader = csv.reader(f, delimiter=delimiter)
+                header = next(_iter_csv_records(reader), None) or []
+                columns.extend(name or f'column_{i + 1}' for i, name in enumerate(header[:self.max_columns]))
+                stats.extend(ColumnStats(name) for name in columns)
+                rows = self._iter_csv_rows(reader, stats)
+
+            for row in rows:
+                if row is None:
+                    bad_rows += 1
+                    continue
+                row_count += 1
+                if len(first_rows) < self.page_rows:
+                    first_rows.append(row)
+                last_rows.append(row)
+                if len(sample) < self.sample_size:
+                    sample.append(row)
+                else:
+                    j = rng.randrange(row_count)
+                    if j < self.sample_size:
+                        sample[j] = row
+                # 每 4096 行检查一次时间预算
+                if deadline is not None and row_count % 4096 == 0 and time.monotonic() > deadline:
+                    complete = False
+                    break
+
+        if not complete:
+            last_rows = self._read_tail_rows(file_path, encoding, json_lines, delimiter, columns)
+
+        return {
+            'format': 'jsonl' if json_lines else ext.lstrip('.'),
+            'columns': columns,
+            'column_stats': [s.to_dict() for s in stats],
+            'row_count': row_count,
+            'bad_rows': bad_rows,
+            'complete': complete,
+            'first_rows': first_rows,
+            'last_rows': list(last_rows),
+            'sample_rows': sample
+        }
+
+    def _iter_csv_rows(self, reader, stats):
+        """逐行解析 CSV，同时更新列统计"""
+        width = len(stats)
+        for record in _iter_csv_records(reader):
+            if record is None:
+                yield None
+                continue
+            if not record:
+                continue
+            row = record[:width]
+            for column, value in zip(stats, row):
+                column.add_text(value)
+            yield [_clip(value) for value in row]
+
+    def _iter_json_rows(self, f, columns, stats):
+        """逐行解析 JSONL，列为出现过的键的并集（按首次出现顺序）"""
+        index_of = {}
+        records = 0
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            if not isinstance(record, dict):
+                record = {'value': record}
+
+            for key in record:
+                if key not in index_of and len(columns) < self.max_columns:
+                    index_of[key] = len(columns)
+                    columns.append(key)
+                    column = ColumnStats(key)
+                    # 新列在之前的行中均视为缺失
+                    column.count = column.nulls = records
+                    stats.append(column)
+
+            records += 1
+            row = []
+            for key, column in zip(columns, stats):
+                value = record.get(key)
+                column.add_value(value)
+                if isinstance(value, (dict, list)):
+                    value = json.dumps(value, ensure_ascii=False)
+                row.append(_clip(value))
+            yield row
+
+    def _read_tail_rows(self, file_path, encoding, json_lines, delimiter, columns, tail_bytes=256 * 1024):
+        """遍历提前停止时，从文件尾部读取末页（从完整行开始解析）"""
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(max(0, size - tail_bytes))
+            data = f.read()
+        if size > tail_bytes:
+            data = data[data.find(b'\n') + 1:]
+        text = data.decode(encoding, errors='replace')
+
+        rows = deque(maxlen=self.page_rows)
+        if json_lines:
+            for line in text.splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(record, dict):
+                    record = {'value': record}
+                rows.append([_clip(record.get(key)) for key in columns])
+        else:
+            for record in _iter_csv_records(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter)):
+                if record:
+                    rows.append([_clip(value) for value in record[:len(columns)]])
+        return rows
+
+
+def _iter_csv_records(reader):
+    """逐行读取 CSV 记录，损坏的行（如字段超过长度上限）产出 None 后继续解析后续行"""
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            yield None
+            continue
+        yield record
+
+
+def _summary_path(cache_dir, abs_path):
+    """汇总结果缓存文件路径"""
+    digest = hashlib.sha1(abs_path.encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(cache_dir, 'table_preview', digest + '.json')
+
+
+def load_summary(cache_dir, abs_path, signature):
+    """读取与文件签名一致的汇总结果缓存"""
+    try:
+        with open(_summary_path(cache_dir, abs_path), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('version') == _SUMMARY_VERSION and cached.get('path') == abs_path \
+                and tuple(cached.get('signature', ())) == tuple(signature):
+            return cached['summary']
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def save_summary(cache_dir, abs_path, signature, summary):
+    """写入汇总结果缓存（临时文件 + 原子替换）"""
+    path = _summary_path(cache_dir, abs_path)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': _SUMMARY_VERSION, 'path': abs_path,
+                       'signature': list(signature), 'summary': summary}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        logging.warning(f"保存表格预览缓存失败 {abs_path}: {str(e)}")
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+文本编码检测模块
+
+只检查一段有界的字节样本：先看 BOM，再做增量 UTF-8 校验，最后用 GBK 启发式判断，
+都不满足时回退到 latin1（任何字节序列都能解码）。
+"""
+
+import codecs
+
+
+# 检测使用的样本大小
+SAMPLE_SIZE = 64 * 1024
+
+# 先检查 UTF-32 BOM，因为 UTF-32 LE 的 BOM 以 UTF-16 LE 的 BOM 开头
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# GBK 解码结果中中文字符（含全角标点）至少占非 ASCII 字符的比例
+_GBK_MIN_CJK_RATIO = 0.6
+
+
+def _is_cjk(char):
+    """是否为常见中日韩字符或全角标点"""
+    code = ord(char)
+    return (
+        0x4E00 <= code <= 0x9FFF or   # 中日韩统一表意文字
+        0x3400 <= code <= 0x4DBF or   # 扩展 A
+        0x3000 <= code <= 0x303F or   # 中日韩标点
+        0xFF00 <= code <= 0xFFEF or   # 全角字符
+        0x2000 <= code <= 0x206F      # 常用标点（省略号、引号等）
+    )
+
+
+def _decodes(sample, encoding, complete):
+    """样本能否按指定编码解码；样本不完整时允许末尾截断的多字节字符"""
+    try:
+        return codecs.getincrementaldecoder(encoding)().decode(sample, final=complete)
+    except UnicodeDecodeError:
+        return None
+
+
+def detect_encoding(sample, complete=False):
+    """检测字节样本的编码
+
+    complete 表示样本即完整文件内容；否则末尾不完整的多字节字符不视为错误。
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    if _decodes(sample, 'utf-8', complete) is not None:
+        return 'utf-8'
+
+    text = _decodes(sample, 'gbk', complete)
+    if text is not None:
+        non_ascii = [char for char in text if ord(char) > 0x7F]
+        if non_ascii and sum(1 for char in non_ascii if _is_cjk(char)) / len(non_ascii) >= _GBK_MIN_CJK_RATIO:
+            return 'gbk'
+
+    return 'latin1'
+
+
+def is_byte_line_encoding(encoding):
+    """编码中换行符是否总是单字节 0x0A（可按字节查找行边界）"""
+    return not encoding.startswith(('utf-16', 'utf-32'))
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+大文本分页读取模块
+
+通过 mmap 随机访问大文本/日志文件。行索引为稀疏索引：只记录每个固定大小块
+起始位置之前的换行数（2GB 文件约 256KB），按需向后扩展并持久化到缓存目录。
+定位任意行只需二分查找加扫描一个块，每页只解码请求的窗口。
+文件仅被追加（训练日志）时沿用已有索引，只补充新增部分。
+读取末尾只按字节偏移向前查找，不等待索引；索引未覆盖到文件末尾时总行数和起始行号为 None，
+并在后台分段扩展索引。每个文件的索引有各自的锁，读取一个大文件不会阻塞其他文件。
+"""
+
+import os
+import mmap
+import zlib
+import json
+import hashlib
+import logging
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+
+
+_INDEX_VERSION = 1
+# 用于判断文件是否只被追加：已索引区末尾这段字节的 CRC
+_TAIL_CHECK_BYTES = 4096
+# 后台构建索引时每次持锁扩展的块数（64KB 块时为 64MB）
+_BUILD_STEP_BLOCKS = 1024
+
+
+class LineIndex:
+    """单个文件的稀疏行索引
+
+    counts[i] 为偏移 i * block_size 之前的换行数，只包含完整的块。
+    读写索引时须持有 lock。
+    """
+
+    def __init__(self, signature, block_size, counts=None, tail_crc=0):
+        self.signature = signature
+        self.block_size = block_size
+        self.counts = counts if counts is not None else array('Q', [0])
+        self.tail_crc = tail_crc
+        self.dirty = False
+        self.lock = Lock()
+        # 是否已提交后台构建任务
+        self.building = False
+
+    @property
+    def indexed_end(self):
+        """已索引区域的结束偏移"""
+        return (len(self.counts) - 1) * self.block_size
+
+    def reset(self, signature):
+        """文件被改写时清空索引"""
+        self.signature = signature
+        self.counts = array('Q', [0])
+        self.tail_crc = 0
+        self.dirty = True
+
+
+class TextPager:
+    """大文本分页读取类"""
+
+    def __init__(self, cache_dir=None, block_size=64 * 1024, max_indexes=128,
+                 max_page_lines=2000, max_page_bytes=1024 * 1024):
+        self.cache_dir = cache_dir
+        self.block_size = block_size
+        self.max_indexes = max_indexes
+        self.max_page_lines = max_page_lines
+        self.max_page_bytes = max_page_bytes
+        # abs_path -> LineIndex，按访问顺序排列；_lock 只保护这个字典，索引内容由各自的锁保护
+        self._indexes = OrderedDict()
+        self._lock = Lock()
+        # 后台扩展索引（单线程，依次处理）
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='line-index')
+
+    # ---------- 索引管理 ----------
+
+    def _sidecar_path(self, abs_path):
+        """索引缓存文件路径"""
+        digest = hashlib.sha1(abs_path.encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.cache_dir, 'line_index', digest + '.idx')
+
+    def _load_index(self, abs_path):
+        """从缓存目录读取索引"""
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._sidecar_path(abs_path), 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != _INDEX_VERSION or header.get('path') != abs_path \
+                        or header.get('block_size') != self.block_size:
+                    return None
+                counts = array('Q')
+                counts.frombytes(f.read())
+            if not counts:
+                return None
+            return LineIndex(tuple(header['signature']), self.block_size, counts, header['tail_crc'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_index(self, abs_path, index):
+        """写入索引缓存（临时文件 + 原子替换）"""
+        if not self.cache_dir or not index.dirty:
+            return
+        sidecar = self._sidecar_path(abs_path)
+        try:
+            os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+            header = {
+                'version': _INDEX_VERSION,
+                'path': abs_path,
+                'block_size': self.block_size,
+                'signature': list(index.signature),
+                'tail_crc': index.tail_crc
+            }
+            tmp_path = f"{sidecar}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                f.write(index.counts.tobytes())
+            os.replace(tmp_path, sidecar)
+            index.dirty = False
+        except OSError as e:
+            logging.warning(f"保存行索引失败 {abs_path}: {str(e)}")
+
+    def _lookup_index(self, abs_path):
+        """获取文件的索引对象（不存在时从缓存目录载入或新建），不校验内容"""
+        with self._lock:
+            index = self._indexes.get(abs_path)
+            if index is not None:
+                self._indexes.move_to_end(abs_path)
+                return index
+        loaded = self._load_index(abs_path) or LineIndex(None, self.block_size)
+        with self._lock:
+            index = self._indexes.setdefault(abs_path, loaded)
+            self._indexes.move_to_end(abs_path)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _sync_index(self, index, stat_info, mm):
+        """使索引与当前文件内容一致（调用方持有 index.lock）"""
+        signature = (stat_info.st_ino, stat_info.st_size, stat_info.st_mtime_ns)
+        if index.signature is None:
+            index.reset(signature)
+        elif index.signature != signature:
+            end = index.indexed_end
+            appended = (
+                index.signature[0] == signature[0] and
+                stat_info.st_size >= end and
+                self._tail_crc(mm, end) == index.tail_crc
+            )
+            if appended:
+                index.signature = signature
+                index.dirty = True
+            else:
+                index.reset(signature)
+
+    @staticmethod
+    def _tail_crc(mm, end):
+        """已索引区末尾字节的 CRC"""
+        return zlib.crc32(mm[max(0, end - _TAIL_CHECK_BYTES):end]) if end else 0
+
+    def _extend(self, index, mm, size, target_newlines=None, max_blocks=None):
+        """向后扩展索引，直到覆盖 target_newlines 个换行、扩展了 max_blocks 块或到达最后一个完整块"""
+        block_size = self.block_size
+        counts = index.counts
+        start = index.indexed_end
+        stop = size if max_blocks is None else min(size, start + max_blocks * block_size)
+        extended = False
+        while start + block_size <= stop:
+            if target_newlines is not None and counts[-1] >= target_newlines:
+                break
+            counts.append(counts[-1] + mm[start:start + block_size].count(b'\n'))
+            start += block_size
+            extended = True
+        if extended:
+            index.tail_crc = self._tail_crc(mm, start)
+            index.dirty = True
+
+    # ---------- 行定位 ----------
+
+    def _line_offset(self, index, mm, size, line):
+        """第 line 行（从 0 开始）的起始偏移，超出文件末尾返回 None"""
+        if line == 0:
+            return 0
+        self._extend(index, mm, size, line)
+        counts = index.counts
+        if counts[-1] >= line:
+            block = bisect_left(counts, line) - 1
+        else:
+            block = len(counts) - 1
+        pos = block * self.block_size
+        need = line - counts[block]
+        while need > 0:
+            newline = mm.find(b'\n', pos, size)
+            if newline == -1:
+                return None
+            pos = newline + 1
+            need -= 1
+        return pos if pos < size else None
+
+    def _total_lines(self, index, mm, size):
+        """文件总行数（会把索引扩展到文件末尾）"""
+        self._extend(index, mm, size)
+        newlines = index.counts[-1] + mm[index.indexed_end:size].count(b'\n')
+        return newlines + (1 if size and mm[size - 1] != 0x0A else 0)
+
+    def _line_number_at(self, index, mm, offset):
+        """偏移 offset 之前的换行数（要求索引已覆盖该位置所在块）"""
+        block = min(offset // self.block_size, len(index.counts) - 1)
+        return index.counts[block] + mm[block * self.block_size:offset].count(b'\n')
+
+    # ---------- 读取 ----------
+
+    def _collect_lines(self, mm, size, start_offset, line_count, encoding):
+        """从 start_offset 起读取至多 line_count 行，只解码该窗口"""
+        limit = min(size, start_offset + self.max_page_bytes)
+        end = start_offset
+        count = 0
+        cut = False
+        while count < line_count and end < size:
+            newline = mm.find(b'\n', end, limit)
+            if newline != -1:
+                end = newline + 1
+            elif limit == size:
+                # 最后一行没有换行符
+                end = size
+            else:
+                if count == 0:
+                    # 单行超过单页字节上限：截断显示
+                    end = limit
+                    cut = True
+                break
+            count += 1
+
+        if end == start_offset:
+            return [], end, cut
+        text = mm[start_offset:end].decode(encoding, errors='replace')
+        lines = text.split('\n')
+        if text.endswith('\n'):
+            lines.pop()
+        return [line.rstrip('\r') for line in lines], end, cut
+
+    def read_page(self, abs_path, start_line=0, line_count=200, encoding='utf-8'):
+        """读取从 start_line（从 0 开始）起的一页"""
+        line_count = max(1, min(line_count, self.max_page_lines))
+        start_line = max(0, start_line)
+        with open(abs_path, 'rb') as f:
+            stat_info = os.fstat(f.fileno())
+            size = stat_info.st_size
+            if size == 0:
+                return self._page_result([], 0, 0, size, 0, True, False, encoding)
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                index = self._lookup_index(abs_path)
+                with index.lock:
+                    self._sync_index(index, stat_info, mm)
+                    offset = self._line_offset(index, mm, size, start_line)
+                    complete = index.indexed_end + self.block_size > size
+                    total_lines = self._total_lines(index, mm, size) if complete else None
+                    self._save_index(abs_path, index)
+
+                if offset is None:
+                    return self._page_result([], start_line, size, size, total_lines, True, False, encoding)
+
+                lines, end, cut = self._collect_lines(mm, size, offset, line_count, encoding)
+                return self._page_result(lines, start_line, offset, size, total_lines,
+                                         end >= size, cut, encoding)
+
+    def read_tail(self, abs_path, line_count=200, encoding='utf-8'):
+        """读取文件最后 line_count 行
+
+        只按字节偏移定位，耗时与文件大小无关。索引距文件末尾不超过 max_page_bytes 时
+        顺带补齐并返回总行数和起始行号，否则两者为 None，并在后台扩展索引。
+        """
+        line_count = max(1, min(line_count, self.max_page_lines))
+        with open(abs_path, 'rb') as f:
+            stat_info = os.fstat(f.fileno())
+            size = stat_info.st_size
+            if size == 0:
+                return self._page_result([], 0, 0, size, 0, True, False, encoding)
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # 从末尾向前查找换行；末尾换行属于最后一行
+                lower = max(0, size - self.max_page_bytes)
+                pos = size - 1 if mm[size - 1] == 0x0A else size
+                offset = lower
+                for _ in range(line_count):
+                    newline = mm.rfind(b'\n', lower, pos)
+                    if newline == -1:
+                        offset = lower
+                        break
+                    offset = newline + 1
+                    pos = newline
+                cut = offset == lower and lower > 0 and mm[lower - 1] != 0x0A
+
+                # 索引正在被其他请求或后台任务扩展时不等待
+                total_lines = start_line = None
+                index = self._lookup_index(abs_path)
+                if index.lock.acquire(blocking=False):
+                    try:
+                        self._sync_index(index, stat_info, mm)
+                        if size - index.indexed_end <= self.max_page_bytes:
+                            # 追加的日志只需补充新增部分
+                            total_lines = self._total_lines(index, mm, size)
+                            start_line = self._line_number_at(index, mm, offset)
+                            self._save_index(abs_path, index)
+                    finally:
+                        index.lock.release()
+                if total_lines is None:
+                    self._schedule_build(abs_path, index)
+
+                lines, _, _ = self._collect_lines(mm, size, offset, line_count, encoding)
+                return self._page_result(lines, start_line, offset, size, total_lines, True, cut, encoding)
+
+    def _schedule_build(self, abs_path, index):
+        """提交后台任务把索引扩展到文件末尾（同一文件只提交一次）"""
+        with self._lock:
+            if index.building:
+                return
+            index.building = True
+        self._builder.submit(self._build_index, abs_path, index)
+
+    def _build_index(self, abs_path, index):
+        """分段扩展索引，每段之间释放锁，读取请求不会长时间等待"""
+        try:
+            with open(abs_path, 'rb') as f:
+                stat_info = os.fstat(f.fileno())
+                size = stat_info.st_size
+                if size == 0:
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    while True:
+                        with index.lock:
+                            # 其他请求已按更新后的文件同步过索引时交给它们继续
+                            if index.signature is not None and index.signature[1] > size:
+                                break
+                            self._sync_index(index, stat_info, mm)
+                            self._extend(index, mm, size, max_blocks=_BUILD_STEP_BLOCKS)
+                            done = index.indexed_end + self.block_size > size
+                            if done:
+                                self._save_index(abs_path, index)
+                                break
+        except (OSError, ValueError) as e:
+            logging.warning(f"构建行索引失败 {abs_path}: {str(e)}")
+        finally:
+            with self._lock:
+                index.building = False
+
+    def sample_lines(self, abs_path, n, encoding, rng):
+        """随机抽取 n 行
+
+        在随机字节偏移处取所在行，不需要行索引；长行被抽中的概率相应更高。
+        """
+        n = max(1, min(n, self.max_page_lines))
+        with open(abs_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return {'lines': [], 'size': size, 'encoding': encoding}
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                starts = set()
+                for offset in sorted(rng.randrange(size) for _ in range(n)):
+                    starts.add(mm.rfind(b'\n', 0, offset) + 1)
+
+                lines = []
+                for start in sorted(starts):
+                    end = mm.find(b'\n', start, min(size, start + self.max_page_bytes))
+                    if end == -1:
+                        end = min(size, start + self.max_page_bytes)
+                    text = mm[start:end].decode(encoding, errors='replace').rstrip('\r')
+                    lines.append({'offset': start, 'text': text})
+                return {'lines': lines, 'size': size, 'encoding': encoding}
+
+    @staticmethod
+    def _page_result(lines, start_line, offset, size, total_lines, eof, cut, encoding):
+        """组装分页结果（start_line 未知时为 None）"""
+        return {
+            'lines': lines,
+            'start_line': start_line,
+            'next_line': start_line + len(lines) if start_line is not None else None,
+            'offset': offset,
+            'size': size,
+            'total_lines': total_lines,
+            'eof': eof,
+            'truncated_line': cut,
+            'encoding': encoding
+        }
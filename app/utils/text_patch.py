@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+编辑器增量保存模块
+
+编辑器打开文件时拿到文件版本（修改时间 + 内容 SHA-256），保存时只提交相对该版本的
+按行补丁，服务端确认文件内容未被其他程序修改后应用补丁，写入同目录临时文件再原子替换
+（符号链接替换其指向的真实文件，硬链接文件原地写入）。
+
+补丁格式（按 start 升序、互不重叠，行号从 0 开始，按 '\\n' 分行）：
+    [{"start": 起始行, "delete": 删除的行数, "lines": [插入的行, ...]}, ...]
+"""
+
+import os
+import uuid
+import hashlib
+import logging
+
+
+class PatchError(Exception):
+    """补丁保存错误（附带 HTTP 状态码）"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def content_version(data, stat_info):
+    """文件版本：修改时间（纳秒）、大小和内容哈希"""
+    return {'mtime_ns': stat_info.st_mtime_ns, 'size': len(data), 'hash': hashlib.sha256(data).hexdigest()}
+
+
+def check_base(data, stat_info, base):
+    """校验客户端的基准版本：内容哈希不一致时抛出 409
+
+    修改时间和大小都一致时视为未修改，不再计算哈希；修改时间变化但内容相同（例如 touch）时不算冲突。
+    """
+    if not isinstance(base, dict) or not base.get('hash'):
+        raise PatchError('Base version is required')
+    if base.get('mtime_ns') == stat_info.st_mtime_ns and base.get('size') == len(data):
+        return
+    if hashlib.sha256(data).hexdigest() != base['hash']:
+        raise PatchError('File has been modified since it was opened', 409)
+
+
+def apply_line_patch(text, patch):
+    """把按行补丁应用到 text，返回新文本"""
+    if not isinstance(patch, list):
+        raise PatchError('Patch must be a list of hunks')
+    base_lines = text.split('\n')
+    result = []
+    position = 0
+    for hunk in patch:
+        try:
+            start = int(hunk['start'])
+            delete = int(hunk['delete'])
+            lines = hunk['lines']
+        except (KeyError, TypeError, ValueError):
+            raise PatchError('Invalid hunk: start, delete and lines are required')
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            raise PatchError('Hunk lines must be a list of strings')
+        if start < position or delete < 0 or start + delete > len(base_lines):
+            raise PatchError(f'Hunk out of range or overlapping: start={start}, delete={delete}')
+        result.extend(base_lines[position:start])
+        result.extend(lines)
+        position = start + delete
+    result.extend(base_lines[position:])
+    return '\n'.join(result)
+
+
+def write_atomic(abs_path, data):
+    """写入同目录临时文件并原子替换，返回新文件的 stat
+
+    abs_path 应为已解析符号链接的真实路径。替换会保留原文件的权限，并尽量保留属主
+    （非 root 运行时无法恢复其他用户的属主，新文件归当前用户所有）；
+    文件有多个硬链接时改为原地覆盖写入（非原子），以免拆开硬链接。
+    """
+    try:
+        stat_info = os.stat(abs_path)
+    except FileNotFoundError:
+        stat_info = None
+    if stat_info is not None and stat_info.st_nlink > 1:
+        logging.warning(f"文件有 {stat_info.st_nlink} 个硬链接，改为原地写入（非原子）: {abs_path}")
+        return _write_in_place(abs_path, data)
+
+    directory, name = os.path.split(abs_path)
+    tmp_path = os.path.join(directory, f'.{name}.{uuid.uuid4().hex}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if stat_info is not None:
+            os.chmod(tmp_path, stat_info.st_mode & 0o7777)
+            try:
+                os.chown(tmp_path, stat_info.st_uid, stat_info.st_gid)
+            except OSError:
+                pass
+        os.replace(tmp_path, abs_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return os.stat(abs_path)
+
+
+def _write_in_place(abs_path, data):
+    """原地覆盖写入（保留 inode 和硬链接），返回新文件的 stat"""
+    with open(abs_path, 'r+b') as f:
+        f.write(data)
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+    return os.stat(abs_path)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+图片缩略图模块
+
+按固定尺寸生成缩略图（支持时为 WebP，否则为 JPEG）并缓存到磁盘，
+缓存键由原图路径、尺寸、大小和修改时间组成，原图变化后自动生成新版本。
+同时生成的缩略图数量受信号量限制，避免浏览大数据集时占满 CPU 和内存。
+"""
+
+import os
+import hashlib
+import logging
+import threading
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+
+# 可以生成缩略图的图片格式
+THUMBNAIL_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif', '.ico'}
+
+# 固定的缩略图边长，请求的尺寸向上取整到其中之一
+THUMBNAIL_SIZES = (128, 256, 512, 1024)
+
+
+def thumbnails_available():
+    """是否可以生成缩略图（需安装 Pillow）"""
+    return Image is not None
+
+
+class Thumbnailer:
+    """缩略图生成与磁盘缓存类"""
+
+    def __init__(self, cache_dir, sizes=THUMBNAIL_SIZES, quality=80, max_concurrent=2,
+                 max_cache_bytes=512 * 1024 * 1024, prune_interval=200):
+        self.cache_dir = os.path.join(cache_dir, 'thumbnails')
+        self.sizes = tuple(sorted(sizes))
+        self.quality = quality
+        self.max_cache_bytes = max_cache_bytes
+        # 每生成 prune_interval 个缩略图检查一次磁盘占用
+        self.prune_interval = prune_interval
+        self._generated = 0
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        # 正在生成的缓存键 -> Event，同一缩略图并发请求时只生成一次
+        self._in_progress = {}
+        self._lock = threading.Lock()
+
+        if Image is not None and features.check('webp'):
+            self.format, self.mimetype, self.extension = 'WEBP', 'image/webp', '.webp'
+        else:
+            self.format, self.mimetype, self.extension = 'JPEG', 'image/jpeg', '.jpg'
+
+    @staticmethod
+    def is_supported(filename):
+        """文件是否可以生成缩略图"""
+        return Image is not None and os.path.splitext(filename)[1].lower() in THUMBNAIL_EXTENSIONS
+
+    def pick_size(self, size):
+        """选择不小于请求尺寸的最小固定尺寸"""
+        for candidate in self.sizes:
+            if candidate >= size:
+                return candidate
+        return self.sizes[-1]
+
+    def _cache_path(self, abs_path, size, stat_info):
+        """缩略图缓存文件路径"""
+        key = f"{abs_path}\0{size}\0{stat_info.st_size}\0{stat_info.st_mtime_ns}"
+        digest = hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + self.extension)
+
+    def get_thumbnail(self, abs_path, size):
+        """获取缩略图文件路径（不存在时生成）"""
+        size = self.pick_size(size)
+        stat_info = os.stat(abs_path)
+        thumb_path = self._cache_path(abs_path, size, stat_info)
+        if os.path.exists(thumb_path):
+            return thumb_path
+
+        with self._lock:
+            event = self._in_progress.get(thumb_path)
+            owner = event is None
+            if owner:
+                event = self._in_progress[thumb_path] = threading.Event()
+
+        if not owner:
+            event.wait()
+            if os.path.exists(thumb_path):
+                return thumb_path
+            raise OSError(f"生成缩略图失败: {abs_path}")
+
+        try:
+            with self._semaphore:
+                self._generate(abs_path, size, thumb_path)
+        finally:
+            with self._lock:
+                self._in_progress.pop(thumb_path, None)
+                self._generated += 1
+                need_prune = self._generated % self.prune_interval == 0
+            event.set()
+
+        if need_prune:
+            self.prune()
+        return thumb_path
+
+    def _generate(self, abs_path, size, thumb_path):
+        """生成缩略图并原子写入缓存"""
+        with Image.open(abs_path) as image:
+            # JPEG 可在解码时直接缩小，大幅减少解码开销
+            image.draft('RGB', (size, size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            if self.format == 'WEBP':
+                if image.mode not in ('RGB', 'RGBA'):
+                    has_alpha = 'A' in image.mode or 'transparency' in image.info
+                    image = image.convert('RGBA' if has_alpha else 'RGB')
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                image.save(tmp_path, self.format, quality=self.quality)
+                os.replace(tmp_path, thumb_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def prune(self):
+        """磁盘占用超出预算时按修改时间删除最旧的缩略图"""
+        files = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat_info = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat_info.st_mtime, stat_info.st_size, path))
+                total += stat_info.st_size
+
+        if total <= self.max_cache_bytes:
+            return
+        files.sort()
+        # 删除到预算的 90%，避免频繁清理
+        target = self.max_cache_bytes * 0.9
+        for _, file_size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= file_size
+            except OSError:
+                pass
+        logging.info(f"缩略图缓存已清理，当前占用 {total / 1024 / 1024:.1f}MB")
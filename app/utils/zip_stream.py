@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+流式 ZIP 打包模块
+
+边遍历目录边生成 ZIP 字节流，直接写入 HTTP 响应，不落临时文件。
+每个条目使用数据描述符（先写数据、后写 CRC 和大小），超过 4GB 的条目
+和超出 ZIP 限制的归档自动使用 ZIP64 扩展。
+
+workers > 1 时采用 pigz 式并行 deflate：文件切成固定大小的块，在线程池中
+独立压缩（zlib 压缩时释放 GIL），每块以 sync flush 结尾并以前一块末尾 32KB
+作为预设字典，按原顺序拼接后即为合法的单个 deflate 流。
+安装了 zstandard 时另提供多线程 tar+zstd 流。
+"""
+
+import os
+import time
+import zlib
+import struct
+import tarfile
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# 已压缩格式直接存储（STORED），避免浪费 CPU 二次压缩
+STORED_EXTENSIONS = {
+    # 模型/张量
+    '.pt', '.pth', '.ckpt', '.safetensors', '.npz', '.h5', '.onnx',
+    # 压缩包
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.lz4',
+    # 图片
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    # 音视频
+    '.mp4', '.mkv', '.webm', '.mov', '.avi', '.mp3', '.aac', '.ogg', '.opus', '.m4a', '.flac'
+}
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_VERSION_DEFAULT = 20
+_VERSION_ZIP64 = 45
+_CREATE_SYSTEM_UNIX = 3
+
+# deflate 回溯窗口大小，用作并行压缩块的预设字典
+_DEFLATE_WINDOW = 32 * 1024
+
+
+def should_store(filename):
+    """判断文件是否应以 STORED 方式存储"""
+    return os.path.splitext(filename)[1].lower() in STORED_EXTENSIONS
+
+
+def _dos_datetime(timestamp):
+    """转换为 DOS 日期时间格式"""
+    t = time.localtime(timestamp)
+    year = min(max(t.tm_year, 1980), 2107)
+    dos_date = ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    return dos_time, dos_date
+
+
+def iter_file_chunks(file_path, size, chunk_size):
+    """按块读取文件，最多读取 size 字节（以开始打包时的大小为准，避免文件增长导致大小字段溢出）"""
+    remaining = size
+    with open(file_path, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def deflate_chunks(chunks, compresslevel):
+    """单线程 raw deflate 压缩，生成 (原始块, 压缩数据)"""
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+    for chunk in chunks:
+        yield chunk, compressor.compress(chunk)
+    yield b'', compressor.flush()
+
+
+def _deflate_block(block, zdict, compresslevel, last):
+    """独立压缩一个块（在线程池中执行）"""
+    if zdict:
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -15)
+    return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def tar_zst_available():
+    """是否可以生成 tar+zstd 流"""
+    return zstandard is not None
+
+
+class ZipStreamWriter:
+    """流式 ZIP 写入器
+
+    write_entry 生成单个条目的字节，finish 生成中央目录和结束记录。
+    写入器只记录偏移量和中央目录所需的元数据，不保存文件内容。
+    """
+
+    def __init__(self):
+        self._offset = 0
+        self._entries = []
+
+    def _track(self, data):
+        """记录输出偏移量"""
+        self._offset += len(data)
+        return data
+
+    def write_entry(self, arcname, data_pairs, method, mtime, mode, expected_size):
+        """写入一个条目
+
+        data_pairs 为 (原始块, 写入归档的数据块) 的迭代器，用于在输出的同时计算 CRC 和大小；
+        expected_size 用于预先决定是否启用 ZIP64。
+        """
+        name = arcname.replace(os.sep, '/').encode('utf-8')
+        zip64 = expected_size * 1.05 + 1024 > ZIP64_LIMIT
+        dos_time, dos_date = _dos_datetime(mtime)
+        flags = _FLAG_DATA_DESCRIPTOR | _FLAG_UTF8
+        version = _VERSION_ZIP64 if zip64 else _VERSION_DEFAULT
+        header_offset = self._offset
+
+        if zip64:
+            extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0)
+            size_field = ZIP64_LIMIT
+        else:
+            extra = b''
+            size_field = 0
+
+        yield self._track(struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, version, flags, method, dos_time, dos_date,
+            0, size_field, size_field, len(name), len(extra)
+        ) + name + extra)
+
+        crc = 0
+        file_size = 0
+        compress_size = 0
+        for raw, data in data_pairs:
+            if raw:
+                crc = zlib.crc32(raw, crc)
+                file_size += len(raw)
+            if data:
+                compress_size += len(data)
+                yield self._track(data)
+
+        if zip64:
+            descriptor = struct.pack('<IIQQ', 0x08074b50, crc, compress_size, file_size)
+        else:
+            descriptor = struct.pack('<IIII', 0x08074b50, crc, compress_size, file_size)
+        yield self._track(descriptor)
+
+        self._entries.append({
+            'name': name,
+            'version': version,
+            'flags': flags,
+            'method': method,
+            'dos_time': dos_time,
+            'dos_date': dos_date,
+            'crc': crc,
+            'compress_size': compress_size,
+            'file_size': file_size,
+            'header_offset': header_offset,
+            'external_attr': (mode & 0xFFFF) << 16
+        })
+
+    def finish(self):
+        """生成中央目录和结束记录"""
+        cd_start = self._offset
+        for entry in self._entries:
+            extra_fields = []
+            file_size = entry['file_size']
+            compress_size = entry['compress_size']
+            header_offset = entry['header_offset']
+            if file_size >= ZIP64_LIMIT:
+                extra_fields.append(file_size)
+                file_size = ZIP64_LIMIT
+            if compress_size >= ZIP64_LIMIT:
+                extra_fields.append(compress_size)
+                compress_size = ZIP64_LIMIT
+            if header_offset >= ZIP64_LIMIT:
+                extra_fields.append(header_offset)
+                header_offset = ZIP64_LIMIT
+
+            extra = b''
+            version = entry['version']
+            if extra_fields:
+                extra = struct.pack('<HH', 0x0001, 8 * len(extra_fields)) + \
+                    struct.pack('<' + 'Q' * len(extra_fields), *extra_fields)
+                version = _VERSION_ZIP64
+
+            yield self._track(struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, (_CREATE_SYSTEM_UNIX << 8) | version, version,
+                entry['flags'], entry['method'], entry['dos_time'], entry['dos_date'],
+                entry['crc'], compress_size, file_size, len(entry['name']), len(extra), 0, 0, 0,
+                entry['external_attr'], header_offset
+            ) + entry['name'] + extra)
+
+        cd_end = self._offset
+        cd_size = cd_end - cd_start
+        count = len(self._entries)
+
+        if count >= ZIP_MAX_ENTRIES or cd_size >= ZIP64_LIMIT or cd_start >= ZIP64_LIMIT:
+            # ZIP64 结束记录和定位器
+            yield self._track(struct.pack(
+                '<IQHHIIQQQQ', 0x06064b50, 44, (_CREATE_SYSTEM_UNIX << 8) | _VERSION_ZIP64,
+                _VERSION_ZIP64, 0, 0, count, count, cd_size, cd_start
+            ))
+            yield self._track(struct.pack('<IIQI', 0x07064b50, 0, cd_end, 1))
+
+        yield self._track(struct.pack(
+            '<IHHHHIIH', 0x06054b50, 0, 0,
+            min(count, ZIP_MAX_ENTRIES), min(count, ZIP_MAX_ENTRIES),
+            min(cd_size, ZIP64_LIMIT), min(cd_start, ZIP64_LIMIT), 0
+        ))
+
+
+def _iter_files(root_path):
+    """按名称顺序遍历目录，生成 (文件路径, 归档名, stat 结果)"""
+    for dirpath, dirnames, filenames in os.walk(root_path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            file_path = os.path.join(dirpath, filename)
+            try:
+                stat_info = os.stat(file_path)
+            except OSError as e:
+                logging.warning(f"打包时跳过无法读取的文件 {file_path}: {str(e)}")
+                continue
+            if os.path.isfile(file_path):
+                yield file_path, os.path.relpath(file_path, root_path), stat_info
+
+
+def iter_zip_stream(root_path, compress=True, compresslevel=6, chunk_size=1024 * 1024, workers=1):
+    """遍历目录并生成 ZIP 字节流（workers > 1 时并行压缩）"""
+    if compress and workers > 1:
+        yield from _iter_zip_stream_parallel(root_path, compresslevel, chunk_size, workers)
+        return
+
+    writer = ZipStreamWriter()
+    for file_path, arcname, stat_info in _iter_files(root_path):
+        try:
+            chunks = iter_file_chunks(file_path, stat_info.st_size, chunk_size)
+            if compress and not should_store(arcname):
+                method = ZIP_DEFLATED
+                data_pairs = deflate_chunks(chunks, compresslevel)
+            else:
+                method = ZIP_STORED
+                data_pairs = ((chunk, chunk) for chunk in chunks)
+            # 预读第一块：文件无法打开时在写入本地文件头之前跳过
+            first = next(data_pairs, None)
+        except OSError as e:
+            logging.warning(f"打包时跳过无法读取的文件 {file_path}: {str(e)}")
+            continue
+        
+        if first is not None:
+            data_pairs = _prepend(first, data_pairs)
+        yield from writer.write_entry(
+            arcname, data_pairs, method, stat_info.st_mtime, stat_info.st_mode, stat_info.st_size
+        )
+    yield from writer.finish()
+
+
+def _iter_file_blocks(root_path, chunk_size):
+    """生成 (文件信息, 原始块, 是否最后一块)，空文件生成一个空块
+
+    每个文件向前多读一块以确定最后一块；文件无法打开时在生成任何块之前跳过。
+    """
+    for file_path, arcname, stat_info in _iter_files(root_path):
+        entry = (arcname, stat_info, should_store(arcname))
+        chunks = iter_file_chunks(file_path, stat_info.st_size, chunk_size)
+        try:
+            previous = next(chunks, b'')
+        except OSError as e:
+            logging.warning(f"打包时跳过无法读取的文件 {file_path}: {str(e)}")
+            continue
+        for chunk in chunks:
+            yield entry, previous, False
+            previous = chunk
+        yield entry, previous, True
+
+
+def _iter_zip_stream_parallel(root_path, compresslevel, chunk_size, workers):
+    """并行压缩的 ZIP 字节流
+
+    块按顺序提交到线程池，最多 workers * 4 个块在途（内存上界约为 workers * 4 * chunk_size），
+    输出端按提交顺序取结果，因此条目和块的顺序与单线程完全一致。
+    """
+    writer = ZipStreamWriter()
+    blocks = _iter_file_blocks(root_path, chunk_size)
+    pending = deque()
+    max_pending = workers * 4
+    state = {'entry': None, 'zdict': b''}
+
+    def fill():
+        """补充在途块"""
+        while len(pending) < max_pending:
+            item = next(blocks, None)
+            if item is None:
+                return
+            entry, block, last = item
+            if entry is not state['entry']:
+                state['entry'], state['zdict'] = entry, b''
+            if entry[2]:
+                future = None
+            else:
+                future = pool.submit(_deflate_block, block, state['zdict'], compresslevel, last)
+                state['zdict'] = (state['zdict'] + block)[-_DEFLATE_WINDOW:]
+            pending.append((entry, block, last, future))
+
+    def entry_pairs():
+        """取出当前条目的所有块"""
+        while True:
+            fill()
+            entry, block, last, future = pending.popleft()
+            yield block, (block if future is None else future.result())
+            if last:
+                return
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zip-deflate')
+    try:
+        fill()
+        while pending:
+            arcname, stat_info, stored = pending[0][0]
+            yield from writer.write_entry(
+                arcname, entry_pairs(), ZIP_STORED if stored else ZIP_DEFLATED,
+                stat_info.st_mtime, stat_info.st_mode, stat_info.st_size
+            )
+        yield from writer.finish()
+    finally:
+        # 客户端断开时取消尚未开始的块，只等待正在压缩的块
+        for _, _, _, future in pending:
+            if future is not None:
+                future.cancel()
+        pool.shutdown(wait=True)
+
+
+def iter_tar_zst_stream(root_path, level=3, workers=1, chunk_size=1024 * 1024):
+    """遍历目录并生成 tar+zstd 字节流（zstd 多线程压缩，需安装 zstandard）"""
+    if zstandard is None:
+        raise RuntimeError('zstandard 未安装，无法生成 tar.zst')
+
+    compressor = zstandard.ZstdCompressor(level=level, threads=workers if workers > 1 else 0).compressobj()
+    for file_path, arcname, stat_info in _iter_files(root_path):
+        chunks = iter_file_chunks(file_path, stat_info.st_size, chunk_size)
+        try:
+            first = next(chunks, b'')
+        except OSError as e:
+            logging.warning(f"打包时跳过无法读取的文件 {file_path}: {str(e)}")
+            continue
+
+        info = tarfile.TarInfo(arcname.replace(os.sep, '/'))
+        info.size = stat_info.st_size
+        info.mtime = int(stat_info.st_mtime)
+        info.mode = stat_info.st_mode & 0o7777
+        yield compressor.compress(info.tobuf(format=tarfile.PAX_FORMAT))
+
+        # 文件在打包过程中变短时补零，保证与头部声明的大小一致
+        written = 0
+        for chunk in _prepend(first, chunks):
+            written += len(chunk)
+            output = compressor.compress(chunk)
+            if output:
+                yield output
+        padding = info.size - written + (-info.size % tarfile.BLOCKSIZE)
+        while padding > 0:
+            size = min(padding, chunk_size)
+            padding -= size
+            output = compressor.compress(b'\0' * size)
+            if output:
+                yield output
+
+    # 结束标记：两个空块
+    yield compressor.compress(b'\0' * (tarfile.BLOCKSIZE * 2))
+    yield compressor.flush()
+
+
+def _prepend(first, iterator):
+    """把已取出的第一个元素放回迭代器"""
+    yield first
+    yield from iterator
@@ -7,17 +7,21 @@ import os
 import sys
 import signal
 import logging
+import time
+import socket
 import argparse
 from threading import Thread
 
 from flask_socketio import SocketIO
 from app import create_app
 from app.config import config
-from app.routes import main_bp, api_bp, file_bp, proxy_bp, auth_bp
+from app.routes import main_bp, api_bp, file_bp, proxy_bp, auth_bp, metrics_bp, agent_bp
 from app.routes.api_routes import init_api_services
 from app.routes.proxy_routes import init_proxy_services
+from app.routes.metrics_routes import init_metrics_services
+from app.routes.agent_routes import init_agent_services
 from app.socketio_events import init_socketio_events
-from app.utils import SystemMonitor, CommandExecutor, TensorBoardManager
+from app.utils import SystemMonitor, CommandExecutor, TensorBoardManager, AgentClient
 
 
 def setup_logging():
@@ -39,6 +43,11 @@ def parse_arguments():
     parser.add_argument("--user_mt", type=str, help="用户权限系统开关", default="true")
     parser.add_argument("--config", type=str, help="配置环境", 
                        choices=['development', 'production'], default='development')
+    parser.add_argument("--mode", type=str, help="运行模式：server 为完整服务，agent 为无界面推送节点",
+                       choices=['server', 'agent'], default='server')
+    parser.add_argument("--central", type=str, help="agent 模式下中心实例地址，如 http://10.0.0.1:5000")
+    parser.add_argument("--agent_name", type=str, help="agent 模式下的节点名称", default=socket.gethostname())
+    parser.add_argument("--command", type=str, help="agent 模式下启动时执行的训练命令")
     return parser.parse_args()
 
 
@@ -56,6 +65,8 @@ def create_application(config_name='development'):
     app.register_blueprint(file_bp)
     app.register_blueprint(proxy_bp)
     app.register_blueprint(auth_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(agent_bp)
     
     return app, socketio
 
@@ -70,13 +81,19 @@ def initialize_services(socketio):
     init_api_services(socketio)
     
     # 获取服务实例
-    from app.routes.api_routes import system_monitor, command_executor, tensorboard_manager
+    from app.routes.api_routes import system_monitor, command_executor, tensorboard_manager, file_watcher
     
     # 初始化代理服务
     init_proxy_services(tensorboard_manager)
     
+    # 初始化指标服务
+    init_metrics_services(system_monitor)
+    
+    # 初始化多节点汇总服务
+    init_agent_services(socketio)
+    
     # 初始化SocketIO事件
-    init_socketio_events(socketio, command_executor, system_monitor)
+    init_socketio_events(socketio, command_executor, system_monitor, file_watcher)
     
     return system_monitor, command_executor, tensorboard_manager
 
@@ -107,6 +124,49 @@ def setup_signal_handlers(socketio, system_monitor, tensorboard_manager):
     signal.signal(signal.SIGTERM, handle_exit)
 
 
+def run_agent(args):
+    """Agent 模式：只运行系统监控和命令执行，数据批量推送到中心实例"""
+    from app.config import Config
+    
+    if not args.central:
+        logging.error("agent 模式需要指定 --central")
+        sys.exit(1)
+    
+    agent_client = AgentClient(
+        args.central,
+        args.agent_name,
+        token=Config.AGENT_TOKEN,
+        push_interval=Config.AGENT_PUSH_INTERVAL
+    )
+    system_monitor = SystemMonitor(
+        agent_client,
+        active_interval=Config.MONITOR_ACTIVE_INTERVAL,
+        idle_interval=Config.MONITOR_IDLE_INTERVAL
+    )
+    command_executor = CommandExecutor(agent_client)
+    
+    # 中心实例始终是订阅者，按实时频率采样
+    system_monitor.subscribe('central')
+    system_monitor.start_monitoring()
+    agent_client.start()
+    
+    def handle_exit(signum, frame):
+        logging.info("正在关闭 Agent...")
+        command_executor.stop_command()
+        system_monitor.stop_monitoring()
+        agent_client.stop()
+        os._exit(0)
+    signal.signal(signal.SIGINT, handle_exit)
+    signal.signal(signal.SIGTERM, handle_exit)
+    
+    if args.command:
+        command_executor.execute_command(args.command)
+    
+    logging.info(f"Agent {args.agent_name} 已启动，推送到 {args.central}")
+    while True:
+        time.sleep(3600)
+
+
 def main():
     """主函数"""
     # 设置日志
@@ -115,6 +175,10 @@ def main():
     # 解析参数
     args = parse_arguments()
     
+    if args.mode == 'agent':
+        run_agent(args)
+        return
+    
     # 创建应用
     app, socketio = create_application(args.config)
     
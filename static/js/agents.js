@@ -0,0 +1,83 @@
+// 多节点监控页面的JavaScript代码
+var agents = {};
+
+function escapeHtml(text) {
+    var map = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+    return String(text).replace(/[&<>"']/g, m => map[m]);
+}
+
+function formatList(values) {
+    return Array.isArray(values) && values.length > 0 ? values.join(' / ') : '-';
+}
+
+function renderAgents() {
+    var tbody = document.getElementById('agents-body');
+    var hosts = Object.keys(agents).sort();
+    if (hosts.length === 0) {
+        tbody.innerHTML = '<tr><td colspan="9">暂无节点接入</td></tr>';
+        return;
+    }
+    tbody.innerHTML = hosts.map(host => {
+        var agent = agents[host];
+        var latest = agent.latest || {};
+        return `
+            <tr class="${agent.online ? '' : 'agent-offline'}">
+                <td>${escapeHtml(host)}</td>
+                <td class="agent-status">${agent.online ? '在线' : '离线'}</td>
+                <td>${latest.cpu !== undefined ? latest.cpu : '-'}</td>
+                <td>${latest.memory !== undefined ? latest.memory : '-'}</td>
+                <td>${formatList(latest.gpu)}</td>
+                <td>${formatList(latest.gpu_memory)}</td>
+                <td>${latest.save_memory !== undefined ? latest.save_memory : '-'}</td>
+                <td>${escapeHtml(agent.lastEvent || '')}</td>
+                <td>${latest.time || ''}</td>
+            </tr>
+        `;
+    }).join('');
+}
+
+function loadAgents() {
+    fetch('/api/agents')
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) return;
+            data.hosts.forEach(item => {
+                var agent = agents[item.host] || {};
+                agent.online = item.online;
+                agent.latest = item.latest;
+                agents[item.host] = agent;
+            });
+            renderAgents();
+        })
+        .catch(error => console.error('加载节点列表失败:', error));
+}
+
+function initSocket() {
+    var socket = io();
+    // 中心实例按批次合并推送所有节点的新数据
+    socket.on('agents_update', function(batch) {
+        Object.keys(batch.usage || {}).forEach(host => {
+            var samples = batch.usage[host];
+            var agent = agents[host] || {};
+            agent.online = true;
+            agent.latest = samples[samples.length - 1];
+            agents[host] = agent;
+        });
+        Object.keys(batch.events || {}).forEach(host => {
+            var events = batch.events[host].filter(item => item.event === 'command_output');
+            if (events.length === 0) return;
+            var agent = agents[host] || {};
+            agent.online = true;
+            agent.lastEvent = events[events.length - 1].data.data;
+            agents[host] = agent;
+        });
+        renderAgents();
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    loadAgents();
+    initSocket();
+    // 定期刷新在线状态
+    setInterval(loadAgents, 10000);
+});
@@ -7,15 +7,43 @@ class FileBrowserManager {
         this.previewCache = new Map();
         this.maxCacheSize = 20;
         
+        // 目录分页状态
+        this.pageSize = 500;
+        this.nextCursor = null;
+        this.loadingMore = false;
+        this.pageObserver = null;
+        
         // 上下文菜单状态
         this.contextTarget = null;
         this.contextTargetType = null;
         this.contextTargetPath = null;
         this.uploadTargetPath = '';
+        // 本页面发起的批量操作任务（进度推送是广播，只显示自己的任务）
+        this.bulkTasks = new Set();
+        // 不小于该大小的文件使用分块上传
+        this.chunkedUploadThreshold = 16 * 1024 * 1024;
+        this.chunkedUploadConcurrency = 4;
+        this.chunkedUploadRetries = 5;
+        
+        // 目录变更推送（Socket.IO），currentAbsPath 为服务端返回的当前目录绝对路径
+        this.socket = null;
+        this.currentAbsPath = null;
+        this.resyncTimer = null;
+        
+        // 文件搜索状态（新搜索开始时中止上一次的流式请求）
+        this.searchController = null;
+        
+        // 大文本分页查看状态
+        this.textPager = null;
+        this.textPageLines = 200;
         
         // 编辑器状态
         this.currentEditFile = null;
         this.isEditing = false;
+        // 增量保存的基准：服务端版本（修改时间 + 哈希）及其对应的行内容
+        this.editBase = null;
+        this.editBaseLines = null;
+        this.editEncoding = 'utf-8';
         
         // 初始化
         this.init();
@@ -24,6 +52,7 @@ class FileBrowserManager {
     init() {
         this.setupEventListeners();
         this.addToolbar();
+        this.setupWatcher();
         this.loadDirectory();
         this.setupKeyboardShortcuts();
     }
@@ -37,6 +66,8 @@ class FileBrowserManager {
         document.getElementById('menu-download').onclick = this.handleDownload.bind(this);
         document.getElementById('menu-upload').onclick = this.handleUpload.bind(this);
         document.getElementById('menu-delete').onclick = this.handleDelete.bind(this);
+        document.getElementById('menu-move').onclick = (e) => this.handleTransfer(e, 'move');
+        document.getElementById('menu-copy').onclick = (e) => this.handleTransfer(e, 'copy');
         
         // 上传相关事件
         this.setupUploadEvents();
@@ -85,6 +116,8 @@ class FileBrowserManager {
                 <button id="refresh-btn" title="刷新 (F5)">🔄</button>
                 <button id="new-file-btn" title="新建文件">📄+</button>
                 <button id="upload-btn" title="上传文件">📤</button>
+                <button id="sample-btn" title="随机抽样">🎲</button>
+                <button id="search-btn" title="搜索文件">🔍</button>
             </div>
             <div class="toolbar-section">
                 <label>排序:</label>
@@ -108,6 +141,8 @@ class FileBrowserManager {
         document.getElementById('refresh-btn').onclick = () => this.refreshDirectory();
         document.getElementById('new-file-btn').onclick = () => this.showNewFileDialog();
         document.getElementById('upload-btn').onclick = () => this.openUploadModal(this.currentPath);
+        document.getElementById('sample-btn').onclick = () => this.showSamples(this.currentPath);
+        document.getElementById('search-btn').onclick = () => this.showSearch(this.currentPath);
         document.getElementById('sort-select').onchange = (e) => this.changeSortType(e.target.value);
         document.getElementById('cache-stats-btn').onclick = () => this.showCacheStats();
         document.getElementById('clear-cache-btn').onclick = () => this.clearCache();
@@ -140,7 +175,7 @@ class FileBrowserManager {
         try {
             this.showLoading('正在加载目录...');
             
-            const response = await fetch(`/api/directory?path=${encodeURIComponent(path)}&sort=${this.sortType}`);
+            const response = await fetch(`/api/directory?path=${encodeURIComponent(path)}&sort=${this.sortType}&limit=${this.pageSize}`);
             const data = await response.json();
             
             if (data.error) {
@@ -148,9 +183,12 @@ class FileBrowserManager {
             }
             
             this.currentPath = path;
+            this.currentAbsPath = data.current_path;
             this.currentItems = data.items;
+            this.nextCursor = data.next_cursor;
             this.renderDirectory();
             this.updateBreadcrumb();
+            this.watchDirectory();
             this.hideLoading();
             
         } catch (error) {
@@ -159,6 +197,87 @@ class FileBrowserManager {
         }
     }
     
+    // 订阅目录变更推送：服务端只监听当前打开的目录，事件合并后增量推送
+    setupWatcher() {
+        if (typeof io === 'undefined') return;
+        this.socket = io();
+        // 重连后重新订阅当前目录
+        this.socket.on('connect', () => this.watchDirectory());
+        this.socket.on('fs_changes', (data) => this.applyFsChanges(data));
+        this.socket.on('bulk_progress', (data) => this.showBulkProgress(data));
+    }
+    
+    watchDirectory() {
+        if (this.socket && this.socket.connected && this.currentAbsPath) {
+            this.socket.emit('watch_directory', { path: this.currentPath });
+        }
+    }
+    
+    applyFsChanges(data) {
+        if (data.dir !== this.currentAbsPath) return;
+        
+        if (data.removed) {
+            this.showError('当前目录已被删除或移动');
+            const parts = this.currentPath.split('/').filter(p => p && p !== '.');
+            parts.pop();
+            this.loadDirectory(parts.length ? parts.join('/') : '.');
+            return;
+        }
+        if (data.resync) {
+            // 事件丢失时重新加载（合并短时间内的多次通知）
+            clearTimeout(this.resyncTimer);
+            this.resyncTimer = setTimeout(() => this.refreshDirectory(), 500);
+            return;
+        }
+        
+        for (const change of data.changes) {
+            const index = this.currentItems.findIndex(item => !item.is_parent && item.name === change.name);
+            if (index !== -1) {
+                this.previewCache.delete(this.currentItems[index].relative_path);
+                this.removeItemAt(index);
+            }
+            if (change.action !== 'deleted') {
+                this.insertItem(change.item);
+            }
+        }
+    }
+    
+    // 与服务端排序一致：目录在前，再按当前排序方式，名称作为稳定的次序依据
+    compareItems(a, b) {
+        if (a.is_dir !== b.is_dir) return a.is_dir ? -1 : 1;
+        if (this.sortType === 'size' && a.size !== b.size) return b.size - a.size;
+        if (this.sortType === 'modified' && a.modified !== b.modified) return b.modified - a.modified;
+        const nameA = a.name.toLowerCase();
+        const nameB = b.name.toLowerCase();
+        if (nameA !== nameB) return nameA < nameB ? -1 : 1;
+        return a.name < b.name ? -1 : (a.name > b.name ? 1 : 0);
+    }
+    
+    insertItem(item) {
+        let index = this.currentItems.findIndex(other => !other.is_parent && this.compareItems(item, other) < 0);
+        if (index === -1) {
+            // 排在已加载部分之后的条目由后续分页加载
+            if (this.nextCursor) return;
+            index = this.currentItems.length;
+        }
+        this.currentItems.splice(index, 0, item);
+        
+        const grid = document.getElementById('file-grid');
+        if (!grid) {
+            this.renderDirectory();
+            return;
+        }
+        grid.insertBefore(this.createFileItem(item), grid.children[index] || null);
+    }
+    
+    removeItemAt(index) {
+        this.currentItems.splice(index, 1);
+        const grid = document.getElementById('file-grid');
+        if (grid && grid.children[index]) {
+            grid.children[index].remove();
+        }
+    }
+    
     renderDirectory() {
         const container = document.getElementById('file-tree');
         container.innerHTML = '';
@@ -170,6 +289,7 @@ class FileBrowserManager {
         
         const grid = document.createElement('div');
         grid.className = 'file-grid';
+        grid.id = 'file-grid';
         
         for (const item of this.currentItems) {
             const itemEl = this.createFileItem(item);
@@ -177,6 +297,67 @@ class FileBrowserManager {
         }
         
         container.appendChild(grid);
+        this.setupPageSentinel(container);
+    }
+    
+    // 滚动到底部时加载下一页
+    setupPageSentinel(container) {
+        if (this.pageObserver) {
+            this.pageObserver.disconnect();
+            this.pageObserver = null;
+        }
+        if (!this.nextCursor) return;
+        
+        const sentinel = document.createElement('div');
+        sentinel.className = 'page-sentinel';
+        sentinel.textContent = '加载中...';
+        container.appendChild(sentinel);
+        
+        this.pageObserver = new IntersectionObserver((entries) => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                this.loadMore();
+            }
+        });
+        this.pageObserver.observe(sentinel);
+    }
+    
+    async loadMore() {
+        if (this.loadingMore || !this.nextCursor) return;
+        this.loadingMore = true;
+        const path = this.currentPath;
+        
+        try {
+            const response = await fetch(`/api/directory?path=${encodeURIComponent(path)}&sort=${this.sortType}&limit=${this.pageSize}&cursor=${encodeURIComponent(this.nextCursor)}`);
+            const data = await response.json();
+            
+            if (data.error) {
+                throw new Error(data.error);
+            }
+            // 加载期间已切换目录则丢弃结果
+            if (path !== this.currentPath) return;
+            
+            const grid = document.getElementById('file-grid');
+            for (const item of data.items) {
+                this.currentItems.push(item);
+                grid.appendChild(this.createFileItem(item));
+            }
+            this.nextCursor = data.next_cursor;
+            
+            const sentinel = document.querySelector('.page-sentinel');
+            if (!this.nextCursor) {
+                if (sentinel) sentinel.remove();
+                if (this.pageObserver) this.pageObserver.disconnect();
+            } else if (sentinel && this.pageObserver) {
+                // 重新观察，若哨兵仍在可视区域内会立即触发下一页加载
+                this.pageObserver.unobserve(sentinel);
+                this.pageObserver.observe(sentinel);
+            }
+            
+        } catch (error) {
+            this.showError('加载更多失败: ' + error.message);
+        } finally {
+            this.loadingMore = false;
+        }
     }
     
     createFileItem(item) {
@@ -190,11 +371,22 @@ class FileBrowserManager {
         }
         
         const icon = this.getFileIcon(item);
-        const size = item.is_dir ? '' : this.formatFileSize(item.size);
+        // 目录大小由后台索引统计，尚未完成时显示占位
+        let size = this.formatFileSize(item.size);
+        if (item.is_parent) {
+            size = '';
+        } else if (item.is_dir) {
+            size = item.size_pending ? '统计中…' : `${size} · ${item.file_count} 个文件`;
+        }
         const modified = item.modified ? new Date(item.modified * 1000).toLocaleDateString() : '';
         
+        // 图片使用懒加载缩略图，加载失败时退回图标
+        const iconHtml = item.thumbnail_url
+            ? `<img class="file-thumb" loading="lazy" src="${item.thumbnail_url}" alt="" onerror="this.replaceWith(document.createTextNode('${icon}'))">`
+            : icon;
+        
         itemEl.innerHTML = `
-            <div class="file-icon">${icon}</div>
+            <div class="file-icon">${iconHtml}</div>
             <div class="file-name" title="${item.name}">${this.escapeHtml(item.name)}</div>
             <div class="file-info">
                 <span class="file-size">${size}</span>
@@ -220,7 +412,7 @@ class FileBrowserManager {
         // 点击事件
         itemEl.onclick = (e) => {
             e.stopPropagation();
-            this.handleItemClick(item);
+            this.handleItemClick(item, e.ctrlKey || e.metaKey);
         };
         
         // 双击事件
@@ -232,19 +424,35 @@ class FileBrowserManager {
         return itemEl;
     }
     
-    handleItemClick(item) {
+    handleItemClick(item, toggle = false) {
+        const itemEl = document.querySelector(`[data-path="${CSS.escape(item.relative_path || item.name)}"]`);
+        // Ctrl/Cmd+单击多选，用于批量操作
+        if (toggle && !item.is_parent) {
+            if (itemEl) itemEl.classList.toggle('selected');
+            return;
+        }
+        
         // 移除其他选中状态
         document.querySelectorAll('.file-item.selected').forEach(el => {
             el.classList.remove('selected');
         });
         
         // 添加选中状态
-        const itemEl = document.querySelector(`[data-path="${item.relative_path || item.name}"]`);
         if (itemEl) {
             itemEl.classList.add('selected');
         }
     }
     
+    // 右键目标：目标在多选范围内时为全部选中的条目，否则只有目标本身
+    getOperationTargets() {
+        const selected = Array.from(document.querySelectorAll('.file-item.selected:not(.parent-folder)'))
+            .map(el => el.dataset.path);
+        if (this.contextTargetPath && selected.includes(this.contextTargetPath)) {
+            return selected;
+        }
+        return this.contextTargetPath ? [this.contextTargetPath] : [];
+    }
+    
     handleItemDoubleClick(item) {
         if (item.is_dir) {
             // 进入目录
@@ -319,6 +527,7 @@ class FileBrowserManager {
     
     // 文件预览
     async previewFile(path) {
+        this.currentPreviewPath = path;
         try {
             // 检查缓存
             if (this.previewCache.has(path)) {
@@ -336,8 +545,10 @@ class FileBrowserManager {
                 throw new Error(data.error);
             }
             
-            // 缓存结果
-            this.cachePreview(path, data);
+            // 缓存结果（后台仍在统计的表格部分结果不缓存，下次打开时重新获取）
+            if (data.complete !== false) {
+                this.cachePreview(path, data);
+            }
             
             this.showPreview(data);
             this.hideLoading();
@@ -354,7 +565,10 @@ class FileBrowserManager {
         
         body.innerHTML = '';
         
-        if (data.type === 'text') {
+        if (data.type === 'text_paged') {
+            this.showTextPager(this.currentPreviewPath, data);
+            
+        } else if (data.type === 'text') {
             const container = document.createElement('div');
             container.className = 'text-preview-container';
             
@@ -383,27 +597,36 @@ class FileBrowserManager {
             
             container.appendChild(info);
             container.appendChild(editBtn);
+            if (data.truncated) {
+                const pagedBtn = document.createElement('button');
+                pagedBtn.className = 'edit-btn paged-btn';
+                pagedBtn.textContent = '分页查看全文';
+                pagedBtn.onclick = () => this.showTextPager(this.currentPreviewPath, data);
+                container.appendChild(pagedBtn);
+            }
             container.appendChild(pre);
             body.appendChild(container);
             
+        } else if (data.type === 'artifact') {
+            body.appendChild(this.renderArtifact(data));
+            
+        } else if (data.type === 'table') {
+            body.appendChild(this.renderTable(this.currentPreviewPath, data));
+            
         } else if (data.type === 'image') {
-            if (data.url) {
-                const img = document.createElement('img');
-                img.src = data.url;
-                img.style.cssText = 'max-width: 70vw; max-height: 70vh; object-fit: contain;';
-                body.appendChild(img);
-                
-                if (data.warning) {
-                    const warning = document.createElement('div');
-                    warning.className = 'warning';
-                    warning.textContent = data.warning;
-                    body.insertBefore(warning, img);
-                }
-            } else {
-                const img = document.createElement('img');
-                img.src = `data:${data.mimetype};base64,${data.content}`;
-                img.style.cssText = 'max-width: 70vw; max-height: 70vh; object-fit: contain;';
-                body.appendChild(img);
+            // 优先显示缩略图，点击打开原图
+            const img = document.createElement('img');
+            img.src = data.thumbnail_url || data.url;
+            img.style.cssText = 'max-width: 70vw; max-height: 70vh; object-fit: contain; cursor: zoom-in;';
+            img.title = '点击查看原图';
+            img.onclick = () => window.open(data.url, '_blank');
+            body.appendChild(img);
+            
+            if (data.warning) {
+                const warning = document.createElement('div');
+                warning.className = 'warning';
+                warning.textContent = data.warning;
+                body.insertBefore(warning, img);
             }
             
         } else if (data.type === 'video') {
@@ -427,8 +650,399 @@ class FileBrowserManager {
         modal.style.display = 'flex';
     }
     
+    // 模型/数组文件结构（只解析了文件头）
+    renderArtifact(data) {
+        const container = document.createElement('div');
+        container.className = 'artifact-preview';
+        
+        const info = [`<span>格式: ${data.format}</span>`, `<span>大小: ${this.formatFileSize(data.size)}</span>`];
+        let columns = [];
+        let rows = [];
+        
+        if (data.format === 'safetensors') {
+            info.push(`<span>张量: ${data.tensor_count}</span>`, `<span>参数量: ${data.total_params.toLocaleString()}</span>`);
+            columns = ['名称', 'dtype', 'shape', '字节'];
+            rows = data.tensors.map(t => [t.name, t.dtype, `[${t.shape.join(', ')}]`, this.formatFileSize(t.nbytes)]);
+        } else if (data.format === 'npy') {
+            columns = ['dtype', 'shape', '元素数', 'Fortran 顺序'];
+            rows = [[data.dtype, `[${data.shape.join(', ')}]`, data.count.toLocaleString(), data.fortran_order ? '是' : '否']];
+        } else if (data.format === 'npz') {
+            info.push(`<span>数组: ${data.array_count}</span>`);
+            columns = ['名称', 'dtype', 'shape', '元素数'];
+            rows = data.arrays.map(a => [a.name, a.dtype || '-', a.shape ? `[${a.shape.join(', ')}]` : (a.error || '-'), a.count !== undefined ? a.count.toLocaleString() : '-']);
+        } else if (data.format === 'torch_zip') {
+            info.push(`<span>成员: ${data.member_count}</span>`, `<span>存储块: ${data.storage_count}（${this.formatFileSize(data.storage_bytes)}）</span>`);
+            columns = ['成员', '大小'];
+            rows = data.members.map(m => [m.name, this.formatFileSize(m.size)]);
+        } else if (data.message) {
+            info.push(`<span>${this.escapeHtml(data.message)}</span>`);
+        }
+        if (data.truncated) {
+            info.push('<span style="color: orange;">条目过多，仅显示部分</span>');
+        }
+        
+        container.innerHTML = `<div class="file-info">${info.join('')}</div>`;
+        if (data.metadata) {
+            const meta = document.createElement('pre');
+            meta.className = 'text-preview';
+            meta.textContent = JSON.stringify(data.metadata, null, 2);
+            container.appendChild(meta);
+        }
+        if (columns.length) {
+            const table = document.createElement('table');
+            table.className = 'artifact-table';
+            table.innerHTML = `<thead><tr>${columns.map(c => `<th>${c}</th>`).join('')}</tr></thead>`;
+            const tbody = document.createElement('tbody');
+            rows.forEach(row => {
+                const tr = document.createElement('tr');
+                row.forEach(cell => {
+                    const td = document.createElement('td');
+                    td.textContent = cell;
+                    tr.appendChild(td);
+                });
+                tbody.appendChild(tr);
+            });
+            table.appendChild(tbody);
+            container.appendChild(table);
+        }
+        return container;
+    }
+    
+    // 表格文件（CSV/TSV/JSONL）：首末页、随机样本和列统计
+    renderTable(path, data) {
+        const container = document.createElement('div');
+        container.className = 'artifact-preview table-preview';
+        
+        const info = [
+            `<span>格式: ${data.format}</span>`,
+            `<span>编码: ${data.encoding}</span>`,
+            `<span>大小: ${this.formatFileSize(data.size)}</span>`,
+            `<span>列: ${data.columns.length}</span>`,
+            `<span>行: ${data.row_count.toLocaleString()}${data.complete ? '' : '+（统计仅覆盖已读部分，完整统计正在后台进行，稍后重新打开查看）'}</span>`
+        ];
+        if (data.bad_rows) {
+            info.push(`<span style="color: orange;">无法解析的行: ${data.bad_rows}</span>`);
+        }
+        container.innerHTML = `
+            <div class="file-info">${info.join('')}</div>
+            <div class="table-preview-tabs">
+                <button data-view="first_rows" class="active">前 ${data.first_rows.length} 行</button>
+                <button data-view="last_rows">末 ${data.last_rows.length} 行</button>
+                <button data-view="sample_rows">随机样本</button>
+                <button data-view="stats">列统计</button>
+                <button class="edit-btn paged-btn" data-view="text">以文本分页查看</button>
+            </div>
+        `;
+        
+        const table = document.createElement('table');
+        table.className = 'artifact-table';
+        container.appendChild(table);
+        
+        const fill = (columns, rows) => {
+            table.innerHTML = '';
+            const header = document.createElement('tr');
+            columns.forEach(column => {
+                const th = document.createElement('th');
+                th.textContent = column;
+                header.appendChild(th);
+            });
+            const thead = document.createElement('thead');
+            thead.appendChild(header);
+            const tbody = document.createElement('tbody');
+            rows.forEach(row => {
+                const tr = document.createElement('tr');
+                columns.forEach((_, i) => {
+                    const td = document.createElement('td');
+                    td.textContent = row[i] === null || row[i] === undefined ? '' : row[i];
+                    tr.appendChild(td);
+                });
+                tbody.appendChild(tr);
+            });
+            table.appendChild(thead);
+            table.appendChild(tbody);
+        };
+        
+        const show = view => {
+            container.querySelectorAll('.table-preview-tabs button').forEach(btn => {
+                btn.classList.toggle('active', btn.dataset.view === view);
+            });
+            if (view === 'stats') {
+                fill(['列', '类型', '空值', '最小值', '最大值', '不同值（约）'], data.column_stats.map(c => [
+                    c.name, c.type, `${c.nulls} / ${c.count}`, c.min ?? '-', c.max ?? '-', c.distinct.toLocaleString()
+                ]));
+            } else {
+                fill(data.columns, data[view]);
+            }
+        };
+        
+        container.querySelectorAll('.table-preview-tabs button').forEach(btn => {
+            btn.onclick = () => btn.dataset.view === 'text' ? this.showTextPager(path, data) : show(btn.dataset.view);
+        });
+        show('first_rows');
+        return container;
+    }
+    
     closePreview() {
         document.getElementById('preview-modal').style.display = 'none';
+        this.textPager = null;
+        if (this.searchController) {
+            this.searchController.abort();
+            this.searchController = null;
+        }
+    }
+    
+    // 随机抽样（大数据集目录不必完整列出即可查看样本）
+    async showSamples(path, n = 60) {
+        try {
+            const response = await fetch(`/api/sample?path=${encodeURIComponent(path)}&n=${n}`);
+            const data = await response.json();
+            if (data.error) {
+                throw new Error(data.error);
+            }
+            
+            const body = document.getElementById('preview-body');
+            body.innerHTML = `
+                <div class="file-info">
+                    <span>样本: ${data.items.length}</span>
+                    <span>已遍历: ${data.scanned}${data.complete ? '' : '（超时提前停止）'}</span>
+                    <button class="sample-refresh-btn">换一批</button>
+                </div>
+                <div class="sample-grid"></div>
+            `;
+            body.querySelector('.sample-refresh-btn').onclick = () => this.showSamples(path, n);
+            
+            const grid = body.querySelector('.sample-grid');
+            data.items.forEach(item => {
+                const cell = document.createElement('div');
+                cell.className = 'sample-item';
+                cell.title = item.name;
+                cell.innerHTML = item.thumbnail_url
+                    ? `<img class="file-thumb" loading="lazy" src="${item.thumbnail_url.replace('size=128', 'size=256')}" alt="">`
+                    : `<div class="file-icon">${this.getFileIcon(item)}</div>`;
+                const name = document.createElement('div');
+                name.className = 'file-name';
+                name.textContent = item.name;
+                cell.appendChild(name);
+                cell.onclick = () => this.previewFile(item.relative_path || item.path);
+                grid.appendChild(cell);
+            });
+            
+            document.getElementById('preview-modal').style.display = 'flex';
+        } catch (error) {
+            this.showError('抽样失败: ' + error.message);
+        }
+    }
+    
+    // 文件搜索（在当前目录下按名称或内容搜索）
+    showSearch(path) {
+        const body = document.getElementById('preview-body');
+        body.innerHTML = `
+            <div class="search-panel">
+                <div class="search-toolbar">
+                    <input class="search-input" type="text" placeholder="名称：*.yaml 或子串；内容：lr=3e-4">
+                    <select class="search-mode">
+                        <option value="name">名称</option>
+                        <option value="content">内容</option>
+                    </select>
+                    <label><input class="search-regex" type="checkbox">正则</label>
+                    <label><input class="search-case" type="checkbox">区分大小写</label>
+                    <button class="search-submit">搜索</button>
+                </div>
+                <div class="search-summary"></div>
+                <div class="search-results"></div>
+            </div>
+        `;
+        const input = body.querySelector('.search-input');
+        const submit = () => this.runSearch(path, input.value.trim(), body.querySelector('.search-mode').value,
+            body.querySelector('.search-regex').checked, body.querySelector('.search-case').checked);
+        body.querySelector('.search-submit').onclick = submit;
+        input.addEventListener('keydown', (e) => {
+            if (e.key === 'Enter') submit();
+        });
+        
+        document.getElementById('preview-modal').style.display = 'flex';
+        input.focus();
+    }
+    
+    async runSearch(path, query, mode, regex, caseSensitive) {
+        if (!query) return;
+        if (this.searchController) this.searchController.abort();
+        const controller = new AbortController();
+        this.searchController = controller;
+        
+        const results = document.querySelector('.search-results');
+        const summary = document.querySelector('.search-summary');
+        results.innerHTML = '';
+        summary.textContent = '搜索中...';
+        
+        const params = new URLSearchParams({ path, q: query, mode, regex: regex ? 1 : 0, case: caseSensitive ? 1 : 0 });
+        try {
+            const response = await fetch(`/api/search?${params}`, { signal: controller.signal });
+            if (!response.ok) {
+                const data = await response.json();
+                throw new Error(data.error || response.statusText);
+            }
+            
+            // NDJSON 流：结果边到达边显示
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let count = 0;
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                for (const line of lines) {
+                    if (!line) continue;
+                    const item = JSON.parse(line);
+                    if (item.done) {
+                        summary.textContent = `找到 ${item.matches} 个结果，用时 ${item.elapsed}s` +
+                            (item.files_scanned !== undefined ? `，检查 ${item.files_scanned} 个文件` : '') +
+                            (item.truncated ? '（已达到上限或超时，结果不完整）' : '');
+                        continue;
+                    }
+                    results.appendChild(this.createSearchResult(path, item));
+                    summary.textContent = `已找到 ${++count} 项...`;
+                }
+            }
+        } catch (error) {
+            if (error.name === 'AbortError') return;
+            summary.textContent = '';
+            this.showError('搜索失败: ' + error.message);
+        } finally {
+            if (this.searchController === controller) this.searchController = null;
+        }
+    }
+    
+    createSearchResult(root, item) {
+        const fullPath = root === '.' ? item.path : `${root.replace(/\/$/, '')}/${item.path}`;
+        const el = document.createElement('div');
+        el.className = 'search-result';
+        
+        const title = document.createElement('div');
+        title.className = 'search-result-path';
+        title.textContent = (item.is_dir ? '📁 ' : '📄 ') + item.path;
+        el.appendChild(title);
+        
+        for (const match of item.matches || []) {
+            const line = document.createElement('div');
+            line.className = 'search-result-line';
+            line.textContent = `${match.line}: ${match.text}`;
+            el.appendChild(line);
+        }
+        
+        el.onclick = () => {
+            if (item.is_dir) {
+                this.closePreview();
+                this.loadDirectory(fullPath);
+            } else {
+                this.previewFile(fullPath);
+            }
+        };
+        return el;
+    }
+    
+    // 大文本分页查看
+    showTextPager(path, data) {
+        const body = document.getElementById('preview-body');
+        body.innerHTML = `
+            <div class="text-preview-container text-pager">
+                <div class="text-pager-toolbar">
+                    <button data-action="first">首页</button>
+                    <button data-action="prev">上一页</button>
+                    <button data-action="next">下一页</button>
+                    <button data-action="tail">末尾</button>
+                    <input type="number" min="1" class="text-pager-jump" placeholder="行号">
+                    <button data-action="jump">跳转</button>
+                </div>
+                <div class="file-info text-pager-info">大小: ${this.formatFileSize(data.size)}</div>
+                <pre class="text-preview text-pager-content"></pre>
+            </div>
+        `;
+        
+        this.textPager = { path, size: data.size, startLine: 1, nextLine: 1, eof: false, totalLines: null };
+        
+        body.querySelectorAll('.text-pager-toolbar button').forEach(btn => {
+            btn.onclick = () => {
+                const pager = this.textPager;
+                if (!pager) return;
+                switch (btn.dataset.action) {
+                    case 'first':
+                        this.loadTextPage({ start: 1 });
+                        break;
+                    case 'prev':
+                        // 读取末尾时行号可能尚未索引完成
+                        if (pager.startLine !== null) {
+                            this.loadTextPage({ start: Math.max(1, pager.startLine - this.textPageLines) });
+                        }
+                        break;
+                    case 'next':
+                        if (!pager.eof) this.loadTextPage({ start: pager.nextLine });
+                        break;
+                    case 'tail':
+                        this.loadTextPage({ tail: this.textPageLines });
+                        break;
+                    case 'jump': {
+                        const line = parseInt(body.querySelector('.text-pager-jump').value, 10);
+                        if (line > 0) this.loadTextPage({ start: line });
+                        break;
+                    }
+                }
+            };
+        });
+        body.querySelector('.text-pager-jump').onkeydown = (e) => {
+            if (e.key === 'Enter') body.querySelector('[data-action="jump"]').click();
+        };
+        
+        document.getElementById('preview-modal').style.display = 'flex';
+        this.loadTextPage({ start: 1 });
+    }
+    
+    async loadTextPage(params) {
+        const pager = this.textPager;
+        if (!pager) return;
+        
+        const query = new URLSearchParams({ path: pager.path, lines: this.textPageLines, ...params });
+        try {
+            const response = await fetch(`/api/text_page?${query}`);
+            const data = await response.json();
+            if (data.error) {
+                throw new Error(data.error);
+            }
+            // 请求返回前已切换文件时丢弃结果
+            if (this.textPager !== pager) return;
+            
+            pager.startLine = data.start_line;
+            pager.nextLine = data.next_line;
+            pager.eof = data.eof;
+            if (data.total_lines !== null) pager.totalLines = data.total_lines;
+            
+            const content = document.querySelector('.text-pager-content');
+            let range;
+            if (data.start_line === null) {
+                // 大文件首次读取末尾：服务端仍在后台建立行索引，暂不显示行号
+                content.textContent = data.lines.join('\n');
+                range = '末尾（行号索引中）';
+            } else {
+                const width = String(data.next_line).length;
+                content.textContent = data.lines
+                    .map((line, i) => `${String(data.start_line + i).padStart(width)}  ${line}`)
+                    .join('\n');
+                range = data.lines.length ? `${data.start_line}-${data.next_line - 1}` : '无';
+            }
+            content.scrollTop = params.tail ? content.scrollHeight : 0;
+            
+            document.querySelector('.text-pager-info').innerHTML = `
+                <span>编码: ${data.encoding}</span>
+                <span>行: ${range}${pager.totalLines !== null ? ' / ' + pager.totalLines : ''}</span>
+                <span>大小: ${this.formatFileSize(data.size)}</span>
+                ${data.truncated_line ? '<span style="color: orange;">超长行已截断</span>' : ''}
+            `;
+        } catch (error) {
+            this.showError('读取失败: ' + error.message);
+        }
     }
     
     cachePreview(path, data) {
@@ -454,6 +1068,9 @@ class FileBrowserManager {
             }
             
             this.currentEditFile = path;
+            this.editBase = data.version;
+            this.editBaseLines = data.content.split('\n');
+            this.editEncoding = data.encoding;
             this.showEditor(data);
             this.hideLoading();
             
@@ -555,29 +1172,60 @@ class FileBrowserManager {
         document.getElementById('editor-cursor-pos').textContent = `行 ${line}, 列 ${col}`;
     }
     
-    async saveFile() {
+    // 与基准内容比较，得到覆盖全部改动的单个按行补丁（去掉相同的首尾行）
+    computeLinePatch(baseLines, lines) {
+        const maxCommon = Math.min(baseLines.length, lines.length);
+        let prefix = 0;
+        while (prefix < maxCommon && baseLines[prefix] === lines[prefix]) prefix++;
+        let suffix = 0;
+        while (suffix < maxCommon - prefix &&
+               baseLines[baseLines.length - 1 - suffix] === lines[lines.length - 1 - suffix]) suffix++;
+        if (prefix === baseLines.length && prefix === lines.length) return [];
+        return [{
+            start: prefix,
+            delete: baseLines.length - prefix - suffix,
+            lines: lines.slice(prefix, lines.length - suffix)
+        }];
+    }
+    
+    async saveFile(overwrite = false) {
         try {
             const content = document.getElementById('file-editor').value;
-            const encoding = 'utf-8'; // 默认使用UTF-8
+            const lines = content.split('\n');
+            const encoding = this.editEncoding;
             
             document.getElementById('editor-status-text').textContent = '保存中...';
             
+            // 默认只提交相对打开时版本的补丁；确认覆盖时提交完整内容
+            const body = { path: this.currentEditFile, encoding: encoding };
+            if (overwrite || !this.editBase) {
+                body.content = content;
+            } else {
+                body.base = this.editBase;
+                body.patch = this.computeLinePatch(this.editBaseLines, lines);
+            }
+            
             const response = await fetch('/api/save_file', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    path: this.currentEditFile,
-                    content: content,
-                    encoding: encoding
-                })
+                body: JSON.stringify(body)
             });
             
             const data = await response.json();
             
+            if (response.status === 409) {
+                document.getElementById('editor-status-text').textContent = '文件已被其他程序修改';
+                if (confirm('文件在打开后已被其他程序修改，是否用当前内容覆盖？')) {
+                    await this.saveFile(true);
+                }
+                return;
+            }
             if (data.error) {
                 throw new Error(data.error);
             }
             
+            this.editBase = data.version;
+            this.editBaseLines = lines;
             this.isModified = false;
             document.getElementById('editor-file-name').textContent = this.currentEditFile;
             document.getElementById('editor-status-text').textContent = '保存成功';
@@ -683,6 +1331,8 @@ class FileBrowserManager {
             document.getElementById('menu-upload').style.display = '';
             document.getElementById('menu-download').style.display = 'none';
             document.getElementById('menu-delete').style.display = 'none';
+            document.getElementById('menu-move').style.display = 'none';
+            document.getElementById('menu-copy').style.display = 'none';
         }
     }
     
@@ -693,6 +1343,8 @@ class FileBrowserManager {
         // 恢复菜单项显示
         document.getElementById('menu-download').style.display = '';
         document.getElementById('menu-delete').style.display = '';
+        document.getElementById('menu-move').style.display = '';
+        document.getElementById('menu-copy').style.display = '';
     }
     
     handleDownload(e) {
@@ -714,35 +1366,80 @@ class FileBrowserManager {
     
     async handleDelete(e) {
         e.stopPropagation();
-        if (!this.contextTargetPath) return;
+        const paths = this.getOperationTargets();
+        this.hideContextMenu();
+        if (!paths.length) return;
         
-        const confirmMsg = `确定要删除此${this.contextTargetType === 'folder' ? '文件夹' : '文件'}吗？\n${this.contextTargetPath}`;
+        const confirmMsg = paths.length > 1
+            ? `确定要删除选中的 ${paths.length} 项吗？`
+            : `确定要删除此${this.contextTargetType === 'folder' ? '文件夹' : '文件'}吗？\n${paths[0]}`;
         if (!confirm(confirmMsg)) return;
         
+        // 服务端先移入回收目录后立即返回，实际删除在后台进行
+        await this.submitBulk('delete', paths);
+    }
+    
+    async handleTransfer(e, op) {
+        e.stopPropagation();
+        const paths = this.getOperationTargets();
+        this.hideContextMenu();
+        if (!paths.length) return;
+        
+        const label = op === 'move' ? '移动' : '复制';
+        const dest = prompt(`${label} ${paths.length} 项到目录（相对工作目录）:`, this.currentPath);
+        if (!dest) return;
+        await this.submitBulk(op, paths, dest);
+    }
+    
+    async submitBulk(op, paths, dest = null) {
         try {
-            const response = await fetch('/api/delete', {
+            // 附带当前 SocketIO 连接 id，进度只推送给本页面
+            const sid = this.socket && this.socket.connected ? this.socket.id : null;
+            const response = await fetch('/api/bulk', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ 
-                    path: this.contextTargetPath, 
-                    type: this.contextTargetType 
-                })
+                body: JSON.stringify({ op, paths, dest, sid })
             });
-            
             const data = await response.json();
+            if (data.error) {
+                throw new Error(data.error);
+            }
             
-            if (data.success) {
-                this.showSuccess('删除成功');
+            this.bulkTasks.add(data.task_id);
+            this.showBulkProgress(data);
+            if (op === 'delete') {
                 this.refreshDirectory();
-            } else {
-                throw new Error(data.error || '删除失败');
             }
-            
         } catch (error) {
-            this.showError('删除失败: ' + error.message);
+            this.showError('批量操作失败: ' + error.message);
         }
+    }
+    
+    showBulkProgress(task) {
+        if (!this.bulkTasks.has(task.task_id)) return;
+        const status = document.getElementById('bulk-status');
+        const labels = { delete: '删除', move: '移动', copy: '复制' };
+        let text = `${labels[task.op]}: ${task.completed}/${task.total}`;
+        if (task.bytes_copied) text += ` · ${this.formatFileSize(task.bytes_copied)}`;
+        if (task.current && task.status === 'running') text += ` · ${task.current}`;
+        if (task.status !== 'running') {
+            text += task.error_count ? ` · 完成，${task.error_count} 项失败` : ' · 完成';
+        }
+        status.textContent = text;
+        status.title = task.errors.map(err => `${err.path}: ${err.error}`).join('\n');
+        status.style.display = 'block';
         
-        this.hideContextMenu();
+        if (task.status !== 'running') {
+            this.bulkTasks.delete(task.task_id);
+            if (task.error_count) {
+                this.showError(`${labels[task.op]}失败 ${task.error_count} 项:\n` + status.title);
+            }
+            // 没有推送连接时手动刷新
+            if (!this.socket || !this.socket.connected) this.refreshDirectory();
+            setTimeout(() => {
+                if (!this.bulkTasks.size) status.style.display = 'none';
+            }, 3000);
+        }
     }
     
     // 上传处理
@@ -801,24 +1498,38 @@ class FileBrowserManager {
             return;
         }
         
+        // 大文件走分块上传（可续传），小文件仍用一次表单提交
         const formData = new FormData();
+        const largeFiles = [];
         for (let i = 0; i < files.length; i++) {
-            formData.append('files', files[i]);
+            if (files[i].size >= this.chunkedUploadThreshold) {
+                largeFiles.push(files[i]);
+            } else {
+                formData.append('files', files[i]);
+            }
         }
         
         const statusEl = document.getElementById('upload-status');
         statusEl.textContent = '上传中...';
         
         try {
-            const response = await fetch(`/api/upload?path=${encodeURIComponent(this.uploadTargetPath)}`, {
-                method: 'POST',
-                body: formData
-            });
+            const uploaded = [];
+            for (const file of largeFiles) {
+                await this.uploadFileChunked(file, statusEl);
+                uploaded.push(file.name);
+            }
             
-            const data = await response.json();
+            let data = {success: true, files: []};
+            if (formData.has('files')) {
+                const response = await fetch(`/api/upload?path=${encodeURIComponent(this.uploadTargetPath)}`, {
+                    method: 'POST',
+                    body: formData
+                });
+                data = await response.json();
+            }
             
             if (data.success) {
-                statusEl.textContent = `上传成功: ${data.files.join(', ')}`;
+                statusEl.textContent = `上传成功: ${uploaded.concat(data.files).join(', ')}`;
                 setTimeout(() => {
                     this.closeUploadModal();
                     this.refreshDirectory();
@@ -832,6 +1543,103 @@ class FileBrowserManager {
         }
     }
     
+    // 分块上传：分块直接写入服务端预分配文件的对应偏移，可乱序并行；
+    // 会话 ID 保存在 localStorage，中断后重新上传同一文件时只补传缺失的分块
+    async uploadFileChunked(file, statusEl) {
+        const key = `chunked-upload:${this.uploadTargetPath}:${file.name}:${file.size}:${file.lastModified}`;
+        let session = null;
+        const savedId = localStorage.getItem(key);
+        if (savedId) {
+            const response = await fetch(`/api/upload/${savedId}`);
+            if (response.ok) {
+                session = await response.json();
+            }
+        }
+        if (!session) {
+            const response = await fetch('/api/upload/initiate', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({path: this.uploadTargetPath || '.', filename: file.name, size: file.size})
+            });
+            session = await response.json();
+            if (!response.ok) {
+                throw new Error(session.error || '创建上传失败');
+            }
+            localStorage.setItem(key, session.upload_id);
+        }
+        
+        const partSize = session.part_size;
+        const queue = session.missing_parts.slice();
+        let sent = session.received_bytes;
+        const report = () => {
+            statusEl.textContent = `${file.name}: ${(sent / Math.max(file.size, 1) * 100).toFixed(1)}% ` +
+                `(${this.formatFileSize(sent)}/${this.formatFileSize(file.size)})`;
+        };
+        report();
+        
+        const sendPart = async (part) => {
+            const buffer = await file.slice(part * partSize, Math.min(file.size, (part + 1) * partSize)).arrayBuffer();
+            const checksum = 'crc32:' + this.crc32(new Uint8Array(buffer));
+            for (let attempt = 0; ; attempt++) {
+                try {
+                    const response = await fetch(`/api/upload/${session.upload_id}/${part}`, {
+                        method: 'PUT',
+                        headers: {'X-Checksum': checksum},
+                        body: buffer
+                    });
+                    if (response.ok) {
+                        sent += buffer.byteLength;
+                        report();
+                        return;
+                    }
+                    const data = await response.json().catch(() => ({}));
+                    // 校验和不一致（传输损坏）和服务端错误可以重试，其他错误直接失败
+                    if (response.status !== 422 && response.status < 500) {
+                        throw Object.assign(new Error(data.error || `分块 ${part} 上传失败`), {fatal: true});
+                    }
+                    throw new Error(data.error || `分块 ${part} 上传失败`);
+                } catch (error) {
+                    if (error.fatal || attempt >= this.chunkedUploadRetries) {
+                        throw error;
+                    }
+                    await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** attempt));
+                }
+            }
+        };
+        
+        const worker = async () => {
+            while (queue.length) {
+                await sendPart(queue.shift());
+            }
+        };
+        await Promise.all(Array.from({length: this.chunkedUploadConcurrency}, worker));
+        
+        const response = await fetch(`/api/upload/${session.upload_id}/complete`, {method: 'POST'});
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || '完成上传失败');
+        }
+        localStorage.removeItem(key);
+    }
+    
+    crc32(bytes) {
+        if (!this.crc32Table) {
+            this.crc32Table = new Uint32Array(256);
+            for (let i = 0; i < 256; i++) {
+                let c = i;
+                for (let k = 0; k < 8; k++) {
+                    c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+                }
+                this.crc32Table[i] = c;
+            }
+        }
+        let crc = 0xFFFFFFFF;
+        for (let i = 0; i < bytes.length; i++) {
+            crc = this.crc32Table[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+        }
+        return ((crc ^ 0xFFFFFFFF) >>> 0).toString(16).padStart(8, '0');
+    }
+    
     // 工具栏功能
     changeSortType(sortType) {
         this.sortType = sortType;
@@ -844,7 +1652,8 @@ class FileBrowserManager {
             const stats = await response.json();
             
             alert(`缓存统计:\n` +
-                  `当前缓存: ${stats.cache_size}/${stats.max_size}\n` +
+                  `当前缓存: ${stats.cache_size} 项, ${this.formatFileSize(stats.cache_bytes)}/${this.formatFileSize(stats.max_bytes)}\n` +
+                  `命中/未命中/淘汰: ${stats.hits}/${stats.misses}/${stats.evictions}\n` +
                   `最大预览大小: ${this.formatFileSize(stats.max_preview_size)}\n` +
                   `前端缓存: ${this.previewCache.size}/${this.maxCacheSize}`);
                   
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量同步客户端
+
+用法: python test/delta_sync_client.py <本地目录> <服务器地址> <远程目录> [--user admin] [--password ...] [--checksum]
+先获取远程目录的文件列表，大小和修改时间一致的文件直接跳过（--checksum 时比较 MD5）；
+其余文件获取块哈希清单后只发送变化的部分，服务端重建并原子替换。
+"""
+
+import os
+import sys
+import mmap
+import json
+import time
+import hashlib
+import argparse
+import getpass
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.delta_sync import iter_delta, encode_delta
+
+
+def login(session, server, user, password):
+    """登录并保存会话 Cookie"""
+    response = session.post(f'{server}/auth/login', data={'username': user, 'password': password},
+                            allow_redirects=False)
+    if 'session_id' not in session.cookies:
+        raise RuntimeError('登录失败')
+
+
+def remote_files(session, server, remote_dir):
+    """远程目录的文件列表：相对路径 -> {size, mtime}"""
+    response = session.get(f'{server}/api/sync/manifest', params={'path': remote_dir}, stream=True)
+    response.raise_for_status()
+    files = {}
+    for line in response.iter_lines():
+        if line:
+            item = json.loads(line)
+            files[item['path']] = item
+    return files
+
+
+def sync_file(session, server, remote_dir, local_path, relative, exists):
+    """同步单个文件，返回发送的字节数（内容相同时为 0）"""
+    size = os.path.getsize(local_path)
+    with open(local_path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            md5 = hashlib.md5(data).hexdigest()
+            manifest = {'block_size': 1, 'size': 0, 'weak': [], 'strong': [], 'signature': ''}
+            if exists:
+                response = session.get(f'{server}/api/sync/manifest',
+                                       params={'path': remote_dir, 'file': relative})
+                response.raise_for_status()
+                manifest = response.json()
+                if manifest['md5'] == md5:
+                    return 0
+
+            sent = 0
+
+            def body():
+                nonlocal sent
+                for chunk in encode_delta(iter_delta(data, manifest)):
+                    sent += len(chunk)
+                    yield chunk
+
+            response = session.post(f'{server}/api/sync/apply', data=body(), params={
+                'path': remote_dir, 'file': relative, 'md5': md5, 'base': manifest['signature'],
+                'mtime': os.path.getmtime(local_path)
+            })
+            if response.status_code != 200:
+                raise RuntimeError(f"{relative}: {response.json().get('error')}")
+            return sent
+        finally:
+            if size:
+                data.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='块哈希增量同步客户端')
+    parser.add_argument('local', help='本地目录')
+    parser.add_argument('server', help='服务器地址，例如 http://host:5000')
+    parser.add_argument('remote', help='远程目录（相对于服务工作目录）')
+    parser.add_argument('--user', default='admin', help='用户名')
+    parser.add_argument('--password', default=os.environ.get('TRAIN_TOOLS_PASSWORD'), help='密码')
+    parser.add_argument('--checksum', action='store_true', help='不按大小和修改时间跳过，逐个比较 MD5')
+    args = parser.parse_args()
+
+    server = args.server.rstrip('/')
+    session = requests.Session()
+    login(session, server, args.user, args.password or getpass.getpass('密码: '))
+
+    start = time.perf_counter()
+    remote = remote_files(session, server, args.remote)
+    sent = total = changed = 0
+    for dirpath, _, filenames in os.walk(args.local):
+        for filename in filenames:
+            local_path = os.path.join(dirpath, filename)
+            relative = os.path.relpath(local_path, args.local).replace(os.sep, '/')
+            stat_info = os.stat(local_path)
+            total += stat_info.st_size
+            existing = remote.get(relative)
+            if existing and not args.checksum and existing['size'] == stat_info.st_size \
+                    and int(existing['mtime']) == int(stat_info.st_mtime):
+                continue
+            file_sent = sync_file(session, server, args.remote, local_path, relative, existing is not None)
+            if file_sent:
+                changed += 1
+                sent += file_sent
+                print(f"{relative}: 发送 {file_sent / 1024:.1f}KB / {stat_info.st_size / 1024:.1f}KB")
+
+    elapsed = time.perf_counter() - start
+    print(f"同步完成: {changed} 个文件有变化，发送 {sent / 1024 / 1024:.2f}MB / 总计 {total / 1024 / 1024:.2f}MB，"
+          f"耗时 {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Range / 条件请求响应测试
+
+运行: python -m pytest -q test/test_range_response.py
+"""
+
+import os
+import sys
+
+import pytest
+from flask import Flask
+from werkzeug.http import http_date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.utils.range_response import send_file_with_ranges  # noqa: E402
+
+
+CONTENT = bytes(range(256)) * 4  # 1024 字节
+
+
+@pytest.fixture
+def file_path(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(CONTENT)
+    return str(path)
+
+
+@pytest.fixture
+def client(file_path):
+    app = Flask(__name__)
+
+    @app.route('/file')
+    def serve_file():
+        return send_file_with_ranges(file_path)
+
+    return app.test_client()
+
+
+def test_full_response_has_validators(client):
+    response = client.get('/file')
+    assert response.status_code == 200
+    assert response.data == CONTENT
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['ETag'].startswith('"')
+    assert 'Last-Modified' in response.headers
+
+
+def test_single_range(client):
+    response = client.get('/file', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 10-19/1024'
+    assert response.headers['Content-Length'] == '10'
+    assert response.data == CONTENT[10:20]
+
+
+def test_open_ended_range_is_clamped(client):
+    response = client.get('/file', headers={'Range': 'bytes=1000-5000'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 1000-1023/1024'
+    assert response.data == CONTENT[1000:]
+
+
+def test_suffix_range(client):
+    response = client.get('/file', headers={'Range': 'bytes=-100'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 924-1023/1024'
+    assert response.data == CONTENT[-100:]
+
+
+def test_multi_range(client):
+    response = client.get('/file', headers={'Range': 'bytes=0-9,100-109'})
+    assert response.status_code == 206
+    content_type = response.headers['Content-Type']
+    assert content_type.startswith('multipart/byteranges; boundary=')
+    boundary = content_type.split('boundary=', 1)[1]
+    assert int(response.headers['Content-Length']) == len(response.data)
+
+    body = response.data
+    assert body.endswith(f'\r\n--{boundary}--\r\n'.encode())
+    parts = body.split(f'--{boundary}'.encode())[1:-1]
+    assert len(parts) == 2
+    for part, (start, stop) in zip(parts, [(0, 10), (100, 110)]):
+        head, data = part.split(b'\r\n\r\n', 1)
+        assert f'Content-Range: bytes {start}-{stop - 1}/1024'.encode() in head
+        assert data[:-2] == CONTENT[start:stop]  # 去掉下一个分隔符前的 CRLF
+
+
+def test_unsatisfiable_range(client):
+    response = client.get('/file', headers={'Range': 'bytes=2000-3000'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == 'bytes */1024'
+
+
+def test_if_range_matching_etag_returns_partial(client):
+    etag = client.get('/file').headers['ETag']
+    response = client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert response.status_code == 206
+    assert response.data == CONTENT[:10]
+
+
+def test_if_range_mismatch_returns_full_body(client):
+    response = client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': '"stale-etag"'})
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+
+def test_if_range_weak_etag_never_matches(client):
+    etag = client.get('/file').headers['ETag']
+    response = client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': 'W/' + etag})
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+
+def test_if_range_old_date_returns_full_body(client):
+    response = client.get('/file', headers={'Range': 'bytes=0-9', 'If-Range': http_date(0)})
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get('/file').headers['ETag']
+    response = client.get('/file', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_if_none_match_mismatch_returns_200(client):
+    response = client.get('/file', headers={'If-None-Match': '"other"'})
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+
+def test_if_modified_since_returns_304(client):
+    last_modified = client.get('/file').headers['Last-Modified']
+    response = client.get('/file', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+
+def test_if_modified_since_older_date_returns_200(client):
+    response = client.get('/file', headers={'If-Modified-Since': http_date(0)})
+    assert response.status_code == 200
+    assert response.data == CONTENT